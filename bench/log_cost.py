@@ -0,0 +1,94 @@
+import argparse
+import inspect
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from loguru import logger
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+
+def eager_cycle(identities):
+    """The log calls of one collection cycle as the collectors used to make them: f-strings and frame lookups."""
+    for collector in ("get_slots", "get_votes", "get_vote_accounts", "leader_slot_metrics", "balance_metrics"):
+        func_name = inspect.currentframe().f_code.co_name
+        logger.info(f"{func_name}: Starting metrics collection process.")
+        for endpoint, latency in (("network", 0.0412), ("validator", 0.0031)):
+            logger.debug(f"{collector.upper()} Response time for {endpoint}: {latency:.4f} seconds")
+        for identity in identities:
+            logger.debug(f"{identity} network vote height: {312045678}")
+            logger.debug(f"Validator {identity} Stake: {round(123456.789, 2)}, Commission: {5}, Epoch vote: {True}")
+        logger.success(f"{func_name}: Collection completed in {0.0421:.2f} seconds.")
+
+
+def lazy_cycle(identities):
+    """The same log calls with templates and structured fields, formatted only when a handler takes them."""
+    for collector in ("get_slots", "get_votes", "get_vote_accounts", "leader_slot_metrics", "balance_metrics"):
+        with logger.contextualize(collector=collector):
+            logger.info("Starting metrics collection process.")
+            for endpoint, latency in (("network", 0.0412), ("validator", 0.0031)):
+                logger.debug("Response time for {endpoint}: {latency:.4f} seconds", endpoint=endpoint,
+                             latency=latency)
+            for identity in identities:
+                logger.debug("{identity} network vote height: {}", 312045678, identity=identity)
+                logger.debug("Validator {identity} Stake: {:.2f}, Commission: {}, Epoch vote: {}", 123456.789, 5,
+                             True, identity=identity)
+            logger.success("Collection completed in {latency:.2f} seconds.", latency=0.0421)
+
+
+def measure(cycle, identities, repeat):
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        cycle(identities)
+    logger.complete()
+    return (time.process_time() - cpu_start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU cost of the collectors' logging per collection cycle")
+    parser.add_argument("--identities", type=int, default=20, help="monitored validators")
+    parser.add_argument("--repeat", type=int, default=200, help="cycles measured per case")
+    args = parser.parse_args()
+
+    identities = [f"Identity{i:040d}" for i in range(args.identities)]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        with open(REPO / "config.yml") as source, open(os.path.join(directory, "config.yml"), "w") as target:
+            target.write(source.read())
+        # config.py reads config.yml from the working directory when it is first imported
+        os.chdir(directory)
+        from utils.log import configure_logging
+
+        with open(os.devnull, "w") as devnull:
+            for level in ("INFO", "DEBUG"):
+                # As exporter.main() used to set up logging: loguru's DEBUG handler on stderr stayed in place
+                logger.remove()
+                logger.add(devnull, level="DEBUG")
+                logger.add(os.path.join(directory, f"{level}.previous.log"), level=level, backtrace=True,
+                           diagnose=True, enqueue=True)
+                cases = [("text", "previous", eager_cycle)]
+                for log_format in ("text", "json"):
+                    cases += [(log_format, "eager", eager_cycle), (log_format, "lazy", lazy_cycle)]
+
+                for log_format, style, cycle in cases:
+                    if style != "previous":
+                        configure_logging(os.path.join(directory, f"{level}.{log_format}.{style}.log"), level,
+                                          log_format, stderr_level="CRITICAL")
+                    cycle(identities)
+                    results.append({"level": level, "format": log_format, "style": style,
+                                    "cpu_us_per_cycle": measure(cycle, identities, args.repeat) * 1e6})
+        os.chdir(REPO)
+        logger.remove()
+
+    for result in results:
+        print(f"{result['level']:>5} {result['format']:>4} {result['style']:>8}: "
+              f"{result['cpu_us_per_cycle']:10.1f} us per cycle", file=sys.stderr)
+    print(json.dumps({"identities": args.identities, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from loguru import logger
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+# Families of the synthetic log that nobody subscribes to, next to the default ones
+OTHER_FAMILIES = ["cluster_info_stats", "cluster_info_stats2", "cluster_info_stats3", "retransmit-stage",
+                  "shred_sigverify", "poh-service", "bank-timestamp", "cost_tracker_stats", "tower-vote",
+                  "blockstore-purge", "accounts_db_store_timings", "accounts_background_service",
+                  "compute_bank_stats-best_slot", "optimistic_slot_elapsed", "qos-service-stats"]
+OTHER_LINES = [
+    "solana_core::replay_stage] new root {}",
+    "solana_gossip::cluster_info] {} pull request timed out",
+    "solana_ledger::blockstore] slot {} is not full, waiting for shreds",
+    "solana_core::consensus] voting: {} 0",
+]
+
+
+def timestamp() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime()) + ".123456789Z"
+
+
+def build_lines(subscribed: dict, rng: random.Random, count: int = 2000):
+    """Return a pool of log lines and, per line, the subscribed (family, field) values it carries."""
+    lines, carried = [], []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.35:
+            family = rng.choice(list(subscribed))
+            fields = {field: rng.randrange(1, 100000) for field in subscribed[family]}
+            # Fields nobody subscribed to, before and after the wanted ones
+            fields = {"id": rng.randrange(1000), **fields, "host_id": '"7Np41oeYqPefeNQEHSv1UDhYrehxin3NStELsSKCT4K2"'}
+            text = " ".join(f"{field}={value}i" if isinstance(value, int) else f"{field}={value}"
+                            for field, value in fields.items())
+            lines.append(f"[{timestamp()} INFO  solana_metrics::metrics] datapoint: {family} {text}\n")
+            carried.append({(family, field): fields[field] for field in subscribed[family]})
+        elif kind < 0.8:
+            family = rng.choice(OTHER_FAMILIES)
+            text = " ".join(f"field_{n}={rng.randrange(1 << 40)}i" for n in range(rng.randrange(5, 25)))
+            lines.append(f"[{timestamp()} INFO  solana_metrics::metrics] datapoint: {family} {text}\n")
+            carried.append({})
+        else:
+            template = rng.choice(OTHER_LINES)
+            lines.append(f"[{timestamp()} INFO  {template.format(rng.randrange(1 << 30))}\n")
+            carried.append({})
+    return [line.encode() for line in lines], carried
+
+
+class LogWriter:
+    """Appends random lines of the pool to a file and keeps the expected datapoint totals of what it wrote."""
+
+    def __init__(self, path, lines, carried, rng):
+        self.path = path
+        self.lines = lines
+        self.carried = carried
+        self.rng = rng
+        self.expected = Counter()
+        self.written = 0
+
+    def write(self, size: int, block_lines: int = 20000):
+        with open(self.path, "ab") as log_file:
+            target = self.written + size
+            while self.written < target:
+                picks = self.rng.choices(range(len(self.lines)), k=block_lines)
+                block = b"".join(self.lines[index] for index in picks)
+                log_file.write(block)
+                self.written += len(block)
+                for index in picks:
+                    for key, value in self.carried[index].items():
+                        self.expected[key] += value
+        return self.written
+
+    def write_partial(self):
+        """Write the first half of a line, as the validator may between two flushes; return the second half."""
+        line = self.lines[0]
+        with open(self.path, "ab") as log_file:
+            log_file.write(line[:len(line) // 2])
+        self.written += len(line) // 2
+        self.expected.update(self.carried[0])
+        return line[len(line) // 2:]
+
+
+def check(parser, writer) -> bool:
+    counters = {(family.decode(), field.decode()): value for (family, field), value in parser.sums.items()}
+    missing = {key: (writer.expected[key], counters.get(key)) for key in writer.expected
+               if counters.get(key) != writer.expected[key]}
+    if missing:
+        logger.error(f"Parsed totals differ from the written ones: {list(missing.items())[:5]}")
+    return not missing
+
+
+def main():
+    parser_args = argparse.ArgumentParser(description="Throughput of the validator log tailer on a synthetic log")
+    parser_args.add_argument("--size", type=int, default=512, help="megabytes of log to catch up on")
+    parser_args.add_argument("--chunk-size", type=int, default=4 * 1024 * 1024)
+    parser_args.add_argument("--seed", type=int, default=1)
+    args = parser_args.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(REPO / "config.yml") as source, open(os.path.join(directory, "config.yml"), "w") as target:
+            target.write(source.read())
+        # config.py reads config.yml from the working directory when it is first imported
+        os.chdir(directory)
+        from modules.validator_log import DatapointParser, DEFAULT_DATAPOINTS
+        from utils.tail import FileTailer
+
+        # Only counter fields are checked against the written totals
+        subscribed = {family: [field for field, kind in fields.items() if kind == "counter"]
+                      for family, fields in DEFAULT_DATAPOINTS.items()}
+        lines, carried = build_lines(subscribed, rng)
+        path = os.path.join(directory, "solana.log")
+        offset_path = os.path.join(directory, "offset.json")
+        writer = LogWriter(path, lines, carried, rng)
+
+        print(f"Writing {args.size} MB of synthetic log...", file=sys.stderr)
+        size = writer.write(args.size * 1024 * 1024)
+        # A saved offset of 0 makes the tailer read the whole file instead of starting at its end
+        with open(offset_path, "w") as offset_file:
+            json.dump({"inode": os.stat(path).st_ino, "offset": 0}, offset_file)
+
+        # Catching up on the whole file, as after a long exporter downtime
+        datapoint_parser = DatapointParser(DEFAULT_DATAPOINTS)
+        tailer = FileTailer(path, offset_path, args.chunk_size)
+        cpu_start, start_time = time.process_time(), time.perf_counter()
+        for chunk in tailer.read(limit=size):
+            datapoint_parser.feed(chunk)
+        tailer.save_offset()
+        cpu_time, wall_time = time.process_time() - cpu_start, time.perf_counter() - start_time
+        caught_up = check(datapoint_parser, writer) and tailer.offset == size
+
+        # Following: appends, a half-written line, a rotation and a truncation in place
+        followed = True
+        for step in ("append", "partial", "rotate", "truncate"):
+            if step == "partial":
+                rest = writer.write_partial()
+                list(map(datapoint_parser.feed, tailer.read()))
+                with open(path, "ab") as log_file:
+                    log_file.write(rest)
+                writer.written += len(rest)
+            elif step == "rotate":
+                os.replace(path, f"{path}.1")
+                writer.written = 0
+            elif step == "truncate":
+                os.truncate(path, 0)
+                writer.written = 0
+            writer.write(8 * 1024 * 1024)
+            for chunk in tailer.read():
+                datapoint_parser.feed(chunk)
+            if tailer.offset != writer.written:
+                logger.error(f"After {step}: read up to {tailer.offset}, written {writer.written}")
+                followed = False
+        followed = followed and check(datapoint_parser, writer)
+        tailer.close()
+        os.chdir(REPO)
+
+    result = {
+        "bytes": size,
+        "cpu_seconds": cpu_time,
+        "wall_seconds": wall_time,
+        "mb_per_second": size / 1024 / 1024 / cpu_time,
+        "gb_per_hour": size / 1024 ** 3 / cpu_time * 3600,
+        "datapoints": {family.decode(): count for family, count in datapoint_parser.counts.items()},
+        "caught_up_correctly": caught_up,
+        "followed_correctly": followed,
+    }
+    print(json.dumps(result, indent=2))
+    print(f"{result['mb_per_second']:.0f} MB/s of CPU time, {result['gb_per_hour']:.0f} GB/hour on one core",
+          file=sys.stderr)
+    if not (caught_up and followed):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
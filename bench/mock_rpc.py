@@ -0,0 +1,369 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from bisect import bisect_right
+from aiohttp import web, WSMsgType
+from loguru import logger
+
+SLOTS_PER_EPOCH = 432_000
+SLOTS_PER_LEADER = 4
+SLOT_DURATION = 0.4
+EPOCH_CREDITS_KEPT = 5
+MAX_CREDITS_PER_SLOT = 16
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def synthetic_pubkey(kind: str, index: int) -> str:
+    """A deterministic base58 public key, so the benchmark harness knows the keys the server generates."""
+    number = int.from_bytes(hashlib.sha256(f"{kind}-{index}".encode()).digest(), "big")
+    key = ""
+    while number:
+        number, digit = divmod(number, 58)
+        key = BASE58_ALPHABET[digit] + key
+    return key
+
+
+class SyntheticCluster:
+    """
+    A mainnet-sized cluster generated from a seed: vote accounts, a full leader schedule and block production.
+
+    The slot advances in real time from `start_slot_index` into epoch `epoch`, so every call sees a moving
+    cluster. The leader schedule is the same for every epoch.
+    """
+
+    def __init__(self, validators: int = 2000, epoch: int = 700, start_slot_index: int = 200_000,
+                 delinquent_share: float = 0.02, seed: int = 1):
+        rng = random.Random(seed)
+        self.epoch_zero_slot = epoch * SLOTS_PER_EPOCH + start_slot_index
+        self.started = time.monotonic()
+
+        self.identities = [synthetic_pubkey("identity", i) for i in range(validators)]
+        self.vote_pubkeys = [synthetic_pubkey("vote", i) for i in range(validators)]
+        self.stakes = [int(rng.paretovariate(1.2) * 10_000 * 10 ** 9) for _ in range(validators)]
+        self.commissions = [rng.choice([0, 0, 5, 7, 10, 100]) for _ in range(validators)]
+        self.vote_rates = [rng.uniform(0.85, 1.0) for _ in range(validators)]
+        self.skip_rates = [rng.uniform(0.0, 0.1) for _ in range(validators)]
+        self.delinquent = [i >= 1 and rng.random() < delinquent_share for i in range(validators)]
+        self.balances = [rng.randint(1, 500) * 10 ** 9 for _ in range(validators)]
+        self.index = {key: i for i, key in enumerate(self.identities)}
+        self.vote_index = {key: i for i, key in enumerate(self.vote_pubkeys)}
+
+        # Leader slots are drawn by stake, SLOTS_PER_LEADER consecutive slots at a time
+        leaders = rng.choices(range(validators), weights=self.stakes, k=SLOTS_PER_EPOCH // SLOTS_PER_LEADER)
+        self.leaders = leaders
+        self.leader_slots = [[] for _ in range(validators)]
+        for group, leader in enumerate(leaders):
+            self.leader_slots[leader].extend(range(group * SLOTS_PER_LEADER, (group + 1) * SLOTS_PER_LEADER))
+
+    @property
+    def slot(self) -> int:
+        return self.epoch_zero_slot + int((time.monotonic() - self.started) / SLOT_DURATION)
+
+    def epoch_info(self) -> dict:
+        slot = self.slot
+        return {
+            "absoluteSlot": slot,
+            "blockHeight": self.block_height(slot),
+            "epoch": slot // SLOTS_PER_EPOCH,
+            "slotIndex": slot % SLOTS_PER_EPOCH,
+            "slotsInEpoch": SLOTS_PER_EPOCH,
+            "transactionCount": slot * 3_000
+        }
+
+    def balance(self, pubkey: str) -> int:
+        i = self.index.get(pubkey, self.vote_index.get(pubkey))
+        return 0 if i is None else self.balances[i]
+
+    def performance_samples(self, limit: int) -> list[dict]:
+        """One sample per minute, newest first, with a few slow minutes among them."""
+        slots_per_sample = int(60 / SLOT_DURATION)
+        newest = self.slot // slots_per_sample
+        samples = []
+        for minute in range(newest, max(newest - limit, 0), -1):
+            rng = random.Random(minute)
+            num_slots = rng.randint(slots_per_sample - 8, slots_per_sample + 2)
+            if rng.random() < 0.05:
+                num_slots //= 2
+            samples.append({"slot": minute * slots_per_sample, "numSlots": num_slots,
+                            "numTransactions": num_slots * 1_200, "samplePeriodSecs": 60})
+        return samples
+
+    @staticmethod
+    def block_height(slot: int) -> int:
+        return int(slot * 0.95)
+
+    def vote_account(self, i: int, slot: int) -> dict:
+        epoch, slot_index = divmod(slot, SLOTS_PER_EPOCH)
+        credits_per_slot = MAX_CREDITS_PER_SLOT * self.vote_rates[i]
+        per_epoch = int(SLOTS_PER_EPOCH * credits_per_slot)
+        total = (epoch - EPOCH_CREDITS_KEPT) * per_epoch
+        epoch_credits = []
+        for credited_epoch in range(epoch - EPOCH_CREDITS_KEPT + 1, epoch + 1):
+            earned = per_epoch if credited_epoch < epoch else int(slot_index * credits_per_slot)
+            epoch_credits.append([credited_epoch, total + earned, total])
+            total += earned
+
+        last_vote = slot - (5_000 if self.delinquent[i] else 1 + i % 3)
+        return {
+            "activatedStake": self.stakes[i],
+            "commission": self.commissions[i],
+            "epochCredits": epoch_credits,
+            "epochVoteAccount": True,
+            "lastVote": last_vote,
+            "nodePubkey": self.identities[i],
+            "rootSlot": last_vote - 32,
+            "votePubkey": self.vote_pubkeys[i]
+        }
+
+    def vote_accounts(self, vote_pubkey: str | None = None) -> dict:
+        slot = self.slot
+        if vote_pubkey is None:
+            indexes = range(len(self.identities))
+        else:
+            indexes = [self.vote_index[vote_pubkey]] if vote_pubkey in self.vote_index else []
+        result = {"current": [], "delinquent": []}
+        for i in indexes:
+            result["delinquent" if self.delinquent[i] else "current"].append(self.vote_account(i, slot))
+        return result
+
+    def leader_schedule(self, slot: int | None, identity: str | None) -> dict | None:
+        epoch = (self.slot if slot is None else slot) // SLOTS_PER_EPOCH
+        # Like a node, only the current and the next epoch's schedules are known
+        if epoch > self.slot // SLOTS_PER_EPOCH + 1:
+            return None
+        if identity is not None:
+            i = self.index.get(identity)
+            return {identity: self.leader_slots[i]} if i is not None and self.leader_slots[i] else {}
+        return {self.identities[i]: slots for i, slots in enumerate(self.leader_slots) if slots}
+
+    def blocks(self, start_slot: int, end_slot: int | None) -> list[int]:
+        """Slots in the range that have a block; a leader skips a slot at its own skip rate."""
+        end_slot = min(self.slot if end_slot is None else end_slot, self.slot)
+        return [slot for slot in range(start_slot, end_slot + 1)
+                if random.Random(slot).random() >= self.skip_rates[self.leader(slot)]]
+
+    def leader(self, slot: int) -> int:
+        return self.leaders[slot % SLOTS_PER_EPOCH // SLOTS_PER_LEADER]
+
+    def block_production(self, identity: str | None = None) -> dict:
+        slot = self.slot
+        first_slot = slot - slot % SLOTS_PER_EPOCH
+        by_identity = {}
+        for i, slots in enumerate(self.leader_slots):
+            if identity is not None and self.identities[i] != identity:
+                continue
+            leader_slots = bisect_right(slots, slot - first_slot)
+            if leader_slots:
+                by_identity[self.identities[i]] = [leader_slots, round(leader_slots * (1 - self.skip_rates[i]))]
+        return {"context": {"slot": slot}, "value": {"byIdentity": by_identity,
+                                                     "range": {"firstSlot": first_slot, "lastSlot": slot}}}
+
+
+class MockRpcServer:
+    """
+    JSON-RPC HTTP and PubSub WebSocket stand-in for a Solana node, serving a SyntheticCluster.
+
+    Latency, HTTP errors, JSON-RPC errors and rate limiting can be injected. What was served is counted and
+    reported by GET /stats; POST /stats/reset starts the counts over. Setting `notifying` to False silences the
+    PubSub notifications and `drop_streams()` closes every WebSocket, as a node that stalls or restarts would.
+    """
+
+    def __init__(self, cluster: SyntheticCluster, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rpc_error_rate: float = 0.0, rate_limit: float = 0.0, seed: int = 1):
+        self.cluster = cluster
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rpc_error_rate = rpc_error_rate
+        self.rate_limit = rate_limit
+        self._rng = random.Random(seed)
+        self._tokens = rate_limit
+        self._refilled = time.monotonic()
+        self.notifying = True
+        self.websockets = set()
+        self.methods = {
+            "getBalance": lambda p: {"context": {"slot": cluster.slot}, "value": cluster.balance(p[0])},
+            "getBlocks": lambda p: cluster.blocks(p[0], p[1] if len(p) > 1 and isinstance(p[1], int) else None),
+            "getBlockHeight": lambda p: cluster.block_height(cluster.slot),
+            "getBlockProduction": lambda p: cluster.block_production(_option(p, "identity")),
+            "getEpochInfo": lambda p: cluster.epoch_info(),
+            "getEpochSchedule": lambda p: {"firstNormalEpoch": 0, "firstNormalSlot": 0, "warmup": False,
+                                           "leaderScheduleSlotOffset": SLOTS_PER_EPOCH,
+                                           "slotsPerEpoch": SLOTS_PER_EPOCH},
+            "getHealth": lambda p: "ok",
+            "getLeaderSchedule": lambda p: cluster.leader_schedule(p[0] if p and isinstance(p[0], int) else None,
+                                                                   _option(p, "identity")),
+            "getMaxRetransmitSlot": lambda p: cluster.slot + 2,
+            "getMaxShredInsertSlot": lambda p: cluster.slot + 1,
+            "getRecentPerformanceSamples": lambda p: cluster.performance_samples(p[0] if p else 720),
+            "getSlot": lambda p: cluster.slot,
+            "getVersion": lambda p: {"solana-core": "2.0.14", "feature-set": 607245837},
+            "getVoteAccounts": lambda p: cluster.vote_accounts(_option(p, "votePubkey")),
+        }
+        self.reset()
+
+    def reset(self):
+        self.stats = {"http_requests": 0, "calls": 0, "request_bytes": 0, "response_bytes": 0, "http_errors": 0,
+                      "rpc_errors": 0, "rate_limited": 0, "ws_connections": 0, "ws_messages": 0, "methods": {}}
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 ** 2)
+        app.router.add_post("/", self.handle_http)
+        app.router.add_get("/", self.handle_ws)
+        app.router.add_get("/stats", self.handle_stats)
+        app.router.add_post("/stats/reset", self.handle_reset)
+        return app
+
+    async def handle_stats(self, request):
+        return web.json_response(self.stats)
+
+    async def handle_reset(self, request):
+        self.reset()
+        return web.json_response(self.stats)
+
+    def _rate_limited(self) -> bool:
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._refilled) * self.rate_limit, self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    async def handle_http(self, request):
+        body = await request.read()
+        self.stats["http_requests"] += 1
+        self.stats["request_bytes"] += len(body)
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._rng.uniform(0, self.jitter))
+        if self._rate_limited():
+            self.stats["rate_limited"] += 1
+            return web.Response(status=429, text="Too many requests for a specific RPC call")
+        if self._rng.random() < self.error_rate:
+            self.stats["http_errors"] += 1
+            return web.Response(status=503, text="Service unavailable")
+
+        payload = json.loads(body)
+        response = [self.answer(call) for call in payload] if isinstance(payload, list) else self.answer(payload)
+        data = json.dumps(response).encode()
+        self.stats["response_bytes"] += len(data)
+        return web.Response(body=data, content_type="application/json")
+
+    def answer(self, call: dict) -> dict:
+        method = call.get("method")
+        self.stats["calls"] += 1
+        self.stats["methods"][method] = self.stats["methods"].get(method, 0) + 1
+        reply = {"jsonrpc": "2.0", "id": call.get("id")}
+
+        if method not in self.methods:
+            reply["error"] = {"code": -32601, "message": "Method not found"}
+        elif self._rng.random() < self.rpc_error_rate:
+            self.stats["rpc_errors"] += 1
+            reply["error"] = {"code": -32005, "message": "Node is behind by 42 slots",
+                              "data": {"numSlotsBehind": 42}}
+        else:
+            reply["result"] = self.methods[method](call.get("params") or [])
+        return reply
+
+    async def handle_ws(self, request):
+        ws = web.WebSocketResponse(heartbeat=10)
+        await ws.prepare(request)
+        self.stats["ws_connections"] += 1
+        self.websockets.add(ws)
+        subscriptions = {}
+        sender = asyncio.create_task(self._notify(ws, subscriptions))
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                call = json.loads(message.data)
+                subscription = len(subscriptions) + 1
+                subscriptions[subscription] = call.get("method")
+                await ws.send_json({"jsonrpc": "2.0", "id": call.get("id"), "result": subscription})
+        finally:
+            sender.cancel()
+            self.websockets.discard(ws)
+        return ws
+
+    async def drop_streams(self):
+        """Close every PubSub connection from the server side."""
+        for ws in list(self.websockets):
+            await ws.close()
+
+    async def _notify(self, ws, subscriptions: dict):
+        """Send a notification for every slot to each subscription, like a node does."""
+        cluster = self.cluster
+        last_slot = cluster.slot
+        while not ws.closed:
+            await asyncio.sleep(SLOT_DURATION / 4)
+            slot = cluster.slot
+            if slot == last_slot or not self.notifying:
+                continue
+            last_slot = slot
+            for subscription, method in list(subscriptions.items()):
+                if method == "slotSubscribe":
+                    results = [{"slot": slot, "parent": slot - 1, "root": slot - 32}]
+                elif method == "rootSubscribe":
+                    results = [slot - 32]
+                elif method == "voteSubscribe":
+                    results = [{"votePubkey": cluster.vote_pubkeys[i], "slots": [slot - 1], "hash": "",
+                                "timestamp": None, "signature": ""}
+                               for i in range(len(cluster.vote_pubkeys)) if not cluster.delinquent[i]]
+                else:
+                    continue
+                method_name = method.replace("Subscribe", "Notification")
+                for result in results:
+                    await ws.send_json({"jsonrpc": "2.0", "method": method_name,
+                                        "params": {"result": result, "subscription": subscription}})
+                    self.stats["ws_messages"] += 1
+
+
+def _option(params: list, key: str):
+    """A key of the config object among the call params, if any."""
+    for param in params:
+        if isinstance(param, dict) and key in param:
+            return param[key]
+    return None
+
+
+async def serve(server: MockRpcServer, host: str, port: int):
+    """Serve JSON-RPC on the port and PubSub on the next port up, where the exporter expects it."""
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    await web.TCPSite(runner, host, port + 1).start()
+    logger.info(f"Mock RPC serving {len(server.cluster.identities)} validators on http://{host}:{port} "
+                f"and ws://{host}:{port + 1}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Solana JSON-RPC stand-in with synthetic mainnet-scale data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18899)
+    parser.add_argument("--validators", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every HTTP request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many seconds added on top, at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of HTTP requests answered with a 503")
+    parser.add_argument("--rpc-error-rate", type=float, default=0.0, help="share of calls answered with an error")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="HTTP requests per second before a 429")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    cluster = SyntheticCluster(args.validators, seed=args.seed)
+    server = MockRpcServer(cluster, args.latency, args.jitter, args.error_rate, args.rpc_error_rate,
+                           args.rate_limit, args.seed)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from aiohttp import web
+from loguru import logger
+
+
+class MockSink:
+    """
+    Local stand-in for an alert webhook. It records every batch it receives and can be made slow or failing.
+
+    GET /received returns the recorded batches with the time each one arrived. `failures` answers that many
+    upcoming batches with a 503; `attempts` counts every batch posted, answered or not.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.failures = 0
+        self.attempts = 0
+        self.received = []
+        self._rng = random.Random(seed)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/alerts", self.handle_alerts)
+        app.router.add_get("/received", self.handle_received)
+        return app
+
+    async def handle_alerts(self, request):
+        batch = await request.json()
+        self.attempts += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failures:
+            self.failures -= 1
+            return web.Response(status=503, text="Service unavailable")
+        if self._rng.random() < self.error_rate:
+            return web.Response(status=503, text="Service unavailable")
+        self.received.append({"time": time.time(), **batch})
+        logger.info(f"Received {len(batch.get('alerts', []))} alerts:\n{batch.get('text')}")
+        return web.json_response({"ok": True})
+
+    async def handle_received(self, request):
+        return web.Response(text=json.dumps(self.received), content_type="application/json")
+
+
+async def serve(sink: MockSink, host: str, port: int):
+    runner = web.AppRunner(sink.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Mock alert sink listening on http://{host}:{port}/alerts")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local alert webhook that records what the exporter sends")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before answering each batch")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of batches answered with a 503")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(MockSink(args.latency, args.error_rate), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import aiohttp
+import yaml
+from loguru import logger
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from bench.mock_rpc import synthetic_pubkey  # noqa: E402
+
+# Warm-cycle figures compared against a baseline; higher is worse for all of them
+COMPARED = ("latency_p50", "latency_p95", "cpu_seconds", "http_requests", "calls", "request_bytes",
+            "response_bytes", "log_bytes", "peak_rss_bytes")
+
+
+def write_config(directory: str, url: str, monitored: int, streams: bool, schedule_tick: float):
+    """Write a config.yml that points the exporter at the mock server, based on the repository's own."""
+    with open(REPO / "config.yml") as config_file:
+        config = yaml.safe_load(config_file)
+    config.update({
+        "network_rpc_endpoint": [url],
+        "validator_rpc_endpoint": url,
+        "validators": [{"pub_key": synthetic_pubkey("identity", i), "vote_pub_key": synthetic_pubkey("vote", i)}
+                       for i in range(monitored)],
+        "stream_slots": streams,
+        "stream_votes": streams,
+        "schedule_tick": schedule_tick,
+        "collectors": {}
+    })
+    for key in ("network_ws_endpoint", "validator_ws_endpoint"):
+        config.pop(key, None)
+    with open(os.path.join(directory, "config.yml"), "w") as config_file:
+        yaml.safe_dump(config, config_file)
+
+
+def git_revision() -> str | None:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{revision}-dirty" if dirty else revision
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def summarize(cycles: list[dict]) -> dict:
+    latencies = [cycle["latency_seconds"] for cycle in cycles]
+    summary = {
+        "cycles": len(cycles),
+        "latency_mean": statistics.fmean(latencies),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_max": max(latencies),
+        "peak_rss_bytes": max(cycle["peak_rss_bytes"] for cycle in cycles)
+    }
+    for key in ("collector_runs", "cpu_seconds", "render_seconds", "http_requests", "calls", "request_bytes",
+                "response_bytes", "log_bytes", "http_errors", "rpc_errors", "rate_limited"):
+        summary[key] = statistics.fmean(cycle[key] for cycle in cycles)
+    return summary
+
+
+async def wait_for_server(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Mock RPC server exited with code {process.returncode}")
+            try:
+                async with session.get(f"{url}/stats") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"Mock RPC server did not answer on {url} within {timeout} seconds")
+
+
+def collector_runs() -> tuple[float, float]:
+    """Total duration and count of the collector runs so far, from the scheduler's own histogram."""
+    from prometheus.metrics import solana_exporter_collector_duration
+    total = count = 0.0
+    for sample in solana_exporter_collector_duration.collect()[0].samples:
+        if sample.name.endswith("_sum"):
+            total += sample.value
+        elif sample.name.endswith("_count"):
+            count += sample.value
+    return total, count
+
+
+async def run_cycles(url: str, args) -> list[dict]:
+    """Run the collectors on the exporter's Scheduler against the mock server and measure every window."""
+    # Imported only now: config.py reads config.yml from the working directory when it is first imported
+    from exporter.collector import build_collectors
+    from exporter.scheduler import Scheduler
+    from modules.stream import run_streams
+    from prometheus.snapshot import store
+    from utils.rpc import rpc
+    from utils.log import configure_logging
+
+    # The collectors log to a file the way the exporter does, so its cost shows in the CPU time of every window
+    log_path = os.path.abspath("monitor.log")
+    configure_logging(log_path, args.log_level, args.log_format, stderr_level="WARNING")
+    streams = asyncio.create_task(run_streams()) if args.streams else None
+    # The same scheduling path as the exporter, so collectors share RPC cycles only as often as they do there
+    scheduler = asyncio.create_task(Scheduler(build_collectors()).run())
+    cycles = []
+    try:
+        async with aiohttp.ClientSession() as control:
+            for number in range(args.cycles):
+                await control.post(f"{url}/stats/reset")
+                log_size = os.path.getsize(log_path)
+                runs_before = collector_runs()
+                cpu_start = time.process_time()
+                await asyncio.sleep(args.interval)
+                render_start = time.perf_counter()
+                store.payload()
+                render_time = time.perf_counter() - render_start
+                cpu_time = time.process_time() - cpu_start
+                async with control.get(f"{url}/stats") as response:
+                    stats = await response.json()
+
+                duration, runs = (after - before for after, before in zip(collector_runs(), runs_before))
+                latency = duration / runs if runs else 0.0
+                cycles.append({
+                    "cycle": number,
+                    "latency_seconds": latency,
+                    "collector_runs": runs,
+                    "render_seconds": render_time,
+                    "cpu_seconds": cpu_time,
+                    "peak_rss_bytes": peak_rss_bytes(),
+                    "log_bytes": os.path.getsize(log_path) - log_size,
+                    **{key: value for key, value in stats.items() if key != "methods"},
+                    "methods": stats["methods"]
+                })
+                logger.info(f"Window {number}: {runs:.0f} collector runs of {latency:.3f}s on average, "
+                            f"{stats['http_requests']} requests, {stats['calls']} calls, "
+                            f"{stats['response_bytes']} response bytes")
+    finally:
+        scheduler.cancel()
+        await asyncio.gather(scheduler, return_exceptions=True)
+        if streams is not None:
+            streams.cancel()
+            await asyncio.gather(streams, return_exceptions=True)
+        await rpc.close()
+    return cycles
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> bool:
+    """Print the relative change of the warm-cycle figures against a baseline; return whether all stayed in bounds."""
+    within = True
+    current, previous = result["summary"]["warm"], baseline["summary"]["warm"]
+    for key in COMPARED:
+        if not previous.get(key):
+            continue
+        change = current[key] / previous[key] - 1
+        regressed = change > max_regression
+        within = within and not regressed
+        print(f"{key:>16}: {previous[key]:>14.4f} -> {current[key]:>14.4f} ({change:+.1%})"
+              f"{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+    return within
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collectors against the mock Solana RPC server")
+    parser.add_argument("--cycles", type=int, default=6, help="measured windows; the first is reported as cold")
+    parser.add_argument("--interval", type=float, default=10.0, help="seconds the scheduler runs per window")
+    parser.add_argument("--port", type=int, default=18899)
+    parser.add_argument("--validators", type=int, default=2000)
+    parser.add_argument("--monitored", type=int, default=1, help="validators monitored by the exporter")
+    parser.add_argument("--schedule-tick", type=float, default=1.0,
+                        help="schedule_tick of the exporter's config; 0 schedules every collector on its own jitter")
+    parser.add_argument("--streams", action="store_true", help="run the WebSocket streams during the cycles")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpc-error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="relative increase of a compared figure that fails the run")
+    parser.add_argument("--log-level", default="INFO", help="level of the collectors' log file")
+    parser.add_argument("--log-format", default="json", choices=("json", "text"))
+    args = parser.parse_args()
+
+    if args.cycles < 2:
+        parser.error("--cycles must be at least 2 to report warm windows")
+    # The cycles run from a temporary directory holding the generated config.yml
+    output_path = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "bench.mock_rpc", "--port", str(args.port), "--validators", str(args.validators),
+         "--latency", str(args.latency), "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+         "--rpc-error-rate", str(args.rpc_error_rate), "--rate-limit", str(args.rate_limit)],
+        cwd=REPO
+    )
+    try:
+        asyncio.run(wait_for_server(url, server))
+        with tempfile.TemporaryDirectory() as directory:
+            write_config(directory, url, args.monitored, args.streams, args.schedule_tick)
+            os.chdir(directory)
+            try:
+                cycles = asyncio.run(run_cycles(url, args))
+            finally:
+                os.chdir(REPO)
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {key: value for key, value in vars(args).items()
+                       if key not in ("output", "baseline", "max_regression")},
+        "summary": {"cold": summarize(cycles[:1]), "warm": summarize(cycles[1:])},
+        "cycles": cycles
+    }
+
+    output = json.dumps(result, indent=2)
+    if output_path:
+        with open(output_path, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+    if baseline_path:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if not compare(result, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
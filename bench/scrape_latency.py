@@ -0,0 +1,124 @@
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from loguru import logger
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def vote_accounts_document(validators: int, rng: random.Random) -> bytes:
+    """A getVoteAccounts response the size of mainnet's, which get_vote_accounts parses on the event loop."""
+    accounts = [{
+        "votePubkey": f"Vote{n:040d}",
+        "nodePubkey": f"Node{n:040d}",
+        "activatedStake": rng.randrange(1 << 50),
+        "epochVoteAccount": True,
+        "commission": rng.randrange(11),
+        "lastVote": 312045678 + rng.randrange(100),
+        "rootSlot": 312045640 + rng.randrange(100),
+        "epochCredits": [[700 + epoch, rng.randrange(1 << 30), rng.randrange(1 << 30)] for epoch in range(5)],
+    } for n in range(validators)]
+    return json.dumps({"jsonrpc": "2.0", "result": {"current": accounts, "delinquent": []}, "id": 1}).encode()
+
+
+def client(port: int, duration: float, interval: float):
+    """Scrape at a steady pace and print the latency of every scrape, in seconds, as JSON."""
+    latencies = []
+    end_time = time.monotonic() + duration
+    while time.monotonic() < end_time:
+        start_time = time.perf_counter()
+        request = urllib.request.Request(f"http://127.0.0.1:{port}/metrics", headers={"Accept-Encoding": "gzip"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start_time)
+        time.sleep(interval)
+    print(json.dumps(latencies))
+
+
+def scrape(port: int, duration: float, interval: float, busy) -> list[float]:
+    """Scrape from another process for `duration` seconds while `busy()` runs here, as collectors would."""
+    process = subprocess.Popen([sys.executable, "-m", "bench.scrape_latency", "--client", "--port", str(port),
+                                "--duration", str(duration), "--interval", str(interval)],
+                               cwd=REPO, stdout=subprocess.PIPE)
+    end_time = time.monotonic() + duration
+    while time.monotonic() < end_time and process.poll() is None:
+        busy()
+    output, _ = process.communicate()
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape latency while collectors parse large RPC responses")
+    parser.add_argument("--client", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=18950)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of scraping per case")
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between scrapes")
+    parser.add_argument("--validators", type=int, default=2000, help="vote accounts in the parsed response")
+    parser.add_argument("--series", type=int, default=5000, help="series in the exposition payload")
+    args = parser.parse_args()
+    if args.client:
+        client(args.port, args.duration, args.interval)
+        return
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    from prometheus.snapshot import Gauge, store, start_http_server, scrape_documents
+    from prometheus.shared import ScrapeProcess
+
+    rng = random.Random(1)
+    gauge = Gauge("bench_series", "Series filling the exposition payload", ["identity", "field"],
+                  max_series=args.series)
+    with store.transaction():
+        for n in range(args.series):
+            gauge.labels(identity=f"Identity{n // 10:040d}", field=f"field_{n % 10}").set(rng.random())
+    document = vote_accounts_document(args.validators, rng)
+
+    def collect():
+        # What a get_vote_accounts run costs the collecting process: parsing holds the GIL throughout
+        with store.transaction():
+            accounts = json.loads(document)["result"]["current"]
+            gauge.labels(identity="Identity0", field="accounts").set(len(accounts))
+
+    parse_start = time.perf_counter()
+    collect()
+    parse_time = time.perf_counter() - parse_start
+
+    results = {}
+    server = start_http_server(args.port, "127.0.0.1")
+    for load, busy in (("idle", lambda: time.sleep(0.1)), ("collecting", collect)):
+        latencies = scrape(args.port, args.duration, args.interval, busy)
+        results[f"thread/{load}"] = latencies
+    server.shutdown()
+    server.server_close()
+
+    scrape_process = ScrapeProcess(args.port + 1, 64 * 1024 * 1024, "127.0.0.1")
+    store.add_listener(lambda: scrape_process.publish(scrape_documents()))
+    store.commit()
+    time.sleep(1)
+    try:
+        for load, busy in (("idle", lambda: time.sleep(0.1)), ("collecting", collect)):
+            latencies = scrape(args.port + 1, args.duration, args.interval, busy)
+            results[f"process/{load}"] = latencies
+    finally:
+        scrape_process.close()
+
+    summary = {case: {"scrapes": len(latencies), "p50_ms": percentile(latencies, 0.5) * 1000,
+                      "p99_ms": percentile(latencies, 0.99) * 1000, "max_ms": max(latencies) * 1000}
+               for case, latencies in results.items()}
+    print(json.dumps({"parse_ms": parse_time * 1000, "payload_bytes": len(store.payload()), "cases": summary},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+PARSERS = ("json", "ijson")
+
+
+class BodyStream:
+    """The part of aiohttp's StreamReader that parse_vote_accounts uses; reads the body from a file as asked."""
+
+    def __init__(self, body_file):
+        self._file = body_file
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+
+def status_bytes(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+    raise KeyError(field)
+
+
+def reset_peak_rss():
+    # Importing the exporter's modules peaks higher than a parse does, so the high-water mark is reset first
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+
+
+def parse(parser: str, path: str):
+    if parser == "json":
+        # As get_vote_accounts did before parsing incrementally: response.json() reads the whole body first
+        with open(path, "rb") as body_file:
+            result = json.loads(body_file.read())["result"]
+        return result["current"], result["delinquent"]
+    from utils.vote_accounts import parse_vote_accounts
+    # Only the READ_SIZE chunks the parser asks for are read into memory
+    with open(path, "rb") as body_file:
+        return asyncio.run(parse_vote_accounts(BodyStream(body_file)))
+
+
+def measure(parser: str, path: str, repeat: int) -> dict:
+    """Parse the body in this fresh process and report its time and memory; runs as a subprocess per parser."""
+    # Both parsers' processes import the same modules, so neither baseline carries the other's imports
+    import utils.vote_accounts  # noqa: F401
+
+    reset_peak_rss()
+    rss_before = status_bytes("VmRSS")
+    accounts = parse(parser, path)
+    peak_rss = status_bytes("VmHWM")
+    count = sum(len(accounts_list) for accounts_list in accounts)
+    del accounts
+
+    tracemalloc.start()
+    accounts = parse(parser, path)
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del accounts
+
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        parse(parser, path)
+        times.append(time.perf_counter() - start_time)
+    return {"accounts": count, "parse_ms": statistics.median(times) * 1000, "peak_rss_bytes": peak_rss,
+            "peak_rss_growth_bytes": max(peak_rss - rss_before, 0), "traced_peak_bytes": traced_peak,
+            "retained_bytes": retained}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory of parsing a getVoteAccounts response")
+    parser.add_argument("--validators", type=int, default=5000, help="vote accounts in the response")
+    parser.add_argument("--repeat", type=int, default=20, help="parses timed per parser")
+    parser.add_argument("--measure", choices=PARSERS, help=argparse.SUPPRESS)
+    parser.add_argument("--body", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.body, args.repeat)))
+        return
+
+    from bench.mock_rpc import SyntheticCluster
+    cluster = SyntheticCluster(validators=args.validators)
+    body = json.dumps({"jsonrpc": "2.0", "result": cluster.vote_accounts(), "id": 1}).encode()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "vote_accounts.json")
+        with open(path, "wb") as body_file:
+            body_file.write(body)
+        for name in PARSERS:
+            # A fresh process per parser, so peak RSS is not inherited from the other one
+            output = subprocess.run([sys.executable, "-m", "bench.vote_accounts", "--measure", name, "--body", path,
+                                     "--repeat", str(args.repeat)], cwd=REPO, capture_output=True, text=True,
+                                    check=True).stdout
+            results[name] = json.loads(output)
+
+    print(json.dumps({"validators": args.validators, "body_bytes": len(body), "parsers": results}, indent=2))
+    for name, result in results.items():
+        print(f"{name}: {result['parse_ms']:.1f} ms, peak RSS {result['peak_rss_bytes'] / 2 ** 20:.1f} MB "
+              f"(+{result['peak_rss_growth_bytes'] / 2 ** 20:.1f} MB), "
+              f"traced peak {result['traced_peak_bytes'] / 2 ** 20:.1f} MB, "
+              f"retained {result['retained_bytes'] / 2 ** 20:.1f} MB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,76 @@ import yaml
 
 HEADERS = {'Content-Type': 'application/json'}
 
-with open("config.yml", "r") as config_file:
-    config = yaml.safe_load(config_file)
+
+def load_config(path: str = "config.yml") -> dict:
+    """Read config.yml; the exporter reads it again on SIGHUP to apply collector and log level changes."""
+    with open(path, "r") as config_file:
+        return yaml.safe_load(config_file) or {}
+
+
+config = load_config()
 
 PUB_KEY = config.get("pub_key")
 VOTE_PUB_KEY = config.get("vote_pub_key")
-NETWORK_RPC_ENDPOINT = config.get("network_rpc_endpoint", "https://api.testnet.solana.com")
+# Validators monitored by this exporter; a single pub_key/vote_pub_key pair unless `validators` is set
+VALIDATORS = config.get("validators") or [{"pub_key": PUB_KEY, "vote_pub_key": VOTE_PUB_KEY}]
+NETWORK_RPC_ENDPOINTS = config.get("network_rpc_endpoint", "https://api.testnet.solana.com")
+if not isinstance(NETWORK_RPC_ENDPOINTS, list):
+    NETWORK_RPC_ENDPOINTS = [NETWORK_RPC_ENDPOINTS]
+NETWORK_RPC_ENDPOINT = NETWORK_RPC_ENDPOINTS[0]
 VALIDATOR_RPC_ENDPOINT = config.get("validator_rpc_endpoint", "http://localhost:8899")
 SOLANA_BINARY_PATH = config.get("solana_binary_path", "solana")
+BLOCK_PRODUCTION_CLI_FALLBACK = config.get("block_production_cli_fallback", False)
+CLI_TIMEOUT = config.get("cli_timeout", 30)
+CLI_CONCURRENCY = config.get("cli_concurrency", 2)
 
-THREAD_POOL_SIZE = config.get("thread_pool_size", 4)
 SLEEP_TIME = config.get("sleep_time", 45)
 PORT = config.get("metric_port", 1234)
+SCRAPE_PROCESS = config.get("scrape_process", False)
+SCRAPE_BUFFER_SIZE = config.get("scrape_buffer_size", 8) * 1024 * 1024
 LOG_LEVEL = config.get("log_level", "INFO")
+LOG_FORMAT = config.get("log_format", "json")
+LOG_RATE_LIMIT = config.get("log_rate_limit", 5)
+LOG_RATE_INTERVAL = config.get("log_rate_interval", 60)
+LOG_SAMPLE_RATE = config.get("log_sample_rate", 100)
+COLLECTOR_SCHEDULES = config.get("collectors") or {}
+SCHEDULE_TICK = config.get("schedule_tick", 1)
 RETRY = config.get("retry", 5)
+UPCOMING_LEADER_SLOTS = config.get("upcoming_leader_slots", 10)
+SLOT_DURATION_SAMPLES = config.get("slot_duration_samples", 60)
+SLOT_DURATION_ALPHA = config.get("slot_duration_alpha", 0.2)
+SLOT_DURATION_CONFIDENCE = config.get("slot_duration_confidence", 2)
+RECENT_SKIPPED_SLOTS = config.get("recent_skipped_slots", 10)
+SKIPPED_SLOTS_CURSOR_FILE = config.get("skipped_slots_cursor_file", "logs/skipped_slots_cursor.json")
+HISTORY_SIZE = config.get("history_size", 1024)
+HISTORY_WINDOW = config.get("history_window", 300)
+CAUGHT_UP_SLOTS = config.get("caught_up_slots", 10)
+
+RPC_TIMEOUT = config.get("rpc_timeout", 30)
+RPC_POOL_SIZE = config.get("rpc_pool_size", 100)
+RPC_LIMIT_PER_HOST = config.get("rpc_limit_per_host", 10)
+RPC_DNS_CACHE_TTL = config.get("rpc_dns_cache_ttl", 300)
+RPC_KEEPALIVE_TIMEOUT = config.get("rpc_keepalive_timeout", 60)
+RPC_COALESCE_WINDOW = config.get("rpc_coalesce_window", 0.01)
+RPC_MAX_BATCH_SIZE = config.get("rpc_max_batch_size", 50)
+RPC_DEADLINE = config.get("rpc_deadline", 5)
+RPC_HEDGE_PERCENTILE = config.get("rpc_hedge_percentile", 0.9)
+RPC_HEDGE_DELAY = config.get("rpc_hedge_delay", 1)
+RPC_EWMA_ALPHA = config.get("rpc_ewma_alpha", 0.3)
+RPC_CIRCUIT_FAILURES = config.get("rpc_circuit_failures", 3)
+RPC_CIRCUIT_COOLDOWN = config.get("rpc_circuit_cooldown", 30)
+RPC_MAX_SLOT_LAG = config.get("rpc_max_slot_lag", 50)
+
+STREAM_SLOTS = config.get("stream_slots", False)
+STREAM_VOTES = config.get("stream_votes", False)
+NETWORK_WS_ENDPOINT = config.get("network_ws_endpoint")
+VALIDATOR_WS_ENDPOINT = config.get("validator_ws_endpoint")
+STREAM_STALE_AFTER = config.get("stream_stale_after", 10)
+STREAM_RECONNECT_MAX_DELAY = config.get("stream_reconnect_max_delay", 60)
+
+ALERTS = config.get("alerts") or {}
+
+VALIDATOR_LOG = config.get("validator_log") or {}
 
 
 
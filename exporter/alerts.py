@@ -0,0 +1,250 @@
+import asyncio
+import operator
+import time
+import aiohttp
+from loguru import logger
+from prometheus.snapshot import store
+from config import ALERTS
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq,
+             "!=": operator.ne}
+
+# Rules evaluated when `alerts.rules` is not set in config.yml
+DEFAULT_RULES = [
+    {"name": "validator_delinquent", "metric": "solana_val_delinquent", "op": ">", "threshold": 0,
+     "severity": "critical"},
+    {"name": "node_unhealthy", "metric": "solana_node_health", "labels": {"status": "unhealthy"}, "op": ">",
+     "threshold": 0, "for": 15, "severity": "critical"},
+    {"name": "slot_lag", "metric": "solana_slot_diff", "op": "<", "threshold": -50, "for": 60, "severity": "warning"},
+]
+
+
+class AlertRule:
+    """
+    A threshold on the published series of one metric.
+
+    A series must meet the condition for `for_` seconds before the alert fires, and must stop meeting it for
+    `debounce` seconds before it resolves, so a flapping value does not send a notification every cycle.
+    """
+
+    def __init__(self, name, metric, op, threshold, labels=None, for_=0, debounce=0, severity="warning"):
+        if op not in OPERATORS:
+            raise ValueError(f"Alert rule {name}: unknown operator {op}")
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.labels = {key: str(value) for key, value in (labels or {}).items()}
+        self.for_ = for_
+        self.debounce = debounce
+        self.severity = severity
+
+    @classmethod
+    def from_config(cls, rule: dict):
+        return cls(rule["name"], rule["metric"], rule.get("op", ">"), rule.get("threshold", 0),
+                   labels=rule.get("labels"), for_=rule.get("for", 0), debounce=rule.get("debounce", 0),
+                   severity=rule.get("severity", "warning"))
+
+    def matches(self, labels: dict) -> bool:
+        return all(labels.get(key) == value for key, value in self.labels.items())
+
+    def test(self, value: float) -> bool:
+        return OPERATORS[self.op](value, self.threshold)
+
+
+class _AlertState:
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = None
+        self.pending_since = None
+        self.clear_since = None
+        self.firing = False
+
+
+class AlertEngine:
+    """
+    Evaluates the alert rules against the metric store every time a collector commits its values.
+
+    Evaluation only reads the published values and queues notifications, so it adds next to nothing to a
+    commit; sending them is left to the Notifier.
+    """
+
+    def __init__(self, rules, notifier):
+        self.rules = rules
+        self.notifier = notifier
+        self._states = {}
+
+    def evaluate(self, now=None):
+        now = time.monotonic() if now is None else now
+        for rule in self.rules:
+            seen = set()
+            for labels, value in store.series(rule.metric):
+                if not rule.matches(labels):
+                    continue
+                key = (rule.name, tuple(sorted(labels.items())))
+                seen.add(key)
+                self._step(rule, key, labels, value, now)
+            # A series that is no longer published does not meet the condition anymore
+            for key in [key for key in self._states if key[0] == rule.name and key not in seen]:
+                self._step(rule, key, self._states[key].labels, None, now)
+
+    def on_commit(self):
+        try:
+            self.evaluate()
+        except Exception as e:
+            logger.error("Error evaluating alert rules: {}", e)
+
+    def _step(self, rule, key, labels, value, now):
+        state = self._states.get(key)
+        active = value is not None and rule.test(value)
+        if state is None:
+            if not active:
+                return
+            state = self._states[key] = _AlertState(labels)
+        if value is not None:
+            state.value = value
+
+        if active:
+            state.clear_since = None
+            if state.pending_since is None:
+                state.pending_since = now
+            if not state.firing and now - state.pending_since >= rule.for_:
+                state.firing = True
+                self._notify("FIRING", rule, state)
+            return
+
+        state.pending_since = None
+        if not state.firing:
+            del self._states[key]
+            return
+        if state.clear_since is None:
+            state.clear_since = now
+        if now - state.clear_since >= rule.debounce:
+            del self._states[key]
+            self._notify("RESOLVED", rule, state)
+
+    def _notify(self, status, rule, state):
+        labels = ",".join(f'{key}="{value}"' for key, value in sorted(state.labels.items()))
+        series = f"{rule.metric}{{{labels}}}" if labels else rule.metric
+        message = (f"{status} [{rule.severity}] {rule.name}: {series} = {state.value:g} "
+                   f"({rule.op} {rule.threshold})")
+        logger.warning("Alert {}", message)
+        self.notifier.put(message)
+
+
+class WebhookSink:
+    """POSTs every batch of notifications to a URL as {"text": ..., "alerts": [...]}."""
+
+    def __init__(self, url):
+        self.name = "webhook"
+        self.url = url
+        self._session = None
+
+    async def send(self, messages):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        async with self._session.post(self.url, json={"text": "\n".join(messages), "alerts": messages}) as response:
+            response.raise_for_status()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class TelegramSink:
+    """Sends every batch of notifications as one Telegram message."""
+
+    def __init__(self, token, chat_id):
+        # Imported only when a Telegram sink is configured
+        from telegram import Bot
+        self.name = "telegram"
+        self.chat_id = chat_id
+        self._bot = Bot(token)
+
+    async def send(self, messages):
+        await self._bot.send_message(chat_id=self.chat_id, text="\n".join(messages))
+
+    async def close(self):
+        await self._bot.shutdown()
+
+
+class Notifier:
+    """
+    Queue of notifications drained by a background task, so a slow or failing sink never blocks collection.
+
+    Notifications arriving within `batch_window` seconds of each other are sent as one message. Each sink sends
+    at most `rate_limit` messages per minute; notifications queue up meanwhile and go out in the next batch.
+    A failed send is retried `retry` times with exponential backoff before the batch is dropped for that sink.
+    When the queue is full the oldest notification is dropped.
+    """
+
+    def __init__(self, sinks, batch_window=2.0, rate_limit=20, retry=3, queue_size=1000):
+        self.sinks = sinks
+        self.batch_window = batch_window
+        self.interval = 60 / rate_limit if rate_limit else 0
+        self.retry = retry
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._sent_at = {}
+
+    def put(self, message):
+        if self._queue.full():
+            dropped = self._queue.get_nowait()
+            logger.error("Alert queue full, dropping notification: {}", dropped)
+        self._queue.put_nowait(message)
+
+    async def run(self):
+        while True:
+            messages = [await self._queue.get()]
+            await asyncio.sleep(self.batch_window)
+            while not self._queue.empty():
+                messages.append(self._queue.get_nowait())
+            await asyncio.gather(*[self._send(sink, messages) for sink in self.sinks])
+
+    async def close(self):
+        """Release the connections of every sink."""
+        for sink in self.sinks:
+            try:
+                await sink.close()
+            except Exception as e:
+                logger.warning("Closing alert sink {} failed: {}", sink.name, e)
+
+    async def _send(self, sink, messages):
+        wait = self._sent_at.get(sink.name, -self.interval) + self.interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        for attempt in range(self.retry + 1):
+            try:
+                await sink.send(messages)
+                self._sent_at[sink.name] = time.monotonic()
+                logger.info("Sent {} alert notifications to {}", len(messages), sink.name)
+                return
+            except Exception as e:
+                logger.warning("Sending alert notifications to {} failed (attempt {}): {}", sink.name, attempt + 1, e)
+                if attempt < self.retry:
+                    await asyncio.sleep(2 ** attempt)
+        logger.error("Dropped {} alert notifications for {}", len(messages), sink.name)
+
+
+def build_sinks():
+    sinks = []
+    if ALERTS.get("webhook_url"):
+        sinks.append(WebhookSink(ALERTS["webhook_url"]))
+    if ALERTS.get("telegram_token") and ALERTS.get("telegram_chat_id"):
+        sinks.append(TelegramSink(ALERTS["telegram_token"], ALERTS["telegram_chat_id"]))
+    return sinks
+
+
+async def run_alerts():
+    """Evaluate the alert rules on every commit of the metric store and send notifications until cancelled."""
+    notifier = Notifier(build_sinks(), batch_window=ALERTS.get("batch_window", 2),
+                        rate_limit=ALERTS.get("rate_limit", 20), retry=ALERTS.get("retry", 3),
+                        queue_size=ALERTS.get("queue_size", 1000))
+    rules = [AlertRule.from_config(rule) for rule in ALERTS.get("rules") or DEFAULT_RULES]
+    store.add_listener(AlertEngine(rules, notifier).on_commit)
+    logger.info("Alerting on {} rules to {}", len(rules), [sink.name for sink in notifier.sinks] or 'the log only')
+    try:
+        await notifier.run()
+    finally:
+        await notifier.close()
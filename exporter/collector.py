@@ -1,59 +1,133 @@
-import asyncio
+import importlib
+import os
 from loguru import logger
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import THREAD_POOL_SIZE
-from modules.balance import balance_metrics
-from modules.block import block_metrics
-from modules.epoch import get_epoch_information
-from modules.validator import validator_metrics, get_vote_accounts
-from modules.version import get_version
-from modules.leader_slot import leader_slot_metrics
-from modules.node_health import get_health
-from modules.slot import get_block_height, get_slots
-from modules.vote import get_votes
-
-
-def run_sync_tasks():
-    sync_tasks = [
-        block_metrics,
-        validator_metrics
-    ]
-
-    with ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE) as executor:
-        futures = [executor.submit(task) for task in sync_tasks]
-
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                logger.error(f"Error collecting sync metric: {e}, task: {future}")
-
-
-async def run_async_tasks():
-    async_tasks = {
-        "get_block_height": get_block_height(),
-        "get_slots": get_slots(),
-        "get_votes": get_votes(),
-        "balance_metrics": balance_metrics(),
-        "get_vote_accounts": get_vote_accounts(),
-        "leader_slot_metrics": leader_slot_metrics(),
-        "get_epoch_information": get_epoch_information(),
-        "get_health": get_health(),
-        "get_version": get_version()
-    }
-
-    try:
-        results = await asyncio.gather(*async_tasks.values(), return_exceptions=True)
-
-        for task, result in zip(async_tasks.keys(), results):
-            if isinstance(result, Exception):
-                logger.error(f"{task.upper()}: {result}", exc_info=True)
-    except Exception as e:
-        logger.error(f"Error collecting async metric: {e}")
+from exporter.scheduler import Collector, Scheduler
+from config import (SLEEP_TIME, COLLECTOR_SCHEDULES, NETWORK_RPC_ENDPOINTS, VALIDATOR_RPC_ENDPOINT, VALIDATOR_LOG)
+
+
+class CollectorSpec:
+    """
+    A collector the exporter can run, described without importing its module.
+
+    `target` names the collector coroutine function as "module:function"; the module is only imported once the
+    collector is enabled. `endpoints` are the named RPC endpoints it calls and `requires` names the other
+    prerequisites it needs (see REQUIREMENTS); a collector is skipped when one of them is missing. Collectors in
+    `depends` are enabled along with it.
+    """
+
+    def __init__(self, name, target, interval, jitter=0.0, timeout=None, endpoints=("network",), requires=(),
+                 depends=(), enabled=True):
+        self.name = name
+        self.target = target
+        self.schedule = {"interval": interval, "jitter": jitter, "timeout": timeout}
+        self.endpoints = endpoints
+        self.requires = requires
+        self.depends = depends
+        self.enabled = enabled
+
+    def __repr__(self):
+        return f"CollectorSpec({self.name}, {self.target})"
+
+    def load(self):
+        module_name, func_name = self.target.split(":")
+        return getattr(importlib.import_module(module_name), func_name)
+
+
+# Prerequisites a collector can declare in `requires`
+REQUIREMENTS = {
+    "validator_log": lambda: os.path.exists(VALIDATOR_LOG.get("path", "/var/log/solana/solana.log")),
+}
+ENDPOINT_URLS = {"network": NETWORK_RPC_ENDPOINTS, "validator": VALIDATOR_RPC_ENDPOINT}
+
+# Every collector with its default schedule (seconds); each can be enabled, disabled or rescheduled under
+# `collectors` in config.yml
+REGISTRY = {}
+
+
+def register(name, target, interval, **kwargs):
+    REGISTRY[name] = CollectorSpec(name, target, interval, **kwargs)
+
+
+register("get_health", "modules.node_health:get_health", 5, jitter=1, timeout=5, endpoints=("validator",))
+register("get_slots", "modules.slot:get_slots", 5, jitter=1, timeout=10, endpoints=("network", "validator"))
+register("get_block_height", "modules.slot:get_block_height", 5, jitter=1, timeout=10,
+         endpoints=("network", "validator"))
+register("get_votes", "modules.vote:get_votes", 10, jitter=2, timeout=15, endpoints=("network", "validator"))
+register("get_vote_accounts", "modules.validator:get_vote_accounts", 30, jitter=5, timeout=30)
+register("get_epoch_information", "modules.epoch:get_epoch_information", SLEEP_TIME, jitter=5, timeout=30)
+register("leader_slot_metrics", "modules.leader_slot:leader_slot_metrics", SLEEP_TIME, jitter=5, timeout=30)
+register("balance_metrics", "modules.balance:balance_metrics", SLEEP_TIME, jitter=5, timeout=30)
+# Shares the leader schedules cached, and pre-fetched for the next epoch, by leader_slot_metrics
+register("track_skipped_slots", "modules.skipped_slots:track_skipped_slots", 5, jitter=1, timeout=15,
+         depends=("leader_slot_metrics",))
+register("block_metrics", "modules.block:block_metrics", 120, jitter=10, timeout=60)
+register("get_version", "modules.version:get_version", 300, jitter=10, timeout=30, endpoints=("validator",))
+register("tail_validator_log", "modules.validator_log:tail_validator_log", 5, timeout=60, endpoints=(),
+         requires=("validator_log",), enabled=False)
+
+
+def collector_settings(settings: dict) -> dict[str, dict]:
+    """
+    config.yml's `collectors` settings as a dict of settings per collector.
+
+    `name: true` and `name: false` are short for enabling or disabling a collector. Any other entry that is not
+    a mapping is ignored with a warning, so the collector keeps its defaults.
+    """
+    normalized = {}
+    for name, value in settings.items():
+        if name not in REGISTRY:
+            logger.warning("Unknown collector {} in config.yml, known are {}", name, list(REGISTRY))
+        elif isinstance(value, bool):
+            normalized[name] = {"enabled": value}
+        elif isinstance(value, dict):
+            normalized[name] = value
+        elif value is not None:
+            logger.warning("Ignoring the settings of collector {} in config.yml: expected true, false or a mapping, "
+                           "got {!r}", name, value)
+    return normalized
+
+
+def enabled_specs(settings: dict) -> list[CollectorSpec]:
+    """The collectors enabled by config.yml's `collectors` settings, together with their dependencies."""
+    settings = collector_settings(settings)
+    enabled = {name for name, spec in REGISTRY.items() if settings.get(name, {}).get("enabled", spec.enabled)}
+
+    pending = list(enabled)
+    while pending:
+        for dependency in REGISTRY[pending.pop()].depends:
+            if dependency not in enabled:
+                logger.info("Enabling collector {}, which enabled collectors depend on", dependency)
+                enabled.add(dependency)
+                pending.append(dependency)
+
+    specs = []
+    for name, spec in REGISTRY.items():
+        if name not in enabled:
+            continue
+        missing = [endpoint for endpoint in spec.endpoints if not ENDPOINT_URLS.get(endpoint)]
+        missing += [requirement for requirement in spec.requires if not REQUIREMENTS[requirement]()]
+        if missing:
+            logger.warning("Skipping collector {}: {} not available", name, ', '.join(missing))
+            continue
+        specs.append(spec)
+    return specs
+
+
+def build_collectors(settings: dict | None = None):
+    """Create the scheduled collectors enabled in config.yml, importing only their modules."""
+    settings = collector_settings(COLLECTOR_SCHEDULES if settings is None else settings)
+    collectors = []
+    for spec in enabled_specs(settings):
+        overrides = {}
+        for key, value in settings.get(spec.name, {}).items():
+            if key in spec.schedule:
+                overrides[key] = value
+            elif key != "enabled":
+                logger.warning("Ignoring unknown setting {} of collector {} in config.yml", key, spec.name)
+        collectors.append(Collector(spec.name, spec.load(), **{**spec.schedule, **overrides}))
+    return collectors
 
 
 async def collect():
-    loop = asyncio.get_event_loop()
-    sync_task = loop.run_in_executor(None, run_sync_tasks)
-    async_task = run_async_tasks()
-    await asyncio.gather(sync_task, async_task)
+    """Run every enabled collector once, all in the same RPC cycle."""
+    await Scheduler(build_collectors()).run_once()
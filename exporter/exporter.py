@@ -1,24 +1,29 @@
 import asyncio
 import signal
-from prometheus_client import start_http_server
-import time
-from exporter.collector import collect
+from exporter.collector import build_collectors
+from exporter.scheduler import Scheduler
+from prometheus.snapshot import PAYLOAD_MAX_AGE, store, start_http_server, scrape_documents
+from prometheus.shared import ScrapeProcess
 from loguru import logger
-from config import SLEEP_TIME, PORT, LOG_LEVEL
+from utils.rpc import rpc
+from utils.log import configure_logging
+from prometheus.metrics import solana_exporter_event_loop_lag
+from config import PORT, SCRAPE_PROCESS, SCRAPE_BUFFER_SIZE, STREAM_SLOTS, ALERTS, load_config
 
 
 async def graceful_shutdown(loop, sig=None):
     """Handles graceful shutdown on receiving a signal"""
     if sig:
-        logger.info(f"Received exit signal {sig.name}...")
+        logger.info("Received exit signal {}...", sig.name)
 
     tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
 
-    logger.info(f"Cancelling {len(tasks)} outstanding tasks")
+    logger.info("Cancelling {} outstanding tasks", len(tasks))
     for task in tasks:
         task.cancel()
 
     await asyncio.gather(*tasks, return_exceptions=True)
+    await rpc.close()
     loop.stop()
 
 
@@ -28,40 +33,75 @@ def setup_signals(loop):
         loop.add_signal_handler(sig, lambda: asyncio.create_task(graceful_shutdown(loop, sig)))
 
 
-async def run_exporter():
-    """Main function to run the Prometheus exporter"""
-    logger.info(f"Starting Prometheus metrics server on localhost:{PORT}/metrics")
-    start_http_server(PORT)
+def reload_config(scheduler):
+    """Apply the collectors and log level of config.yml without a restart; other settings need a restart."""
+    logger.info("Received SIGHUP, reloading config.yml")
+    try:
+        settings = load_config()
+        configure_logging(level=settings.get("log_level", "INFO"), log_format=settings.get("log_format", "json"))
+        scheduler.update(build_collectors(settings.get("collectors") or {}))
+    except Exception as e:
+        logger.opt(exception=e).error("Keeping the current collectors, reloading config.yml failed: {}", e)
+
+
+async def monitor_event_loop(interval=1.0):
+    """Export how much later than asked the event loop wakes up a sleeping task, i.e. how long it was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start_time = loop.time()
+        await asyncio.sleep(interval)
+        solana_exporter_event_loop_lag.observe(max(loop.time() - start_time - interval, 0))
 
+
+async def publish_scrape_documents(scrape):
+    """Publish to the scrape-serving process between commits too, for the live self-metrics, and keep it running."""
     while True:
-        start_time = time.time()
-        logger.info("Starting collection of metrics")
-        try:
-            await collect()
-            logger.info(f"Metrics collected successfully in {time.time() - start_time:.2f} seconds")
-        except Exception as e:
-            logger.error(f"Error during metrics collection: {e}")
+        await asyncio.sleep(PAYLOAD_MAX_AGE)
+        scrape.check()
+        scrape.publish(scrape_documents())
+
 
-        logger.info(f"💤 Sleeping for {SLEEP_TIME} seconds")
-        await asyncio.sleep(SLEEP_TIME)
+async def run_exporter():
+    """Main function to run the Prometheus exporter"""
+    logger.info("Starting Prometheus metrics server on localhost:{}/metrics", PORT)
+    scrape = None
+    if SCRAPE_PROCESS:
+        # Scrapes are answered by another process, so they never wait for the GIL held by collectors
+        scrape = ScrapeProcess(PORT, SCRAPE_BUFFER_SIZE)
+        store.add_listener(lambda: scrape.publish(scrape_documents()))
+    else:
+        start_http_server(PORT)
+    await rpc.start()
+
+    # Each collector runs on its own schedule from now on, next to the optional WebSocket slot streams
+    scheduler = Scheduler(build_collectors())
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_config, scheduler)
+    tasks = [scheduler.run(), monitor_event_loop()]
+    if scrape is not None:
+        tasks.append(publish_scrape_documents(scrape))
+    # Optional parts are imported only when enabled
+    if STREAM_SLOTS:
+        from modules.stream import run_streams
+        tasks.append(run_streams())
+    if ALERTS.get("enabled"):
+        from exporter.alerts import run_alerts
+        tasks.append(run_alerts())
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if scrape is not None:
+            scrape.close()
 
 
 def main():
-    logger.add("logs/monitor.log",
-               level=LOG_LEVEL,
-               rotation="00:00",
-               retention="6 days",
-               compression=None,
-               backtrace=True,
-               diagnose=True,
-               enqueue=True)
+    configure_logging()
 
     loop = asyncio.get_event_loop()
     setup_signals(loop)  # Graceful shutdown signal setup
     try:
         loop.run_until_complete(run_exporter())
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: {}", e)
     finally:
         logger.info("Shutting down Prometheus exporter")
         loop.close()
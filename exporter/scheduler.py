@@ -0,0 +1,122 @@
+import asyncio
+import math
+import random
+from loguru import logger
+from utils.rpc import rpc
+from prometheus.snapshot import store
+from config import SCHEDULE_TICK
+from prometheus.metrics import (solana_exporter_collector_duration, solana_exporter_collector_errors,
+                                solana_exporter_cycle_overruns)
+
+
+class Collector:
+    """A collector coroutine function together with its own schedule."""
+
+    def __init__(self, name, func, interval, jitter=0.0, timeout=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout if timeout is not None else interval
+        self.next_run = 0.0
+        self.running = False
+
+    def __repr__(self):
+        return f"Collector({self.name}, interval={self.interval}, jitter={self.jitter}, timeout={self.timeout})"
+
+
+class Scheduler:
+    """
+    Runs every collector on its own interval, jitter and timeout.
+
+    Next runs are rounded up to a shared tick (schedule_tick), so collectors that fall due in the same tick are
+    started together inside one RPC cycle and their identical calls are still coalesced. Each collector's metrics
+    are published to scrapes in one commit as soon as it finishes, so a fast collector never waits for a slow one.
+    A collector is never started again while its previous run is in progress.
+    """
+
+    def __init__(self, collectors):
+        self.collectors = collectors
+        self._wakeup = asyncio.Event()
+        self._tasks = set()
+
+    async def _run_collector(self, collector):
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        # Every message logged during the run carries the collector's name; its metrics are published together
+        with logger.contextualize(collector=collector.name), store.transaction():
+            try:
+                await asyncio.wait_for(collector.func(), timeout=collector.timeout)
+            except asyncio.TimeoutError:
+                logger.error("Timed out after {} seconds", collector.timeout)
+                solana_exporter_collector_errors.labels(collector=collector.name, type="timeout").inc()
+            except Exception as e:
+                logger.opt(exception=e).error("{}: {}", type(e).__name__, e)
+                solana_exporter_collector_errors.labels(collector=collector.name, type=type(e).__name__).inc()
+            finally:
+                end_time = loop.time()
+                solana_exporter_collector_duration.labels(collector=collector.name).observe(end_time - start_time)
+                if end_time - start_time > collector.interval:
+                    solana_exporter_cycle_overruns.labels(collector=collector.name).inc()
+                collector.running = False
+                next_run = max(start_time + collector.interval + random.uniform(0, collector.jitter), end_time)
+                # Rounded up to the shared tick, so collectors whose jitter lands in the same tick start together
+                collector.next_run = math.ceil(next_run / SCHEDULE_TICK) * SCHEDULE_TICK if SCHEDULE_TICK else next_run
+                logger.debug("Finished in {latency:.2f} seconds, next run in {:.2f} seconds",
+                             collector.next_run - end_time, latency=end_time - start_time)
+                self._wakeup.set()
+
+    def update(self, collectors):
+        """
+        Switch to a new set of collectors, e.g. after config.yml was reloaded.
+
+        Collectors that stay keep their place in the schedule and take over the new interval, jitter and timeout.
+        Collectors that are gone are not started again; a run in progress finishes.
+        """
+        current = {collector.name: collector for collector in self.collectors}
+        updated = []
+        for collector in collectors:
+            existing = current.get(collector.name)
+            if existing is not None:
+                existing.interval, existing.jitter, existing.timeout = (collector.interval, collector.jitter,
+                                                                        collector.timeout)
+                collector = existing
+            updated.append(collector)
+        added = [collector.name for collector in updated if collector.name not in current]
+        removed = [name for name in current if name not in {collector.name for collector in updated}]
+        self.collectors = updated
+        logger.info("Collectors updated, added: {}, removed: {}", added, removed)
+        self._wakeup.set()
+
+    async def _run_group(self, collectors):
+        async with rpc.cycle():
+            await asyncio.gather(*[self._run_collector(collector) for collector in collectors])
+
+    async def run_once(self):
+        """Run every collector once, all in the same RPC cycle, and return when the last one finished."""
+        for collector in self.collectors:
+            collector.running = True
+        await self._run_group(self.collectors)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        logger.info("Scheduling {} collectors: {}", len(self.collectors), self.collectors)
+
+        while True:
+            now = loop.time()
+            due = [collector for collector in self.collectors if not collector.running and collector.next_run <= now]
+            if due:
+                for collector in due:
+                    collector.running = True
+                task = asyncio.create_task(self._run_group(due))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            idle = [collector.next_run for collector in self.collectors if not collector.running]
+            delay = max(min(idle) - loop.time(), 0) if idle else None
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
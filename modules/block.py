@@ -1,40 +1,64 @@
-import subprocess
 import time
-import inspect
 import json
 from loguru import logger
-from config import PUB_KEY, SOLANA_BINARY_PATH
+from config import VALIDATORS, BLOCK_PRODUCTION_CLI_FALLBACK
 from utils.func import update_metric
+from utils.rpc import rpc
+from utils.cli import run_cli, CliError
 from prometheus.metrics import (solana_net_skip_rate, solana_skipped_total, solana_val_blocks_produced,
                                 solana_val_skip_rate, solana_val_skipped_slots, solana_total_blocks_produced,
                                 solana_skip_rate_diff, solana_val_leader_slots, solana_total_slots,
                                 solana_confirmed_epoch_first_slot, solana_confirmed_epoch_last_slot)
 
 
+# Function to fetch block production data of the current epoch from the RPC node
+async def get_block_production():
+    epoch_info = await rpc.call("getEpochInfo")
+    first_slot = epoch_info['absoluteSlot'] - epoch_info['slotIndex']
+
+    # The unfiltered table is needed for the network totals; our own entry is looked up by identity
+    result = await rpc.call("getBlockProduction", [{"range": {"firstSlot": first_slot}}])
+    by_identity = result['value']['byIdentity']
+    slot_range = result['value']['range']
+
+    total_slots = slot_range['lastSlot'] - slot_range['firstSlot'] + 1
+    total_blocks_produced = sum(blocks_produced for _, blocks_produced in by_identity.values())
+
+    return {
+        "start_slot": slot_range['firstSlot'],
+        "end_slot": slot_range['lastSlot'],
+        "total_slots": total_slots,
+        "total_blocks_produced": total_blocks_produced,
+        "total_slots_skipped": total_slots - total_blocks_produced,
+        "leaders": {
+            identity: {"leaderSlots": leader_slots, "blocksProduced": blocks_produced,
+                       "skippedSlots": leader_slots - blocks_produced}
+            for identity, (leader_slots, blocks_produced) in by_identity.items()
+        }
+    }
+
+
 # Function to fetch block production data from Solana CLI
-def get_block_production():
-    # Run solana block-production command and capture output
+async def get_block_production_cli():
+    # Run solana block-production command; "Note:" lines are dropped from the output as it is read
     try:
-        result = subprocess.run(
-            [SOLANA_BINARY_PATH, "block-production", "--output", "json-compact"],
-            capture_output=True, text=True, check=True
-        )
+        block_production = await run_cli("block-production", "--output", "json-compact")
         # logger.info("Block production command executed successfully.")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error executing solana block-production command: {e}")
+    except CliError as e:
+        logger.error("Error executing solana block-production command: {}", e)
         return None
 
-    # Remove any "Note:" lines that might be in the output
-    block_production = "\n".join([line for line in result.stdout.splitlines() if "Note:" not in line])
-
     try:
         block_production_data = json.loads(block_production)
         # logger.info("Block production data successfully parsed.")
     except json.JSONDecodeError as e:
-        logger.error(f"Error decoding JSON from block production data: {e}")
+        logger.error("Error decoding JSON from block production data: {}", e)
         return None
 
-    # Return parsed data
+    # Index leaders by identity, the same shape the RPC path returns
+    block_production_data['leaders'] = {
+        leader.get("identityPubkey"): leader for leader in block_production_data.get("leaders", [])
+    }
     return block_production_data
 
 
@@ -59,57 +83,67 @@ def process_metrics(block_production_data):
         update_metric(solana_confirmed_epoch_last_slot, end_slot)
         total_net_skip_rate = (total_slots_skipped / total_slots) * 100
         update_metric(solana_net_skip_rate, total_net_skip_rate)
-        logger.debug(f"Network metrics - Total slots skipped: {total_slots_skipped}, Total slots: {total_slots}, "
-                     f"Total blocks produced: {total_blocks_produced}, Start slot: {start_slot}, "
-                     f"End slot: {end_slot}, Net skip rate: {total_net_skip_rate}")
+        logger.debug("Network metrics - Total slots skipped: {}, Total slots: {}, Total blocks produced: {}, "
+                     "Start slot: {}, End slot: {}, Net skip rate: {}", total_slots_skipped, total_slots,
+                     total_blocks_produced, start_slot, end_slot, total_net_skip_rate)
     except KeyError as e:
-        logger.error(f"Key error when extracting network metrics: {e}")
+        logger.error("Key error when extracting network metrics: {}", e)
         return
 
-    validator_block_production = [
-        leader for leader in block_production_data.get("leaders", [])
-        if leader.get("identityPubkey") == PUB_KEY
-    ]
+    for validator in VALIDATORS:
+        process_validator_metrics(validator["pub_key"], block_production_data, total_net_skip_rate)
+
+
+# Function to send the block production of one validator to Prometheus
+def process_validator_metrics(identity, block_production_data, total_net_skip_rate):
+    validator_block_production = block_production_data.get("leaders", {}).get(identity)
+    labels = {"identity": identity}
 
     # Retrieve validator-specific modules
     if validator_block_production:
         try:
-            val_slots_skipped = validator_block_production[0].get('skippedSlots')
-            update_metric(solana_val_skipped_slots, val_slots_skipped)
-            val_leader_slots = validator_block_production[0].get('leaderSlots')
-            # update_metric(solana_val_leader_slots, val_leader_slots)
-            val_blocks_produced = validator_block_production[0].get('blocksProduced')
-            update_metric(solana_val_blocks_produced, val_blocks_produced)
+            val_slots_skipped = validator_block_production.get('skippedSlots')
+            update_metric(solana_val_skipped_slots, val_slots_skipped, labels=labels)
+            val_leader_slots = validator_block_production.get('leaderSlots')
+            # update_metric(solana_val_leader_slots, val_leader_slots, labels=labels)
+            val_blocks_produced = validator_block_production.get('blocksProduced')
+            update_metric(solana_val_blocks_produced, val_blocks_produced, labels=labels)
             val_skip_rate = (val_slots_skipped / val_leader_slots) * 100
-            update_metric(solana_val_skip_rate, val_skip_rate)
+            update_metric(solana_val_skip_rate, val_skip_rate, labels=labels)
             skip_rate_diff = val_skip_rate - total_net_skip_rate
-            update_metric(solana_skip_rate_diff, skip_rate_diff)
-            logger.debug(
-                f"Validator metrics - blocks produced: {val_blocks_produced}, "
-                f"skip rate: {val_skip_rate:.2f}%, slots skipped: {val_slots_skipped}, "
-                f"leader_slots: {val_leader_slots}, skip rate diff: {skip_rate_diff}")
+            update_metric(solana_skip_rate_diff, skip_rate_diff, labels=labels)
+            logger.debug("Validator {identity} metrics - blocks produced: {}, skip rate: {:.2f}%, slots skipped: {}, "
+                         "leader_slots: {}, skip rate diff: {}", val_blocks_produced, val_skip_rate,
+                         val_slots_skipped, val_leader_slots, skip_rate_diff, identity=identity)
         except KeyError as e:
-            logger.error(f"Key error when extracting validator-specific metrics: {e}")
+            logger.error("Key error when extracting validator-specific metrics: {}", e)
             return
     else:
-        logger.warning("No validator block production data found.")
-        update_metric(solana_val_skipped_slots, 0)
-        update_metric(solana_val_blocks_produced, 0)
-        update_metric(solana_val_skip_rate, 0)
-        update_metric(solana_skip_rate_diff, -total_net_skip_rate)
+        logger.warning("No block production data found for validator {identity}.", identity=identity)
+        update_metric(solana_val_skipped_slots, 0, labels=labels)
+        update_metric(solana_val_blocks_produced, 0, labels=labels)
+        update_metric(solana_val_skip_rate, 0, labels=labels)
+        update_metric(solana_skip_rate_diff, -total_net_skip_rate, labels=labels)
 
 
 # Main function to collect block production data and process it
-def block_metrics():
-    logger.info(f"{inspect.currentframe().f_code.co_name}: Starting metrics collection process.")
+async def block_metrics():
+    logger.info("Starting metrics collection process.")
     start_time = time.time()
 
-    # Fetch block production data
-    block_production_data = get_block_production()
+    # Fetch block production data, falling back to the Solana CLI if the RPC call fails
+    try:
+        block_production_data = await get_block_production()
+    except Exception as e:
+        logger.error("Error fetching block production from RPC: {}", e)
+        block_production_data = None
+        if BLOCK_PRODUCTION_CLI_FALLBACK:
+            logger.info("Falling back to solana block-production command.")
+            block_production_data = await get_block_production_cli()
 
     # Process and send modules to Prometheus
     process_metrics(block_production_data)
 
     end_time = time.time()
-    logger.success(f"{inspect.currentframe().f_code.co_name}: All metrics have been successfully collected and sent "
-                   f"to Prometheus. Time: {end_time - start_time}")
+    logger.success("All metrics have been successfully collected and sent to Prometheus. Time: {latency:.2f}",
+                   latency=end_time - start_time)
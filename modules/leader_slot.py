@@ -1,126 +1,334 @@
-import inspect
-import aiohttp
 import asyncio
+import math
 import time
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from collections import deque
+import numpy as np
 from loguru import logger
 from utils.func import update_metric
-from config import NETWORK_RPC_ENDPOINT, PUB_KEY, HEADERS
+from utils.rpc import rpc
+from config import (VALIDATORS, UPCOMING_LEADER_SLOTS, SLOT_DURATION_SAMPLES, SLOT_DURATION_ALPHA,
+                    SLOT_DURATION_CONFIDENCE)
 from prometheus.metrics import (solana_val_total_leader_slots, solana_next_leader_slot, solana_time_to_next_slot,
-                                solana_avg_slot_duration, solana_next_slot_time, solana_previous_leader_slot)
+                                solana_avg_slot_duration, solana_next_slot_time, solana_previous_leader_slot,
+                                solana_upcoming_leader_slot, solana_slot_duration_stddev, solana_next_slot_time_bound,
+                                solana_remaining_leader_slots, solana_largest_leader_gap, solana_largest_leader_gap_start)
+from prometheus.snapshot import register_json_endpoint
 
+# Seconds between two performance samples of a node
+SAMPLE_PERIOD = 60
+# Deviations from the median, in scaled median absolute deviations, beyond which a sample is ignored
+OUTLIER_THRESHOLD = 3.5
 
-# Generalized async function to fetch data from the Solana RPC
-async def fetch_rpc_data(session, method, params=None):
-    payload = {
-        "jsonrpc": "2.0", "id": 1, "method": method, "params": params or []
+
+class LeaderScheduleCache:
+    """
+    Leader slots of one identity, fetched once per epoch.
+
+    Slots are kept as a sorted list of absolute slots spanning the previous, current and (once published)
+    next epoch, so next/previous leader slot lookups are a bisect instead of a scan.
+    """
+
+    def __init__(self, identity):
+        self.identity = identity
+        self.epoch_schedule = None
+        self.epoch = None
+        self._schedules = {}
+        self._slots = []
+
+    def first_slot_of_epoch(self, epoch):
+        return ((epoch - self.epoch_schedule['firstNormalEpoch']) * self.epoch_schedule['slotsPerEpoch']
+                + self.epoch_schedule['firstNormalSlot'])
+
+    async def _fetch_schedule(self, epoch):
+        """Return our sorted absolute leader slots for the epoch, or None if its schedule is not published yet."""
+        first_slot = self.first_slot_of_epoch(epoch)
+        result = await rpc.call("getLeaderSchedule", [first_slot, {"identity": self.identity}])
+        if result is None:
+            return None
+        return sorted(first_slot + slot for slot in result.get(self.identity, []))
+
+    async def refresh(self, epoch):
+        """Make sure the schedule of the given epoch is cached, dropping epochs that are no longer needed."""
+        if self.epoch_schedule is None:
+            self.epoch_schedule = await rpc.call("getEpochSchedule")
+
+        changed = False
+        if epoch not in self._schedules:
+            schedule = await self._fetch_schedule(epoch)
+            if schedule is None:
+                raise ValueError(f"Leader schedule for epoch {epoch} is not available")
+            self._schedules[epoch] = schedule
+            changed = True
+            logger.info("Cached leader schedule for epoch {}: {} leader slots", epoch, len(schedule))
+
+        # The next epoch's schedule is published ahead of time; fetch it once it is available
+        if epoch + 1 not in self._schedules:
+            schedule = await self._fetch_schedule(epoch + 1)
+            if schedule is not None:
+                self._schedules[epoch + 1] = schedule
+                changed = True
+                logger.info("Pre-fetched leader schedule for epoch {}: {} leader slots", epoch + 1, len(schedule))
+
+        for cached_epoch in [e for e in self._schedules if e < epoch - 1]:
+            del self._schedules[cached_epoch]
+            changed = True
+
+        if changed:
+            self._slots = [slot for cached_epoch in sorted(self._schedules) for slot in self._schedules[cached_epoch]]
+        self.epoch = epoch
+
+    def epoch_slots(self, epoch=None):
+        return self._schedules.get(self.epoch if epoch is None else epoch, [])
+
+    def next_slots(self, current_slot, count=1):
+        index = bisect_right(self._slots, current_slot)
+        return self._slots[index:index + count]
+
+    def slots_between(self, first_slot, last_slot):
+        """Our cached leader slots from first_slot to last_slot, both included."""
+        return self._slots[bisect_left(self._slots, first_slot):bisect_right(self._slots, last_slot)]
+
+    def schedule_end(self):
+        """First slot after the last epoch whose schedule is cached."""
+        return self.first_slot_of_epoch(max(self._schedules) + 1)
+
+    def previous_slot(self, current_slot):
+        index = bisect_left(self._slots, current_slot)
+        return self._slots[index - 1] if index > 0 else None
+
+
+# One cache per monitored identity; their getLeaderSchedule calls share one batch when refreshed together
+leader_schedules = {validator["pub_key"]: LeaderScheduleCache(validator["pub_key"]) for validator in VALIDATORS}
+
+
+class SlotDurationEstimator:
+    """
+    Slot duration smoothed over a window of recent performance samples.
+
+    Only samples newer than the ones already held are added, so after the first refresh each call asks for
+    just the samples taken since. Samples further than OUTLIER_THRESHOLD scaled median absolute deviations
+    from the median are ignored; the rest are averaged with an EWMA, oldest first.
+    """
+
+    def __init__(self, size=SLOT_DURATION_SAMPLES, alpha=SLOT_DURATION_ALPHA):
+        self.alpha = alpha
+        self.samples = deque(maxlen=size)  # (sample slot, seconds per slot), oldest first
+        self.estimate = None
+        self.stddev = None
+        self._refreshed_at = None
+
+    async def refresh(self):
+        """Add the performance samples taken since the last refresh and update the estimate."""
+        count = self.samples.maxlen
+        if self._refreshed_at is not None and self.samples:
+            count = min(math.ceil((time.monotonic() - self._refreshed_at) / SAMPLE_PERIOD) + 1, count)
+        result = await rpc.call("getRecentPerformanceSamples", [count])
+        self._refreshed_at = time.monotonic()
+
+        newest = self.samples[-1][0] if self.samples else -1
+        # Samples come newest first
+        for sample in reversed(result or []):
+            if sample.get('slot', -1) > newest and sample.get('numSlots'):
+                self.samples.append((sample['slot'], sample['samplePeriodSecs'] / sample['numSlots']))
+        self._estimate()
+        return self.estimate
+
+    def _estimate(self):
+        if not self.samples:
+            return
+        durations = np.array([duration for _, duration in self.samples])
+        median = np.median(durations)
+        deviation = 1.4826 * np.median(np.abs(durations - median))
+        if deviation > 0:
+            durations = durations[np.abs(durations - median) <= OUTLIER_THRESHOLD * deviation]
+
+        estimate = durations[0]
+        for duration in durations[1:]:
+            estimate += self.alpha * (duration - estimate)
+        self.estimate = float(estimate)
+        self.stddev = float(durations.std())
+
+    def bounds(self):
+        """Lowest and highest plausible seconds per slot at the configured confidence."""
+        margin = SLOT_DURATION_CONFIDENCE * (self.stddev or 0)
+        return max(self.estimate - margin, 0), self.estimate + margin
+
+
+slot_duration_estimator = SlotDurationEstimator()
+
+# Remaining leader windows of each identity in the current epoch, served as JSON on /timeline. The server thread
+# reads it while the collector runs, so the collector replaces the whole dict instead of changing it in place
+timelines = {}
+
+
+def leader_timeline(identity, current_slot, epoch, now):
+    """Project our remaining leader windows of the epoch onto wall-clock time, with bounds."""
+    lower, upper = slot_duration_estimator.bounds()
+    leader_schedule = leader_schedules[identity]
+    windows = []
+    for slot in leader_schedule.epoch_slots(epoch):
+        if slot <= current_slot:
+            continue
+        if windows and slot == windows[-1]["last_slot"] + 1:
+            windows[-1]["last_slot"] = slot
+        else:
+            windows.append({"first_slot": slot, "last_slot": slot})
+
+    for window in windows:
+        slots_ahead = window["first_slot"] - current_slot
+        window["time"] = now + slots_ahead * slot_duration_estimator.estimate
+        window["earliest"] = now + slots_ahead * lower
+        window["latest"] = now + slots_ahead * upper
+        # When the window is over at the latest, which is when a gap after it can start safely
+        window["end_latest"] = now + (window["last_slot"] + 1 - current_slot) * upper
+
+    # Safe gaps run from the latest end of a window (or now) to the earliest start of the next one
+    gaps = []
+    gap_start = now
+    for window in windows:
+        gaps.append({"start": gap_start, "end": window["earliest"], "seconds": max(window["earliest"] - gap_start, 0),
+                     "before_slot": window["first_slot"]})
+        gap_start = window["end_latest"]
+    # The gap after the last window runs into the next epoch: up to our first slot there if its schedule is
+    # cached, otherwise up to the end of the schedules known
+    next_epoch_slots = leader_schedule.next_slots(leader_schedule.first_slot_of_epoch(epoch + 1) - 1)
+    end_slot = next_epoch_slots[0] if next_epoch_slots else leader_schedule.schedule_end()
+    end = now + (end_slot - current_slot) * lower
+    gaps.append({"start": gap_start, "end": end, "seconds": max(end - gap_start, 0),
+                 "before_slot": next_epoch_slots[0] if next_epoch_slots else None})
+    largest_gap = max(gaps, key=lambda gap: gap["seconds"])
+
+    return {
+        "identity": identity,
+        "epoch": epoch,
+        "current_slot": current_slot,
+        "generated_at": now,
+        "slot_duration": {"estimate": slot_duration_estimator.estimate, "lower": lower, "upper": upper,
+                          "samples": len(slot_duration_estimator.samples)},
+        "remaining_leader_slots": sum(window["last_slot"] - window["first_slot"] + 1 for window in windows),
+        "leader_windows": windows,
+        "largest_gap": largest_gap
     }
 
+
+register_json_endpoint("/timeline", lambda: {"timelines": list(timelines.values())})
+
+
+# Generalized async function to fetch data from the Solana RPC
+async def fetch_rpc_data(method, params=None):
     try:
-        async with session.post(NETWORK_RPC_ENDPOINT, headers=HEADERS, json=payload) as response:
-            response.raise_for_status()
-            return await response.json()
+        return await rpc.call(method, params)
     except Exception as e:
-        logger.error(f"Error fetching {method} from RPC: {e}")
+        logger.error("Error fetching {} from RPC: {}", method, e)
         return None
 
 
 # Get current slot
-async def get_current_slot(session):
-    result = await fetch_rpc_data(session, "getSlot", [{"commitment": "confirmed"}])
-    return result.get('result') if result else None
+async def get_current_slot():
+    return await fetch_rpc_data("getSlot", [{"commitment": "confirmed"}])
 
 
-# Get leader schedule
-async def get_leader_schedule(session):
-    result = await fetch_rpc_data(session, "getLeaderSchedule", [None, {"identity": PUB_KEY}])
-    return result.get('result', {}).get(PUB_KEY, []) if result else None
+# Get current epoch
+async def get_epoch():
+    epoch_info = await fetch_rpc_data("getEpochInfo")
+    return epoch_info.get('epoch') if epoch_info else None
 
 
-# Get epoch information
-async def get_epoch(session):
-    epoch_schedule = await fetch_rpc_data(session, "getEpochSchedule")
-    epoch_info = await fetch_rpc_data(session, "getEpochInfo")
+# Estimate the slot duration from the recent performance samples
+async def calculate_slot_duration():
+    try:
+        estimate = await slot_duration_estimator.refresh()
+    except Exception as e:
+        logger.error("Error fetching slot duration data: {}", e)
+        estimate = slot_duration_estimator.estimate
+    if estimate is None:
+        logger.error("No performance samples to estimate the slot duration from")
+    return estimate
 
-    if epoch_schedule and epoch_info:
-        return (epoch_schedule['result'].get('firstNormalEpoch'),
-                epoch_schedule['result'].get('firstNormalSlot'),
-                epoch_schedule['result'].get('slotsPerEpoch'),
-                epoch_info['result'].get('epoch'))
-    else:
-        logger.error("Error fetching epoch data")
-        return None, None, None, None
-
-
-# Calculate average slot duration
-async def calculate_slot_duration(session):
-    result = await fetch_rpc_data(session, "getRecentPerformanceSamples", [1])
-    if result and len(result['result']) > 0:
-        sample = result['result'][0]
-        sample_period_secs = sample.get('samplePeriodSecs')
-        num_slots = sample.get('numSlots')
-        if num_slots != 0:
-            return sample_period_secs / num_slots
-        else:
-            logger.warning("Warning: Division by zero, setting result to 0")
-            return 0
+
+# Export the next, previous and upcoming leader slots of one identity and return its timeline
+def export_leader_slots(identity, current_slot, epoch, slot_duration):
+    leader_schedule = leader_schedules[identity]
+    labels = {"identity": identity}
+
+    # Look up next and previous leader slots
+    upcoming_slots = leader_schedule.next_slots(current_slot, UPCOMING_LEADER_SLOTS)
+    previous_slot = leader_schedule.previous_slot(current_slot)
+    leader_slots_in_epoch = leader_schedule.epoch_slots(epoch)
+
+    if upcoming_slots:
+        next_slot_epoch = upcoming_slots[0]
+        now = time.time()
+        time_to_next_slot = (next_slot_epoch - current_slot) * slot_duration
+        next_slot_time_unix = now + time_to_next_slot
+        lower, upper = slot_duration_estimator.bounds()
+        logger.debug("{identity} next leader slot: {} in {:.2f}s", next_slot_epoch, time_to_next_slot,
+                     identity=identity)
+
+        # Update Prometheus modules
+        update_metric(solana_next_leader_slot, next_slot_epoch, labels=labels)
+        update_metric(solana_time_to_next_slot, time_to_next_slot, labels=labels)
+        update_metric(solana_next_slot_time, next_slot_time_unix, labels=labels)
+        update_metric(solana_next_slot_time_bound, now + (next_slot_epoch - current_slot) * lower,
+                      labels={**labels, "bound": "lower"})
+        update_metric(solana_next_slot_time_bound, now + (next_slot_epoch - current_slot) * upper,
+                      labels={**labels, "bound": "upper"})
     else:
-        logger.error("Error fetching slot duration data")
-        return None
+        logger.warning("No upcoming leader slots found for {identity}.", identity=identity)
+        update_metric(solana_next_leader_slot, 0, labels=labels)
+        update_metric(solana_time_to_next_slot, 0, labels=labels)
+        update_metric(solana_next_slot_time, 0, labels=labels)
+
+    for position in range(UPCOMING_LEADER_SLOTS):
+        slot = upcoming_slots[position] if position < len(upcoming_slots) else 0
+        update_metric(solana_upcoming_leader_slot, slot, labels={**labels, "position": str(position + 1)})
+
+    # 0 once no earlier leader slot is cached, like the next slot metrics when none is left
+    update_metric(solana_previous_leader_slot, previous_slot or 0, labels=labels)
+    update_metric(solana_val_total_leader_slots, len(leader_slots_in_epoch), labels=labels)
+    logger.debug("{identity} previous leader slot: {}, Total_leader_slots: {}", previous_slot,
+                 len(leader_slots_in_epoch), identity=identity)
+
+    # The whole remaining epoch, summarized as metrics and served in full on /timeline
+    timeline = leader_timeline(identity, current_slot, epoch, time.time())
+    update_metric(solana_remaining_leader_slots, timeline["remaining_leader_slots"], labels=labels)
+    update_metric(solana_largest_leader_gap, timeline["largest_gap"]["seconds"], labels=labels)
+    update_metric(solana_largest_leader_gap_start, timeline["largest_gap"]["start"], labels=labels)
+    return timeline
 
 
 # Main function to gather and set Prometheus modules
 async def leader_slot_metrics():
-    logger.info(f"{inspect.currentframe().f_code.co_name}: Starting metrics collection process.")
+    global timelines
+    logger.info("Starting metrics collection process.")
     start_time = time.time()
-    async with aiohttp.ClientSession() as session:
-        # Parallel requests to Solana RPC
-        current_slot, leader_slots_in_epoch, epoch_data, slot_duration = await asyncio.gather(
-            get_current_slot(session),
-            get_leader_schedule(session),
-            get_epoch(session),
-            calculate_slot_duration(session)
-        )
-
-    if current_slot is None or leader_slots_in_epoch is None or epoch_data is None or slot_duration is None:
-        logger.error("Failed to fetch all required data. Skipping metric collection.")
-        return
+    # Parallel requests to Solana RPC
+    current_slot, epoch, slot_duration = await asyncio.gather(
+        get_current_slot(),
+        get_epoch(),
+        calculate_slot_duration()
+    )
 
-    first_normal_epoch, first_normal_slot, slots_per_epoch, epoch = epoch_data
-    if not all([first_normal_epoch, first_normal_slot, slots_per_epoch, epoch]):
-        logger.error("Incomplete epoch data. Skipping metric collection.")
+    if current_slot is None or epoch is None or slot_duration is None:
+        logger.error("Failed to fetch all required data. Skipping metric collection.")
         return
 
-    # Calculate next and previous leader slots
-    first_slot_in_epoch = (epoch - first_normal_epoch) * slots_per_epoch + first_normal_slot
-    next_slot = next((slot for slot in leader_slots_in_epoch if slot + first_slot_in_epoch > current_slot), None)
-    previous_slot = next(
-        (slot for slot in reversed(leader_slots_in_epoch) if slot + first_slot_in_epoch < current_slot), 0)
-
-    if next_slot:
-        next_slot_epoch = first_slot_in_epoch + next_slot
-        time_to_next_slot = (next_slot_epoch - current_slot) * slot_duration
-        next_slot_time = datetime.now() + timedelta(seconds=time_to_next_slot)
-        next_slot_time = next_slot_time.replace(second=0, microsecond=0)
-        next_slot_time_unix = time.mktime(next_slot_time.timetuple())
-        logger.debug(f"Next leader slot: {next_slot_epoch} in {time_to_next_slot:.2f}s")
+    refreshed = await asyncio.gather(*[schedule.refresh(epoch) for schedule in leader_schedules.values()],
+                                     return_exceptions=True)
+    # Identities whose schedule could not be refreshed keep their last timeline
+    updated = dict(timelines)
+    for identity, result in zip(leader_schedules, refreshed):
+        if isinstance(result, Exception):
+            logger.error("Error refreshing leader schedule of {identity}: {}", result, identity=identity)
+        else:
+            updated[identity] = export_leader_slots(identity, current_slot, epoch, slot_duration)
+    timelines = updated
 
-        # Update Prometheus modules
-        update_metric(solana_next_leader_slot, next_slot_epoch)
-        update_metric(solana_time_to_next_slot, time_to_next_slot)
-        update_metric(solana_next_slot_time, next_slot_time_unix)
-    else:
-        logger.warning("No upcoming leader slots found.")
-        solana_next_leader_slot.set(0)
-        solana_time_to_next_slot.set(0)
-        solana_next_slot_time.set(0)
-
-    previous_slot_epoch = first_slot_in_epoch + previous_slot
-    update_metric(solana_previous_leader_slot, previous_slot_epoch)
-    update_metric(solana_val_total_leader_slots, len(leader_slots_in_epoch))
     update_metric(solana_avg_slot_duration, slot_duration)
-    logger.debug(f"Previous leader slot: {previous_slot_epoch}, Total_leader_slots: {len(leader_slots_in_epoch)}, "
-                 f"Avg slot duration: {slot_duration}")
+    if slot_duration_estimator.stddev is not None:
+        update_metric(solana_slot_duration_stddev, slot_duration_estimator.stddev)
+    logger.debug("Avg slot duration: {}", slot_duration)
     end_time = time.time()
-    logger.success(f"{inspect.currentframe().f_code.co_name}: Metrics successfully collected and exported to "
-                   f"Prometheus. Time: {end_time - start_time}")
+    logger.success("Metrics successfully collected and exported to Prometheus. Time: {latency:.2f}",
+                   latency=end_time - start_time)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from itertools import groupby
+from loguru import logger
+from utils.func import update_metric
+from utils.rpc import rpc, RpcError
+from modules.leader_slot import leader_schedules
+from config import VALIDATORS, RECENT_SKIPPED_SLOTS, SKIPPED_SLOTS_CURSOR_FILE
+from prometheus.metrics import (solana_val_tracked_produced_slots, solana_val_tracked_skipped_slots,
+                                solana_val_recent_skipped_slot, solana_val_leader_window_skip_rate,
+                                solana_val_leader_windows)
+
+# Consecutive slots a leader is scheduled for
+SLOTS_PER_WINDOW = 4
+
+
+class SkipTracker:
+    """
+    Confirms the finished leader slots of one identity as they pass, instead of recounting the whole epoch.
+
+    A cursor marks the first slot not checked yet. Every run looks only at our leader slots between the cursor
+    and the last leader window that is fully confirmed, asks getBlocks which of them have a block, and moves
+    the cursor past them. The cursor is saved after every run, so a restart resumes from it and also checks the
+    leader slots that passed while the exporter was down, as far back as the start of the current epoch. Without
+    a saved cursor, tracking starts at the slot confirmed when the exporter starts. The totals are counters, so a
+    restart shows up as a counter reset.
+    """
+
+    def __init__(self, identity, saved_cursor=None):
+        self.identity = identity
+        self.cursor = None
+        self.saved_cursor = saved_cursor
+        self.produced = 0
+        self.skipped = 0
+        self.recent_skipped = deque(maxlen=RECENT_SKIPPED_SLOTS)
+        # Every series starts at zero, so the first increase after a restart is not lost to rate()
+        self.produced_slots = solana_val_tracked_produced_slots.labels(identity=identity)
+        self.skipped_slots = solana_val_tracked_skipped_slots.labels(identity=identity)
+        self.windows = [solana_val_leader_windows.labels(identity=identity, skipped=str(skipped))
+                        for skipped in range(SLOTS_PER_WINDOW + 1)]
+
+    async def update(self, confirmed_slot, epoch_start):
+        """Check our leader slots up to the confirmed slot. Returns the leader slots checked."""
+        # Windows are only checked once all of their slots are confirmed, so none is split across runs
+        last_slot = (confirmed_slot + 1) // SLOTS_PER_WINDOW * SLOTS_PER_WINDOW - 1
+        if self.cursor is None:
+            if self.saved_cursor is None:
+                self.cursor = last_slot + 1
+                return 0
+            # Only the current epoch's leader schedule is cached, so older slots cannot be checked any more
+            self.cursor = min(max(self.saved_cursor, epoch_start), last_slot + 1)
+            logger.info("Tracking leader slots of {identity} from saved slot {}, resuming at {}", self.saved_cursor,
+                        self.cursor, identity=self.identity)
+
+        slots = leader_schedules[self.identity].slots_between(self.cursor, last_slot)
+        windows = [list(window) for _, window in groupby(slots, key=lambda slot: slot // SLOTS_PER_WINDOW)]
+        if not windows:
+            self.cursor = max(self.cursor, last_slot + 1)
+            return 0
+
+        # One small getBlocks range per leader window, all sent in one batch
+        results = await rpc.batch([("getBlocks", [window[0], window[-1], {"commitment": "confirmed"}])
+                                   for window in windows])
+        checked = 0
+        for window, blocks in zip(windows, results):
+            if isinstance(blocks, RpcError):
+                # The cursor stays at this window, which is checked again next run
+                logger.error("Error fetching blocks of leader window {} of {identity}: {}", window[0], blocks,
+                             identity=self.identity)
+                self.cursor = window[0]
+                return checked
+            self._record_window(window, set(blocks))
+            checked += len(window)
+
+        self.cursor = last_slot + 1
+        return checked
+
+    def _record_window(self, window, blocks):
+        skipped = [slot for slot in window if slot not in blocks]
+        self.produced += len(window) - len(skipped)
+        self.skipped += len(skipped)
+        self.produced_slots.inc(len(window) - len(skipped))
+        self.skipped_slots.inc(len(skipped))
+        self.recent_skipped.extendleft(skipped)
+        if skipped:
+            logger.warning("Validator {} skipped leader slots {}", self.identity, skipped)
+
+        self.windows[len(skipped)].inc()
+        update_metric(solana_val_leader_window_skip_rate, len(skipped) / len(window) * 100,
+                      labels={"identity": self.identity})
+
+    def export(self):
+        labels = {"identity": self.identity}
+        for position in range(RECENT_SKIPPED_SLOTS):
+            slot = self.recent_skipped[position] if position < len(self.recent_skipped) else 0
+            update_metric(solana_val_recent_skipped_slot, slot, labels={**labels, "position": str(position + 1)})
+
+
+def load_cursors(path=SKIPPED_SLOTS_CURSOR_FILE) -> dict:
+    try:
+        with open(path) as cursor_file:
+            return json.load(cursor_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cursors(trackers, path=SKIPPED_SLOTS_CURSOR_FILE):
+    cursors = {identity: tracker.cursor for identity, tracker in trackers.items() if tracker.cursor is not None}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Written aside and renamed, so a crash never leaves a half-written cursor file behind
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as cursor_file:
+        json.dump(cursors, cursor_file)
+    os.replace(temp_path, path)
+
+
+_saved_cursors = load_cursors()
+skip_trackers = {validator["pub_key"]: SkipTracker(validator["pub_key"], _saved_cursors.get(validator["pub_key"]))
+                 for validator in VALIDATORS}
+
+
+async def track_skipped_slots():
+    """Confirm the leader slots that passed since the last run and export produced and skipped slots."""
+    start_time = time.time()
+    try:
+        confirmed_slot, epoch_info = await asyncio.gather(
+            rpc.call("getSlot", [{"commitment": "confirmed"}]),
+            rpc.call("getEpochInfo")
+        )
+    except Exception as e:
+        logger.error("Error fetching the confirmed slot: {}", e)
+        return
+
+    for identity, tracker in skip_trackers.items():
+        try:
+            # A no-op unless the leader slot collector has not cached this epoch's schedule yet
+            await leader_schedules[identity].refresh(epoch_info["epoch"])
+            checked = await tracker.update(confirmed_slot, epoch_info["absoluteSlot"] - epoch_info["slotIndex"])
+        except Exception as e:
+            logger.error("Error tracking leader slots of {identity}: {}", e, identity=identity)
+            continue
+        tracker.export()
+        logger.debug("{identity} checked {} leader slots up to {}: {} produced, {} skipped", checked, confirmed_slot,
+                     tracker.produced, tracker.skipped, identity=identity)
+
+    try:
+        save_cursors(skip_trackers)
+    except OSError as e:
+        logger.error("Error saving the leader slot cursors: {}", e)
+
+    end_time = time.time()
+    logger.success("Collection completed in {latency:.2f} seconds.", latency=end_time - start_time)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+import aiohttp
+from loguru import logger
+from utils.func import update_metric
+from utils.rpc import rpc, WS_ENDPOINTS
+from modules.trend import record_slot, record_slot_diff, record_vote_height
+from config import VALIDATORS, STREAM_VOTES, STREAM_STALE_AFTER, STREAM_RECONNECT_MAX_DELAY
+from prometheus.metrics import (solana_current_slot, solana_net_current_slot, solana_slot_diff, solana_root_slot,
+                                solana_stream_up, solana_validator_vote_height, solana_network_vote_height,
+                                solana_vote_height_diff)
+
+# Gauges each endpoint's stream feeds, the same ones get_slots and get_votes set when polling
+SLOT_GAUGES = {"network": solana_current_slot, "validator": solana_net_current_slot}
+VOTE_GAUGES = {"network": solana_network_vote_height, "validator": solana_validator_vote_height}
+
+# Identities of the monitored vote accounts
+IDENTITIES = {validator["vote_pub_key"]: validator["pub_key"] for validator in VALIDATORS}
+
+
+def subscriptions():
+    """PubSub methods to subscribe to, mapped to the kind of update their notifications carry."""
+    methods = {"slotSubscribe": "slot", "rootSubscribe": "root"}
+    if STREAM_VOTES:
+        methods["voteSubscribe"] = "vote"
+    return methods
+
+
+class SlotStream:
+    """
+    Holds a PubSub WebSocket connection to one endpoint and exports slot, root and vote updates as they arrive.
+
+    The connection is re-established with exponential backoff whenever it drops or stays silent for longer than
+    `stream_stale_after`. While a kind of update is not live the polling collectors keep exporting it.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.url = WS_ENDPOINTS[endpoint]
+        self.slot = None
+        self.root = None
+        self.votes = {}
+        self._updated = {}
+        self._kinds = {}
+
+    def is_live(self, kind="slot", identity=None):
+        """Whether a notification of this kind (about this identity) arrived recently enough to trust it."""
+        updated = self._updated.get(kind if identity is None else (kind, identity))
+        return updated is not None and time.monotonic() - updated < STREAM_STALE_AFTER
+
+    async def run(self):
+        delay = 1
+        while True:
+            try:
+                if await self._listen():
+                    delay = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("{} stream {}: {} {}", self.endpoint.upper(), self.url, type(e).__name__, e)
+            finally:
+                self._kinds.clear()
+                update_metric(solana_stream_up, 0, labels={"rpc": self.endpoint})
+
+            logger.info("{} stream: reconnecting in {} seconds", self.endpoint.upper(), delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, STREAM_RECONNECT_MAX_DELAY)
+
+    async def _listen(self):
+        """Subscribe and process notifications until the connection ends. Returns whether anything was received."""
+        received = False
+        requests = {}
+        session = await rpc.get_session()
+        async with session.ws_connect(self.url, heartbeat=STREAM_STALE_AFTER,
+                                      receive_timeout=STREAM_STALE_AFTER) as ws:
+            for req_id, method in enumerate(subscriptions(), 1):
+                requests[req_id] = method
+                await ws.send_json({"jsonrpc": "2.0", "id": req_id, "method": method})
+            logger.info("{} stream: connected to {}", self.endpoint.upper(), self.url)
+            update_metric(solana_stream_up, 1, labels={"rpc": self.endpoint})
+
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    self._handle(json.loads(message.data), requests)
+                    received = True
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    raise ws.exception()
+        return received
+
+    def _handle(self, message, requests):
+        # Subscription confirmations carry the request id, notifications the subscription id
+        if "id" in message:
+            method = requests.get(message["id"])
+            if "error" in message:
+                logger.warning("{} stream: {} is not available - {}", self.endpoint.upper(), method,
+                               message['error'].get('message'))
+            elif method is not None:
+                self._kinds[message.get("result")] = subscriptions()[method]
+            return
+
+        params = message.get("params") or {}
+        kind = self._kinds.get(params.get("subscription"))
+        result = params.get("result")
+        if kind == "slot":
+            self._on_slot(result["slot"])
+        elif kind == "root":
+            self._on_root(result)
+        elif kind == "vote":
+            self._on_vote(result)
+
+    def _on_slot(self, slot):
+        self.slot = slot
+        self._updated["slot"] = time.monotonic()
+        update_metric(SLOT_GAUGES[self.endpoint], slot)
+        record_slot(self.endpoint, slot)
+
+        validator, network = streams["validator"], streams["network"]
+        if validator.is_live("slot") and network.is_live("slot"):
+            update_metric(solana_slot_diff, validator.slot - network.slot)
+            record_slot_diff(validator.slot - network.slot)
+
+    def _on_root(self, root):
+        self.root = root
+        self._updated["root"] = time.monotonic()
+        update_metric(solana_root_slot, root, labels={"rpc": self.endpoint})
+
+    def _on_vote(self, vote):
+        # Votes of the whole cluster are streamed; only the monitored vote accounts are exported
+        identity = IDENTITIES.get(vote.get("votePubkey"))
+        if identity is None or not vote.get("slots"):
+            return
+        self.votes[identity] = max(vote["slots"])
+        self._updated[("vote", identity)] = time.monotonic()
+        update_metric(VOTE_GAUGES[self.endpoint], self.votes[identity],
+                      labels={"identity": identity, "rpc": self.endpoint})
+        record_vote_height(identity, self.endpoint, self.votes[identity])
+
+        validator, network = streams["validator"], streams["network"]
+        if validator.is_live("vote", identity) and network.is_live("vote", identity):
+            update_metric(solana_vote_height_diff, validator.votes[identity] - network.votes[identity],
+                          labels={"identity": identity})
+
+
+streams = {endpoint: SlotStream(endpoint) for endpoint in WS_ENDPOINTS}
+
+
+def is_streaming(endpoint, kind="slot", identity=None):
+    """Whether the endpoint's stream currently provides this kind of update, so polling can leave it alone."""
+    return streams[endpoint].is_live(kind, identity)
+
+
+async def run_streams():
+    """Keep the slot streams of every endpoint running until cancelled."""
+    await asyncio.gather(*[stream.run() for stream in streams.values()])
@@ -0,0 +1,73 @@
+import time
+from loguru import logger
+from utils.func import update_metric
+from utils.history import history
+from config import CAUGHT_UP_SLOTS
+from prometheus.metrics import (solana_slot_rate, solana_block_height_diff_avg, solana_block_height_diff_trend,
+                                solana_vote_height_rate, solana_vote_credit_rate, solana_transaction_rate,
+                                solana_time_since_caught_up)
+
+# When the validator was last within CAUGHT_UP_SLOTS of the network, and when the slot difference was first seen
+_last_caught_up = None
+_watching_since = None
+
+
+def record_slot(endpoint, slot):
+    """Add a slot sample of the endpoint and export its slots per second."""
+    series = history("slot", rpc=endpoint)
+    series.add(slot)
+    rate = series.rate()
+    if rate is not None:
+        update_metric(solana_slot_rate, rate, labels={"rpc": endpoint})
+
+
+def record_slot_diff(slot_diff):
+    """Track how long ago the validator was last caught up with the network."""
+    global _last_caught_up, _watching_since
+    now = time.monotonic()
+    if _watching_since is None:
+        _watching_since = now
+    if slot_diff >= -CAUGHT_UP_SLOTS:
+        _last_caught_up = now
+
+    # Without a caught-up sample yet, the validator has been behind at least since the first one
+    since = now - (_last_caught_up if _last_caught_up is not None else _watching_since)
+    update_metric(solana_time_since_caught_up, since)
+
+
+def record_block_height_diff(block_height_diff):
+    """Add a block height difference sample and export its moving average and trend per minute."""
+    series = history("block_height_diff")
+    series.add(block_height_diff)
+    update_metric(solana_block_height_diff_avg, series.average())
+    trend = series.slope()
+    if trend is not None:
+        update_metric(solana_block_height_diff_trend, trend * 60)
+        logger.debug("Block height diff trend: {:.2f} blocks/min", trend * 60)
+
+
+def record_vote_height(identity, endpoint, vote_height):
+    """Add a last vote sample of the identity seen by the endpoint and export how fast it advances."""
+    series = history("vote_height", identity=identity, rpc=endpoint)
+    series.add(vote_height)
+    rate = series.rate()
+    if rate is not None:
+        update_metric(solana_vote_height_rate, rate, labels={"identity": identity, "rpc": endpoint})
+
+
+def record_credits(identity, total_credits):
+    """Add a total vote credits sample of the identity and export the credits earned per minute."""
+    series = history("credits", identity=identity)
+    series.add(total_credits)
+    rate = series.rate()
+    if rate is not None:
+        update_metric(solana_vote_credit_rate, rate * 60, labels={"identity": identity})
+
+
+def record_transaction_count(transaction_count):
+    """Add a cluster transaction count sample and export the transactions per second."""
+    series = history("transaction_count")
+    series.add(transaction_count)
+    rate = series.rate()
+    if rate is not None:
+        update_metric(solana_transaction_rate, rate)
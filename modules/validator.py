@@ -1,160 +1,150 @@
-import inspect
-import json
+import asyncio
 import time
-import aiohttp
-import subprocess
+import numpy as np
 from loguru import logger
-from config import PUB_KEY, VOTE_PUB_KEY, NETWORK_RPC_ENDPOINT, SOLANA_BINARY_PATH, HEADERS
+from config import VALIDATORS
 from utils.func import update_metric
+from utils.rpc import rpc
+from utils.vote_accounts import parse_vote_accounts, to_columns
+from modules.trend import record_credits
 from prometheus.metrics import (solana_active_stake, solana_current_stake, solana_delinquent_stake, solana_vote_credits,
                                 solana_active_validators, solana_validator_activated_stake, solana_val_status,
-                                solana_total_credits, solana_val_commission, solana_avg_vote_credits)
+                                solana_total_credits, solana_val_commission, solana_avg_vote_credits,
+                                solana_cluster_vote_credits, solana_stake_weighted_vote_credits,
+                                solana_vote_credits_rank, solana_vote_credits_percentile, solana_last_vote_lag,
+                                solana_nakamoto_coefficient, solana_val_delinquent)
 
+# Cluster vote credit percentiles exported as solana_cluster_vote_credits
+CREDIT_QUANTILES = {"0.1": 10, "0.5": 50, "0.9": 90}
 
-def get_validators():
-    """Fetch validators information using Solana CLI and update Prometheus modules."""
-    try:
-        result = subprocess.run(
-            [SOLANA_BINARY_PATH, "validators", "--output", "json-compact"],
-            capture_output=True, text=True, check=True
-        )
-        logger.info("Successfully executed solana validators command.")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error while running solana validators command: {e}")
-        return None
-
-    # Remove any "Note:" lines that might be in the output
-    validators = "\n".join([line for line in result.stdout.splitlines() if "Note:" not in line])
-
-    try:
-        # Parse the JSON data from Solana validators
-        validators_data = json.loads(validators)
-        logger.info("Block production data successfully parsed.")
-    except json.JSONDecodeError as e:
-        logger.error(f"Error decoding JSON from block production data: {e}")
-        return None
 
-    # Return parsed data
-    return validators_data
+def process_stake_totals(columns):
+    """Compute cluster stake totals from the vote account snapshot and update Prometheus metrics."""
+    current_stake = columns.stake[~columns.delinquent].sum() / 10 ** 9
+    delinquent_stake = columns.stake[columns.delinquent].sum() / 10 ** 9
+    active_stake = current_stake + delinquent_stake
+    logger.debug("Active Stake: {:.2f}, Current Stake: {:.2f}, Delinquent Stake: {:.2f}", active_stake, current_stake,
+                 delinquent_stake)
 
-
-def process_metrics(validators_data):
-    if not validators_data:
-        logger.warning("No validator data available to process.")
-        return
-
-    # Retrieve network modules
-    try:
-        active_stake = validators_data.get('totalActiveStake') / 10 ** 9
-        current_stake = validators_data.get('totalCurrentStake') / 10 ** 9
-        delinquent_stake = validators_data.get('totalDelinquentStake') / 10 ** 9
-        logger.debug(f'Active Stake: {round(active_stake, 2)}, Current Stake: {round(current_stake, 2)}, '
-                     f'Delinquent Stake: {round(delinquent_stake, 2)}')
-    except KeyError as e:
-        logger.error(f"EKey error when extracting validator-specific modules: {e}")
-        return
-
-    # Dictionary mapping Prometheus Gauges to their corresponding values
     update_metric(solana_active_stake, active_stake)
     update_metric(solana_current_stake, current_stake)
     update_metric(solana_delinquent_stake, delinquent_stake)
 
-
-def validator_metrics():
-    logger.info(f"{inspect.currentframe().f_code.co_name}: Starting modules collection process.")
-    start_time = time.time()
-
-    # Fetch validators data
-    validators_data = get_validators()
-
-    # Process and send modules to Prometheus
-    process_metrics(validators_data)
-
-    end_time = time.time()
-    logger.success(f"{inspect.currentframe().f_code.co_name}: All modules have been successfully collected and sent "
-                   f"to Prometheus. Time: {end_time - start_time}")
+    # Nakamoto coefficient: the fewest largest validators whose stake adds up to more than a third
+    stake = np.sort(columns.stake)[::-1]
+    if stake.size and stake[0] > 0:
+        nakamoto = int(np.searchsorted(np.cumsum(stake), stake.sum() / 3, side='right')) + 1
+        update_metric(solana_nakamoto_coefficient, nakamoto)
+        logger.debug("Nakamoto coefficient: {}", nakamoto)
+
+
+def process_credit_stats(columns):
+    """Compute cluster vote credit statistics and return the credits of the accounts earning them this epoch."""
+    earning = (columns.stake > 0) & columns.credited
+    credits = columns.credits[earning]
+    if not credits.size:
+        return credits
+
+    avg_vote_credits = credits.mean()
+    weighted_vote_credits = np.average(credits, weights=columns.stake[earning])
+    update_metric(solana_avg_vote_credits, avg_vote_credits)
+    update_metric(solana_stake_weighted_vote_credits, weighted_vote_credits)
+    for quantile, value in zip(CREDIT_QUANTILES, np.percentile(credits, list(CREDIT_QUANTILES.values()))):
+        update_metric(solana_cluster_vote_credits, value, labels={"quantile": quantile})
+
+    logger.debug("Average Network Vote credits: {}, stake-weighted: {:.2f}", avg_vote_credits, weighted_vote_credits)
+    return credits
+
+
+def process_credit_rank(identity, columns, row, credits):
+    """Rank the validator's vote credits and last vote against the rest of the cluster."""
+    labels = {"identity": identity}
+    if credits.size:
+        own_credits = columns.credits[row]
+        rank = int(np.count_nonzero(credits > own_credits)) + 1
+        percentile = np.count_nonzero(credits < own_credits) / credits.size * 100
+        update_metric(solana_vote_credits_rank, rank, labels=labels)
+        update_metric(solana_vote_credits_percentile, percentile, labels=labels)
+        logger.debug("Validator {identity} vote credits rank: {}, percentile: {:.2f}", rank, percentile,
+                     identity=identity)
+
+    last_votes = columns.last_vote[~columns.delinquent]
+    if last_votes.size:
+        last_vote_lag = np.median(last_votes) - columns.last_vote[row]
+        update_metric(solana_last_vote_lag, last_vote_lag, labels=labels)
 
 
 async def get_vote_accounts():
     """Fetch vote account information using RPC and update Prometheus metrics."""
-    payload = [
-        {"jsonrpc": "2.0", "id": 1, "method": "getVoteAccounts", "params": [{"commitment": "recent"}]},
-        {"jsonrpc": "2.0", "id": 2, "method": "getEpochInfo"}
-    ]
-
-    logger.info(f"{inspect.currentframe().f_code.co_name}: Starting modules collection process.")
+    logger.info("Starting modules collection process.")
     start_time = time.time()
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(NETWORK_RPC_ENDPOINT, json=payload, headers=HEADERS) as response:
-                response.raise_for_status()
-                result = await response.json()
-
-        current_val = result[0]['result'].get('current', [])
-        delinquent_val = result[0]['result'].get('delinquent', [])
-        current_epoch = result[1]['result']['epoch']
+        # The vote account list is parsed as it streams in instead of being decoded whole
+        (current_val, delinquent_val), epoch_info = await asyncio.gather(
+            rpc.stream_call("getVoteAccounts", parse_vote_accounts, [{"commitment": "recent"}]),
+            rpc.call("getEpochInfo")
+        )
+        current_epoch = epoch_info['epoch']
 
         update_metric(solana_active_validators, len(current_val), labels={"state": "current"})
         update_metric(solana_active_validators, len(delinquent_val), labels={"state": "delinquent"})
 
-        logger.debug(f'Current: {len(current_val)}, Delinquent: {len(delinquent_val)}')
-
-        all_vote_credits = []
-        vote_account = None
-
-        all_accounts = current_val + delinquent_val
-
-        for account in all_accounts:
-            if account.get('nodePubkey') == PUB_KEY:
-                vote_account = account
-                if account in delinquent_val:
-                    logger.error("Your Solana validator is in DELINQUENT state")
+        logger.debug("Current: {}, Delinquent: {}", len(current_val), len(delinquent_val))
 
-            activated_stake = account.get('activatedStake')
-            epoch_credits = account.get('epochCredits', [])
+        # Cluster-wide statistics are computed on column arrays instead of account by account
+        columns = to_columns(current_val, delinquent_val, current_epoch)
+        process_stake_totals(columns)
+        credits = process_credit_stats(columns)
 
-            if activated_stake and epoch_credits:
-                last_epoch = epoch_credits[-1]
-                if last_epoch and current_epoch == last_epoch[0]:
-                    vote_credits = last_epoch[1] - last_epoch[2]
-                    all_vote_credits.append(vote_credits)
+        identities = [validator["pub_key"] for validator in VALIDATORS]
+        rows = {columns.node_pubkey[row]: int(row) for row in np.flatnonzero(np.isin(columns.node_pubkey, identities))}
 
-        if all_vote_credits:
-            avg_vote_credits = sum(all_vote_credits) / len(all_vote_credits)
-            update_metric(solana_avg_vote_credits, avg_vote_credits)
-            logger.debug(f'Average Network Vote credits: {avg_vote_credits}')
+        for identity in identities:
+            row = rows.get(identity)
+            if row is None:
+                logger.error("Validator account {identity} not found in both current and delinquent lists.",
+                             identity=identity)
+                continue
 
-        if vote_account:
-            process_vote_account(vote_account)
-        else:
-            logger.error("Validator account not found in both current and delinquent lists.")
+            update_metric(solana_val_delinquent, 1 if columns.delinquent[row] else 0, labels={"identity": identity})
+            if columns.delinquent[row]:
+                logger.error("Your Solana validator {identity} is in DELINQUENT state", identity=identity)
+                vote_account = delinquent_val[row - len(current_val)]
+            else:
+                vote_account = current_val[row]
+            process_vote_account(identity, vote_account)
+            process_credit_rank(identity, columns, row, credits)
 
     except Exception as e:
-        logger.error(f"Error fetching or processing vote accounts: {e}")
+        logger.error("Error fetching or processing vote accounts: {}", e)
 
     end_time = time.time()
-    logger.success(f"{inspect.currentframe().f_code.co_name}: Collection completed in {end_time - start_time:.2f} seconds.")
+    logger.success("Collection completed in {latency:.2f} seconds.", latency=end_time - start_time)
 
 
-def process_vote_account(vote_account):
-    """Process and update metrics for the given vote account."""
-    val_stake = vote_account.get('activatedStake') / 10 ** 9
-    commission = vote_account.get('commission')
-    epoch_vote = vote_account.get('epochVoteAccount')
-    root_slot = vote_account.get('rootSlot')
-    last_epoch = vote_account.get('epochCredits')[-1]
+def process_vote_account(identity, vote_account):
+    """Process and update metrics for the vote account of the given identity."""
+    val_stake = vote_account.activated_stake / 10 ** 9
+    commission = vote_account.commission
+    epoch_vote = vote_account.epoch_vote_account
+    last_epoch = vote_account.epoch_credits
     vote_credits = last_epoch[1] - last_epoch[2]
     total_credits = last_epoch[1]
 
-    update_metric(solana_validator_activated_stake, val_stake, labels={"pubkey": PUB_KEY, "votekey": VOTE_PUB_KEY})
-    update_metric(solana_val_commission, commission, labels={"commission": str(commission)})
+    labels = {"identity": identity}
+    update_metric(solana_validator_activated_stake, val_stake,
+                  labels={"pubkey": identity, "votekey": vote_account.vote_pubkey})
+    update_metric(solana_val_commission, commission, labels={**labels, "commission": str(commission)})
 
-    logger.debug(f'Validator Stake: {round(val_stake, 2)}, Commission: {commission}, Epoch vote: {epoch_vote}, '
-                 f'Vote credits: {vote_credits}, Total credits: {total_credits}')
+    logger.debug("Validator {identity} Stake: {:.2f}, Commission: {}, Epoch vote: {}, Vote credits: {}, "
+                 "Total credits: {}", val_stake, commission, epoch_vote, vote_credits, total_credits,
+                 identity=identity)
 
-    update_metric(solana_val_status, 1 if epoch_vote else 0, labels={"state": "voting" if epoch_vote else "not voting"})
-    update_metric(solana_vote_credits, vote_credits)
-    update_metric(solana_total_credits, total_credits)
+    update_metric(solana_val_status, 1 if epoch_vote else 0,
+                  labels={**labels, "state": "voting" if epoch_vote else "not voting"})
+    update_metric(solana_vote_credits, vote_credits, labels=labels)
+    update_metric(solana_total_credits, total_credits, labels=labels)
+    record_credits(identity, total_credits)
 
-    logger.info("Updated Prometheus metrics for validator.")
+    logger.info("Updated Prometheus metrics for validator {identity}.", identity=identity)
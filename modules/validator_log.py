@@ -0,0 +1,117 @@
+import asyncio
+import re
+import threading
+import time
+from loguru import logger
+from utils.func import update_metric
+from utils.tail import FileTailer
+from config import VALIDATOR_LOG
+from prometheus.metrics import (solana_log_datapoints, solana_log_datapoint_value, solana_log_datapoint,
+                                solana_exporter_log_bytes, solana_exporter_log_lag_bytes)
+
+# Datapoint families and fields followed when `validator_log.datapoints` is not set in config.yml. A gauge field
+# exports its latest value, a counter field the sum of all its values since the exporter started.
+DEFAULT_DATAPOINTS = {
+    "replay-slot-stats": {"slot": "gauge", "replay_time": "counter", "execute_batches_us": "counter",
+                          "total_entries": "counter", "total_shreds": "counter"},
+    "replay-loop-timing-stats": {"total_elapsed_us": "counter", "compute_bank_stats_elapsed": "counter",
+                                 "voting_elapsed": "counter"},
+    "banking_stage-leader_slot_packet_counts": {"total_new_valid_packets": "counter",
+                                                "newly_buffered_packets_count": "counter",
+                                                "committed_transactions_count": "counter",
+                                                "retryable_packets_count": "gauge"},
+    "repair_service-my_requests": {"repair-total": "counter", "shred-count": "counter",
+                                   "highest-shred-count": "counter", "orphan": "counter"},
+    "recv-window-insert-shreds": {"num_shreds_received": "counter", "num_repairs": "counter",
+                                  "handle_packets_elapsed_us": "counter"},
+}
+
+
+class DatapointParser:
+    """
+    Picks the subscribed fields of the subscribed datapoint families out of validator log lines.
+
+    Lines look like `[<time> INFO  solana_metrics::metrics] datapoint: <family> <field>=<value> ...`, with
+    integer values suffixed by `i`. One precompiled pattern holds the prefixes of all subscribed families, so
+    the regex engine skips every other line of a chunk without Python seeing it. Only the fields of a matching
+    line are split, and only the subscribed ones are converted.
+    """
+
+    def __init__(self, families: dict):
+        self.families = {family.encode(): {field.encode(): kind for field, kind in fields.items()}
+                         for family, fields in families.items()}
+        names = b"|".join(re.escape(family) for family in self.families)
+        self._pattern = re.compile(rb"datapoint: (" + names + rb") ([^\n]*)")
+        self.counts = {family: 0 for family in self.families}
+        self.values = {}
+        self.sums = {(family, field): 0.0 for family, fields in self.families.items()
+                     for field, kind in fields.items() if kind == "counter"}
+
+    def feed(self, chunk: bytes):
+        families, counts, values, sums = self.families, self.counts, self.values, self.sums
+        for family, fields in self._pattern.findall(chunk):
+            counts[family] += 1
+            wanted = families[family]
+            for item in fields.split(b" "):
+                field, _, value = item.partition(b"=")
+                kind = wanted.get(field)
+                if kind is None:
+                    continue
+                try:
+                    number = float(value[:-1] if value.endswith(b"i") else value)
+                except ValueError:
+                    continue
+                if kind == "counter":
+                    sums[family, field] += number
+                else:
+                    values[family, field] = number
+
+
+parser = DatapointParser(VALIDATOR_LOG.get("datapoints") or DEFAULT_DATAPOINTS)
+tailer = FileTailer(VALIDATOR_LOG.get("path", "/var/log/solana/solana.log"),
+                    VALIDATOR_LOG.get("offset_file", "logs/solana_log_offset.json"),
+                    VALIDATOR_LOG.get("chunk_size", 4 * 1024 * 1024))
+# A run that timed out may still be reading in its thread when the next one starts
+_lock = threading.Lock()
+# Every counter field's series starts at zero, so its first increase is not lost to rate()
+counters = {(family, field): solana_log_datapoint.labels(family=family.decode(), field=field.decode())
+            for family, field in parser.sums}
+
+
+def consume():
+    """Parse the lines written since the last run and save the new offset; returns the bytes parsed."""
+    parsed = 0
+    with _lock:
+        before = dict(parser.sums)
+        for chunk in tailer.read(VALIDATOR_LOG.get("max_read", 256 * 1024 * 1024)):
+            parser.feed(chunk)
+            parsed += len(chunk)
+        tailer.save_offset()
+        # The counters grow by the values parsed in this run; a counter cannot go down, so a negative sum is dropped
+        for key, total in parser.sums.items():
+            if total > before[key]:
+                counters[key].inc(total - before[key])
+    return parsed
+
+
+async def tail_validator_log():
+    """Follow the validator log and export the subscribed datapoint fields."""
+    start_time = time.time()
+    try:
+        # Parsing a large backlog takes a while; in a thread it does not hold up the other collectors' I/O
+        parsed = await asyncio.to_thread(consume)
+    except OSError as e:
+        logger.error("Error reading the validator log {}: {}", tailer.path, e)
+        return
+
+    solana_exporter_log_bytes.inc(parsed)
+    solana_exporter_log_lag_bytes.set(tailer.lag())
+    for family, count in parser.counts.items():
+        update_metric(solana_log_datapoints, count, labels={"family": family.decode()})
+    for metric, values in ((solana_log_datapoint_value, parser.values), (solana_log_datapoint, parser.sums)):
+        for (family, field), value in values.items():
+            update_metric(metric, value, labels={"family": family.decode(), "field": field.decode()})
+
+    end_time = time.time()
+    logger.debug("Parsed {} bytes of the validator log in {latency:.2f} seconds", parsed,
+                 latency=end_time - start_time)
@@ -1,119 +1,109 @@
-import inspect
-import time
-import aiohttp
 import asyncio
 from loguru import logger
 from utils.func import update_metric
-from config import VALIDATOR_RPC_ENDPOINT, NETWORK_RPC_ENDPOINT, VOTE_PUB_KEY, HEADERS, RETRY
+from utils.rpc import policy, RpcError, ENDPOINTS
+from modules.stream import is_streaming
+from modules.trend import record_vote_height
+from config import VALIDATORS
 from prometheus.metrics import solana_validator_vote_height, solana_network_vote_height, solana_vote_height_diff
 
-rpc_urls = {
-    "network": NETWORK_RPC_ENDPOINT,
-    "validator": VALIDATOR_RPC_ENDPOINT
-}
+rpc_urls = ENDPOINTS
 
 
-def get_vote_accounts(result):
-    if "error" in result:
-        error_code = result["error"].get("code", "Unknown code")
-        error_message = result["error"].get("message", "Unknown message")
-        logger.error(f"Error fetching vote accounts - code: {error_code}, message: {error_message}")
+def get_vote_accounts(results, index):
+    if results is None:
         return None
-    return result.get('result', {}).get('current', []) or result.get('result', {}).get('delinquent', [])
+    result = results[index]
+    if isinstance(result, RpcError):
+        logger.error("Error fetching vote accounts - code: {}, message: {}", result.code, result.message)
+        return None
+    return result.get('current', []) or result.get('delinquent', [])
 
 
-async def measure_rpc_response_time(url, session, payload):
+async def measure_rpc_response_time(endpoint, requests):
     try:
-        start_time = time.time()
-        async with session.post(url, json=payload, headers=HEADERS) as response:
-            result = await response.json()
-        end_time = time.time()
-        return result, end_time - start_time
+        result, attempt, response_time = await policy.batch(requests, endpoint)
+        if attempt > 1:
+            logger.debug("{endpoint} answered by attempt {}", attempt, endpoint=endpoint, latency=response_time)
+        return result, response_time
     except Exception as e:
-        logger.error(f"Error while accessing {url}: {e}")
+        logger.error("Error while accessing {endpoint} RPC {}: {} {}", rpc_urls[endpoint], type(e).__name__, e,
+                     endpoint=endpoint)
         return None, None
 
 
-async def make_requests(payload, func_name):
-    async with aiohttp.ClientSession() as session:
-        raw_results = await asyncio.gather(
-            *[measure_rpc_response_time(url, session, payload) for url in rpc_urls.values()],
-            return_exceptions=True
-        )
+async def make_requests(requests):
+    raw_results = await asyncio.gather(
+        *[measure_rpc_response_time(name, requests) for name in rpc_urls.keys()],
+        return_exceptions=True
+    )
 
-        results = []
-        response_times = {}
+    results = []
+    response_times = {}
 
-        for (row, response_time), name in zip(raw_results, rpc_urls.keys()):
-            if row is not None:
-                results.append(row)
-            response_times[name] = response_time
-        network_time = response_times.get('network')
-        validator_time = response_times.get('validator')
+    for (row, response_time), name in zip(raw_results, rpc_urls.keys()):
+        results.append(row)
+        response_times[name] = response_time
+    network_time = response_times.get('network')
+    validator_time = response_times.get('validator')
 
-        if network_time is not None:
-            logger.debug(f"{func_name.upper()} Response time for network: {network_time:.4f} seconds")
-        else:
-            logger.warning(f"{func_name.upper()} No valid response time for network")
+    if network_time is not None:
+        logger.debug("Response time for {endpoint}: {latency:.4f} seconds", endpoint="network", latency=network_time)
+    else:
+        logger.warning("No valid response time for {endpoint}", endpoint="network")
 
-        if validator_time is not None:
-            logger.debug(f"{func_name.upper()} Response time for validator: {validator_time:.4f} seconds")
-        else:
-            logger.warning(f"{func_name.upper()} No valid response time for validator")
+    if validator_time is not None:
+        logger.debug("Response time for {endpoint}: {latency:.4f} seconds", endpoint="validator",
+                     latency=validator_time)
+    else:
+        logger.warning("No valid response time for {endpoint}", endpoint="validator")
 
     return results, response_times
 
 
 async def get_votes():
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 1,
-        "method": "getVoteAccounts",
-        "params": [
-            {
-                "votePubkey": VOTE_PUB_KEY
-            }
-        ]
-    }
-    func_name = inspect.currentframe().f_code.co_name
-    blocks, response_times = await make_requests(payload, func_name)
-
-    retry_count = 0
-    last_blocks = None
-    while retry_count < RETRY and any(t is not None and t > 1 for t in response_times.values()):
-        retry_count += 1
-        logger.info("One or more requests took longer than 1 second. Retrying...")
-        blocks, response_times = await make_requests(payload, func_name)
-
-        last_blocks = blocks
-
-    if retry_count == RETRY:
-        blocks = last_blocks
+    # One getVoteAccounts call per validator, all sent in the same batch to each endpoint
+    requests = [("getVoteAccounts", [{"votePubkey": validator["vote_pub_key"]}]) for validator in VALIDATORS]
+    blocks, _ = await make_requests(requests)
 
     try:
         results = blocks
-        validator_vote_height = network_vote_height = None
-        if results:
-            vote_accounts_network = get_vote_accounts(results[0]) if len(results) > 0 else None
-            if vote_accounts_network:
-                network_vote_height = vote_accounts_network[0]['lastVote']
-                update_metric(solana_network_vote_height, network_vote_height, labels={"rpc": "network"})
-                logger.debug(f"Network vote height: {network_vote_height}")
-            else:
-                logger.warning(f"{func_name.upper()} No vote data for network")
-
-            vote_accounts_validator = get_vote_accounts(results[1]) if len(results) > 1 else None
-            if vote_accounts_validator:
-                validator_vote_height = vote_accounts_validator[0]['lastVote']
-                update_metric(solana_validator_vote_height, validator_vote_height, labels={"rpc": "validator"})
-                logger.debug(f"Validator vote height: {validator_vote_height}")
-            else:
-                logger.warning(f"{func_name.upper()} No vote data for validator")
-
-            if vote_accounts_network and vote_accounts_validator:
-                update_metric(solana_vote_height_diff, validator_vote_height - network_vote_height)
-                logger.debug(f"Diff vote height: {validator_vote_height - network_vote_height}")
+        if any(results):
+            for index, validator in enumerate(VALIDATORS):
+                process_votes(validator["pub_key"], results, index)
         else:
-            logger.error(f"Error processing vote data: {results}")
+            logger.error("Error processing vote data: {}", results)
     except Exception as e:
-        logger.error(f"Error processing vote data: {e}")
+        logger.error("Error processing vote data: {}", e)
+
+
+def process_votes(identity, results, index):
+    validator_vote_height = network_vote_height = None
+
+    vote_accounts_network = get_vote_accounts(results[0], index) if len(results) > 0 else None
+    if vote_accounts_network:
+        network_vote_height = vote_accounts_network[0]['lastVote']
+        if not is_streaming("network", "vote", identity):
+            update_metric(solana_network_vote_height, network_vote_height,
+                          labels={"identity": identity, "rpc": "network"})
+            record_vote_height(identity, "network", network_vote_height)
+        logger.debug("{identity} network vote height: {}", network_vote_height, identity=identity)
+    else:
+        logger.warning("No vote data of {identity} for {endpoint}", identity=identity, endpoint="network")
+
+    vote_accounts_validator = get_vote_accounts(results[1], index) if len(results) > 1 else None
+    if vote_accounts_validator:
+        validator_vote_height = vote_accounts_validator[0]['lastVote']
+        if not is_streaming("validator", "vote", identity):
+            update_metric(solana_validator_vote_height, validator_vote_height,
+                          labels={"identity": identity, "rpc": "validator"})
+            record_vote_height(identity, "validator", validator_vote_height)
+        logger.debug("{identity} validator vote height: {}", validator_vote_height, identity=identity)
+    else:
+        logger.warning("No vote data of {identity} for {endpoint}", identity=identity, endpoint="validator")
+
+    streamed = is_streaming("validator", "vote", identity) and is_streaming("network", "vote", identity)
+    if vote_accounts_network and vote_accounts_validator and not streamed:
+        update_metric(solana_vote_height_diff, validator_vote_height - network_vote_height,
+                      labels={"identity": identity})
+        logger.debug("{identity} diff vote height: {}", validator_vote_height - network_vote_height, identity=identity)
@@ -1,42 +1,77 @@
-from prometheus_client import Gauge
+from prometheus_client import Counter, Histogram, Gauge as LiveGauge
+# Gauges write to the metric store, which publishes them atomically per collection cycle
+from prometheus.snapshot import Gauge
 
 # Prometheus Gauges
 # balance module
-solana_account_balance = Gauge('solana_account_balance', 'Identity account balance')
-solana_vote_account_balance = Gauge('solana_vote_account_balance', 'Vote account balance')
+solana_account_balance = Gauge('solana_account_balance', 'Identity account balance', ['identity'])
+solana_vote_account_balance = Gauge('solana_vote_account_balance', 'Vote account balance', ['identity'])
 
 # block module
 solana_net_skip_rate = Gauge('solana_net_skip_rate', 'Network skip rate')
 solana_skipped_total = Gauge('solana_skipped_total', 'Total skipped slots of network in current epoch')
-solana_val_blocks_produced = Gauge('solana_val_blocks_produced', 'Blocks produced of a validator in current epoch')
-solana_val_skip_rate = Gauge('solana_val_skip_rate', 'Validator skip rate')
-solana_val_skipped_slots = Gauge('solana_val_skipped_slots', 'Skipped slots of a validator in current epoch')
+solana_val_blocks_produced = Gauge('solana_val_blocks_produced', 'Blocks produced of a validator in current epoch',
+                                   ['identity'])
+solana_val_skip_rate = Gauge('solana_val_skip_rate', 'Validator skip rate', ['identity'])
+solana_val_skipped_slots = Gauge('solana_val_skipped_slots', 'Skipped slots of a validator in current epoch',
+                                 ['identity'])
 solana_total_blocks_produced = Gauge('solana_total_blocks_produced', 'Total blocks produced in current epoch')
-solana_skip_rate_diff = Gauge('solana_skip_rate_diff', 'Skip rate difference of network and validator')
-solana_val_leader_slots = Gauge('solana_val_leader_slots', 'Leader slots of a validator in current epoch')
+solana_skip_rate_diff = Gauge('solana_skip_rate_diff', 'Skip rate difference of network and validator', ['identity'])
+solana_val_leader_slots = Gauge('solana_val_leader_slots', 'Leader slots of a validator in current epoch', ['identity'])
 solana_total_slots = Gauge('solana_total_slots', 'Total slots in current epoch')
 solana_confirmed_epoch_first_slot = Gauge('solana_confirmed_epoch_first_slot', 'First slot in current epoch')
 solana_confirmed_epoch_last_slot = Gauge('solana_confirmed_epoch_last_slot', 'Last slot in current epoch')
 
 # epoch module
-solana_node_version = Gauge('solana_node_version', 'Node version of solana', ['version'])
+solana_node_version = Gauge('solana_node_version', 'Node version of solana', ['version'],
+                            exclusive=['version'], retired_value=0, max_series=10)
 solana_network_epoch = Gauge('solana_network_epoch', 'Current epoch of network (max confirmation)')
 solana_tx_count = Gauge('solana_tx_count', 'solana transaction count')
 solana_slot_in_epoch = Gauge('solana_slot_in_epoch', 'solana_slot_in_epoch')
 solana_slot_index = Gauge('solana_slot_index', 'solana_slot_index')
 
 # leader_slot module
-solana_val_total_leader_slots = Gauge('solana_val_total_leader_slots', 'Total number of leader slots in current epoch')
-solana_next_leader_slot = Gauge('solana_next_leader_slot', 'The next leader slot')
-solana_time_to_next_slot = Gauge('solana_time_to_next_slot', 'Time until the next leader slot in seconds')
-solana_avg_slot_duration = Gauge('solana_avg_slot_duration', 'Average slot duration in seconds')
-solana_next_slot_time = Gauge('solana_next_slot_time', 'Time of the next leader slot')
-solana_previous_leader_slot = Gauge('solana_previous_leader_slot', 'The previous leader slot')
+solana_val_total_leader_slots = Gauge('solana_val_total_leader_slots', 'Total number of leader slots in current epoch',
+                                      ['identity'])
+solana_next_leader_slot = Gauge('solana_next_leader_slot', 'The next leader slot', ['identity'])
+solana_time_to_next_slot = Gauge('solana_time_to_next_slot', 'Time until the next leader slot in seconds', ['identity'])
+solana_avg_slot_duration = Gauge('solana_avg_slot_duration', 'Smoothed slot duration in seconds')
+solana_slot_duration_stddev = Gauge('solana_slot_duration_stddev',
+                                    'Standard deviation of the recent slot duration samples in seconds')
+solana_next_slot_time = Gauge('solana_next_slot_time', 'Time of the next leader slot', ['identity'])
+solana_next_slot_time_bound = Gauge('solana_next_slot_time_bound', 'Earliest and latest expected time of the next '
+                                    'leader slot', ['identity', 'bound'])
+solana_remaining_leader_slots = Gauge('solana_remaining_leader_slots', 'Leader slots left in the current epoch',
+                                      ['identity'])
+solana_largest_leader_gap = Gauge('solana_largest_leader_gap',
+                                  'Longest safe time in seconds between the leader windows left, up to the next epoch',
+                                  ['identity'])
+solana_largest_leader_gap_start = Gauge('solana_largest_leader_gap_start', 'Time the longest safe gap starts',
+                                        ['identity'])
+solana_previous_leader_slot = Gauge('solana_previous_leader_slot', 'The previous leader slot', ['identity'])
+solana_upcoming_leader_slot = Gauge('solana_upcoming_leader_slot', 'Upcoming leader slots by position',
+                                    ['identity', 'position'])
 
 # node_health module
-solana_node_health = Gauge('solana_node_health', 'Health status of the Solana node', ['status', 'cause'])
+solana_node_health = Gauge('solana_node_health', 'Health status of the Solana node', ['status', 'cause'],
+                           exclusive=['status', 'cause'], retired_value=0)
 solana_node_slots_behind = Gauge('solana_node_slots_behind', 'Number of slots the Solana node is behind')
 
+# skipped_slots module
+# Running totals are counters, so rate() and increase() handle the reset when the exporter restarts
+solana_val_tracked_produced_slots = Counter('solana_val_tracked_produced_slots',
+                                            'Leader slots confirmed with a block', ['identity'])
+solana_val_tracked_skipped_slots = Counter('solana_val_tracked_skipped_slots', 'Leader slots confirmed as skipped',
+                                           ['identity'])
+solana_val_leader_windows = Counter('solana_val_leader_windows',
+                                    'Confirmed leader windows of the validator by number of skipped slots',
+                                    ['identity', 'skipped'])
+solana_val_recent_skipped_slot = Gauge('solana_val_recent_skipped_slot', 'Recently skipped leader slots, latest first',
+                                       ['identity', 'position'])
+solana_val_leader_window_skip_rate = Gauge('solana_val_leader_window_skip_rate',
+                                           'Skip rate of the last confirmed leader window of the validator',
+                                           ['identity'])
+
 # slot module
 solana_block_height = Gauge('solana_block_height', 'Current Block Height of validator')
 solana_network_block_height = Gauge('solana_network_block_height', 'Current Block Height of network')
@@ -49,24 +84,104 @@ solana_net_max_retransmit_slot = Gauge('solana_net_max_retransmit_slot', 'Get th
 solana_val_max_shred_insert_slot = Gauge('solana_val_max_shred_insert_slot', 'Get the max VALIDATOR slot seen from after shred insert')
 solana_val_max_retransmit_slot = Gauge('solana_val_max_retransmit_slot', 'Get the max VALIDATOR slot seen from retransmit stage')
 
+# rpc endpoint pool
+solana_rpc_endpoint_up = Gauge('solana_rpc_endpoint_up', 'Whether the RPC URL is in rotation (circuit closed)',
+                               ['rpc', 'url'])
+solana_rpc_endpoint_latency = Gauge('solana_rpc_endpoint_latency', 'EWMA latency of the RPC URL in seconds',
+                                    ['rpc', 'url'])
+solana_rpc_endpoint_error_rate = Gauge('solana_rpc_endpoint_error_rate', 'EWMA error rate of the RPC URL',
+                                       ['rpc', 'url'])
+solana_rpc_endpoint_slot_lag = Gauge('solana_rpc_endpoint_slot_lag', 'Slots the RPC URL lags behind the freshest one',
+                                     ['rpc', 'url'])
+
+# stream module
+solana_root_slot = Gauge('solana_root_slot', 'Latest root slot streamed over WebSocket', ['rpc'])
+solana_stream_up = Gauge('solana_stream_up', 'Whether the WebSocket slot stream is connected', ['rpc'])
+
+# trend module, derived from the exporter's own sample history
+solana_slot_rate = Gauge('solana_slot_rate', 'Slots per second seen by the RPC endpoint', ['rpc'])
+solana_block_height_diff_avg = Gauge('solana_block_height_diff_avg',
+                                     'Moving average of the block height difference of validator and network')
+solana_block_height_diff_trend = Gauge('solana_block_height_diff_trend',
+                                       'Trend of the block height difference of validator and network per minute')
+solana_vote_height_rate = Gauge('solana_vote_height_rate', 'Slots per second the last vote of the validator advances',
+                                ['identity', 'rpc'])
+solana_vote_credit_rate = Gauge('solana_vote_credit_rate', 'Vote credits earned by the validator per minute',
+                                ['identity'])
+solana_transaction_rate = Gauge('solana_transaction_rate', 'Cluster transactions per second')
+solana_time_since_caught_up = Gauge('solana_time_since_caught_up',
+                                    'Seconds since the validator was last within caught_up_slots of the network')
+
 # validator module
 solana_active_stake = Gauge('solana_active_stake', 'Active Stake SOLs')
 solana_current_stake = Gauge('solana_current_stake', 'Current Stake SOLs')
 solana_delinquent_stake = Gauge('solana_delinquent_stake', 'Delinquent Stake SOLs')
-solana_val_commission = Gauge('solana_val_commission', 'Solana validator current commission', ['commission'])
+solana_val_commission = Gauge('solana_val_commission', 'Solana validator current commission', ['identity', 'commission'],
+                              exclusive=['commission'])
 solana_active_validators = Gauge('solana_active_validators', 'Total number of active validators by state', ['state'])
 solana_validator_activated_stake = Gauge('solana_validator_activated_stake', 'Activated stake per validator',
                                          ['pubkey', 'votekey'])
-solana_val_status = Gauge('solana_val_status', 'Solana validator voting status i.e., voting or jailed', ['state'])
-solana_vote_credits = Gauge('solana_vote_credits', 'Solana validator vote credits of current epoch')
+solana_val_delinquent = Gauge('solana_val_delinquent', 'Whether the validator is in the delinquent list',
+                              ['identity'])
+solana_val_status = Gauge('solana_val_status', 'Solana validator voting status i.e., voting or jailed',
+                          ['identity', 'state'], exclusive=['state'])
+solana_vote_credits = Gauge('solana_vote_credits', 'Solana validator vote credits of current epoch', ['identity'])
 solana_avg_vote_credits = Gauge('solana_avg_vote_credits', 'Average network vote credits of current epoch')
-solana_total_credits = Gauge('solana_total_credits', 'Solana validator vote credits of all epochs')
+solana_total_credits = Gauge('solana_total_credits', 'Solana validator vote credits of all epochs', ['identity'])
+solana_cluster_vote_credits = Gauge('solana_cluster_vote_credits', 'Vote credits of current epoch by cluster percentile',
+                                    ['quantile'])
+solana_stake_weighted_vote_credits = Gauge('solana_stake_weighted_vote_credits',
+                                           'Stake-weighted average network vote credits of current epoch')
+solana_vote_credits_rank = Gauge('solana_vote_credits_rank', 'Rank of the validator by vote credits of current epoch',
+                                 ['identity'])
+solana_vote_credits_percentile = Gauge('solana_vote_credits_percentile',
+                                       'Share of validators with fewer vote credits of current epoch', ['identity'])
+solana_last_vote_lag = Gauge('solana_last_vote_lag', 'Slots the last vote of the validator is behind the cluster median',
+                             ['identity'])
+solana_nakamoto_coefficient = Gauge('solana_nakamoto_coefficient',
+                                    'Fewest validators controlling more than a third of the active stake')
 
 # vote module
 solana_validator_vote_height = Gauge('solana_validator_vote_height',
                                      'Most recent VALIDATOR slot voted on by this vote account',
-                                     ['rpc'])
+                                     ['identity', 'rpc'])
 solana_network_vote_height = Gauge('solana_network_vote_height',
                                    'Most recent NETWORK slot voted on by this vote account',
-                                   ['rpc'])
-solana_vote_height_diff = Gauge('solana_vote_height_diff', 'Vote height difference of validator and network')
+                                   ['identity', 'rpc'])
+solana_vote_height_diff = Gauge('solana_vote_height_diff', 'Vote height difference of validator and network',
+                                ['identity'])
+
+# validator_log module
+solana_log_datapoints = Gauge('solana_log_datapoints', 'Datapoints of a family read from the validator log',
+                              ['family'])
+solana_log_datapoint_value = Gauge('solana_log_datapoint_value',
+                                   'Latest value of a datapoint field in the validator log', ['family', 'field'])
+# A running sum, so a counter (exported as solana_log_datapoint_total) that rate() and increase() can handle
+solana_log_datapoint = Counter('solana_log_datapoint', 'Sum of the values of a datapoint field in the validator log',
+                               ['family', 'field'])
+
+# exporter self-instrumentation, kept in the default registry and rendered with every commit
+solana_exporter_collector_duration = Histogram('solana_exporter_collector_duration_seconds',
+                                               'Duration of collector runs', ['collector'],
+                                               buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+solana_exporter_collector_errors = Counter('solana_exporter_collector_errors', 'Failed collector runs by error type',
+                                           ['collector', 'type'])
+solana_exporter_cycle_overruns = Counter('solana_exporter_cycle_overruns',
+                                         'Collector runs that took longer than their interval', ['collector'])
+solana_exporter_rpc_duration = Histogram('solana_exporter_rpc_duration_seconds', 'Duration of JSON-RPC requests',
+                                         ['endpoint', 'method'],
+                                         buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+solana_exporter_rpc_request_bytes = Counter('solana_exporter_rpc_request_bytes', 'Bytes sent in JSON-RPC requests',
+                                            ['endpoint'])
+solana_exporter_rpc_response_bytes = Counter('solana_exporter_rpc_response_bytes',
+                                             'Bytes received in JSON-RPC responses', ['endpoint'])
+solana_exporter_rpc_errors = Counter('solana_exporter_rpc_errors', 'Failed JSON-RPC calls by error type',
+                                     ['endpoint', 'method', 'type'])
+solana_exporter_event_loop_lag = Histogram('solana_exporter_event_loop_lag_seconds',
+                                           'How late the event loop resumes a sleeping task',
+                                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+solana_exporter_log_bytes = Counter('solana_exporter_log_bytes', 'Bytes of the validator log parsed')
+solana_exporter_log_lag_bytes = LiveGauge('solana_exporter_log_lag_bytes',
+                                          'Bytes of the validator log not parsed yet')
+solana_exporter_cli_waiting = LiveGauge('solana_exporter_cli_waiting',
+                                        'Solana CLI commands waiting for one of the concurrent slots')
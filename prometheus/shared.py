@@ -0,0 +1,213 @@
+import argparse
+import os
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST
+
+# Kept free of the exporter's own modules, so the serving process imports none of the collectors' code
+
+# Documents of the exposition payload; every other document is JSON served on its path
+METRICS = "/metrics"
+METRICS_GZIP = "/metrics.gz"
+
+# Magic, slot being served, slot size, publish sequence, Unix time of the publish
+_HEADER = struct.Struct("<4sIQQd")
+# Version (odd while the slot is being written), length of the documents
+_SLOT = struct.Struct("<QQ")
+# Path length, body length; followed by the path and the body
+_DOCUMENT = struct.Struct("<HI")
+_MAGIC = b"SMP1"
+
+
+class PayloadWriter:
+    """
+    Publishes the rendered scrape documents into a shared memory segment for a server in another process.
+
+    The segment holds two slots after its header. A publish writes the slot that is not being served and then
+    points the header at it, so readers copy a complete set of documents without waiting for the writer. Each
+    slot has a version that is odd while it is written; a reader that sees it change while copying reads again.
+    """
+
+    def __init__(self, size: int):
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        self.slot_size = (size - _HEADER.size) // 2
+        self.sequence = 0
+        self._slot = 0
+        _HEADER.pack_into(self.memory.buf, 0, _MAGIC, self._slot, self.slot_size, 0, 0.0)
+        for slot in (0, 1):
+            _SLOT.pack_into(self.memory.buf, self._offset(slot), 0, 0)
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def _offset(self, slot: int) -> int:
+        return _HEADER.size + slot * self.slot_size
+
+    def publish(self, documents: dict[str, bytes]) -> bool:
+        body = b"".join(_DOCUMENT.pack(len(path), len(data)) + path + data
+                        for path, data in ((path.encode(), data) for path, data in documents.items()))
+        if _SLOT.size + len(body) > self.slot_size:
+            logger.error("Scrape documents of {} bytes do not fit the shared memory slots of {} bytes, "
+                         "raise scrape_buffer_size", len(body), self.slot_size - _SLOT.size)
+            return False
+
+        buf = self.memory.buf
+        slot = 1 - self._slot
+        offset = self._offset(slot)
+        version = _SLOT.unpack_from(buf, offset)[0] + 1
+        _SLOT.pack_into(buf, offset, version, 0)
+        buf[offset + _SLOT.size:offset + _SLOT.size + len(body)] = body
+        _SLOT.pack_into(buf, offset, version + 1, len(body))
+        self.sequence += 1
+        self._slot = slot
+        _HEADER.pack_into(buf, 0, _MAGIC, slot, self.slot_size, self.sequence, time.time())
+        return True
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+class PayloadReader:
+    """Reads the documents last published by a PayloadWriter, parsing them once per publish."""
+
+    def __init__(self, name: str):
+        if sys.version_info >= (3, 13):
+            self.memory = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            # Only the collecting process, which created the segment, may remove it
+            resource_tracker.unregister(self.memory._name, "shared_memory")
+        magic = _HEADER.unpack_from(self.memory.buf, 0)[0]
+        if magic != _MAGIC:
+            raise ValueError(f"Shared memory segment {name} holds no scrape documents")
+        self._cached = (None, {})
+
+    def documents(self, attempts: int = 100) -> dict[str, bytes]:
+        buf = self.memory.buf
+        for _ in range(attempts):
+            _, slot, slot_size, _, _ = _HEADER.unpack_from(buf, 0)
+            offset = _HEADER.size + slot * slot_size
+            version, length = _SLOT.unpack_from(buf, offset)
+            if version % 2:
+                continue
+            if self._cached[0] == (slot, version):
+                return self._cached[1]
+            body = bytes(buf[offset + _SLOT.size:offset + _SLOT.size + min(length, slot_size - _SLOT.size)])
+            if _SLOT.unpack_from(buf, offset)[0] != version:
+                # Published twice while it was copied
+                continue
+            documents = {}
+            position = 0
+            while position < len(body):
+                path_length, data_length = _DOCUMENT.unpack_from(body, position)
+                position += _DOCUMENT.size
+                path = body[position:position + path_length].decode()
+                position += path_length
+                documents[path] = body[position:position + data_length]
+                position += data_length
+            self._cached = ((slot, version), documents)
+            return documents
+        # The writer kept overtaking this reader; the documents read before are only a few seconds old
+        return self._cached[1]
+
+    def close(self):
+        self.memory.close()
+
+
+class _SharedScrapeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        documents = self.server.reader.documents()
+        path = self.path.split("?", 1)[0]
+        if path in documents and path not in (METRICS, METRICS_GZIP):
+            self._send(documents[path], "application/json")
+            return
+        if METRICS not in documents:
+            self.send_error(503, "No metrics published yet")
+            return
+
+        compressed = "gzip" in self.headers.get("Accept-Encoding", "")
+        self._send(documents[METRICS_GZIP if compressed else METRICS], CONTENT_TYPE_LATEST, compressed)
+
+    def _send(self, body: bytes, content_type: str, compressed: bool = False):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(name: str, port: int, addr: str = "0.0.0.0"):
+    """Answer scrapes from the shared memory segment until the collecting process that started us is gone."""
+    parent = os.getppid()
+    server = ThreadingHTTPServer((addr, port), _SharedScrapeHandler)
+    server.daemon_threads = True
+    server.reader = PayloadReader(name)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Serving scrapes on {}:{} from shared memory {}", addr, port, name)
+    while os.getppid() == parent:
+        time.sleep(1)
+    server.shutdown()
+    server.reader.close()
+
+
+class ScrapeProcess:
+    """The scrape-serving process and the shared memory its documents are published through."""
+
+    def __init__(self, port: int, size: int, addr: str = "0.0.0.0"):
+        self.port = port
+        self.addr = addr
+        self.writer = PayloadWriter(size)
+        self.process = None
+        self.start()
+
+    def start(self):
+        command = [sys.executable, "-m", "prometheus.shared", "--memory", self.writer.name, "--port",
+                   str(self.port), "--addr", self.addr]
+        self.process = subprocess.Popen(command, cwd=Path(__file__).resolve().parent.parent)
+
+    def check(self):
+        """Start the serving process again if it exited."""
+        if self.process.poll() is not None:
+            logger.error("Scrape-serving process exited with code {}, starting it again", self.process.returncode)
+            self.start()
+
+    def publish(self, documents: dict[str, bytes]) -> bool:
+        return self.writer.publish(documents)
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer Prometheus scrapes from the exporter's shared memory")
+    parser.add_argument("--memory", required=True, help="name of the shared memory segment")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--addr", default="0.0.0.0")
+    args = parser.parse_args()
+    # Ctrl-C reaches the whole process group; the collecting process stops this one when it shuts down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    serve(args.memory, args.port, args.addr)
+
+
+if __name__ == "__main__":
+    main()
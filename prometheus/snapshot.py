@@ -0,0 +1,268 @@
+import contextvars
+import gzip
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus.shared import METRICS, METRICS_GZIP
+
+# Seconds a rendered payload is served before a scrape renders it again even without a commit
+PAYLOAD_MAX_AGE = 15
+
+# Series kept per metric unless the metric sets its own bound; the least recently set are dropped first
+MAX_SERIES = 1000
+
+# Values staged by the transaction the current task belongs to, if any
+_current_transaction = contextvars.ContextVar("metrics_transaction", default=None)
+
+
+class _Transaction:
+    """Values staged by one collection cycle."""
+
+    def __init__(self):
+        self.values = {}
+        self.open = True
+        self.started = time.monotonic()
+
+
+class MetricStore:
+    """
+    Published metric values, rendered once per commit and served to every scrape from a cached payload.
+
+    Values set inside `transaction()` are staged and published together when it exits, so a scrape never sees
+    a half-updated set of metrics. Values set outside a transaction are published by the next commit or scrape.
+    Every published series remembers when the values it came from were collected: a transaction that started
+    before the one that published a series last does not overwrite it, so a slow run never moves a value back.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._published = {}
+        self._collected_at = {}
+        self._updated_at = {}
+        self._loose = {}
+        self._lock = threading.Lock()
+        self._payload = self._payload_gzip = b""
+        self._rendered_at = None
+        self._listeners = []
+
+    def register(self, metric):
+        self._metrics[metric._name] = metric
+
+    def add_listener(self, listener):
+        """Call `listener()` after every commit, from the thread that committed, once the values are published."""
+        self._listeners.append(listener)
+
+    def series(self, name: str) -> list[tuple[dict, float]]:
+        """The published series of a metric as (labels, value) pairs."""
+        metric = self._metrics[name]
+        with self._lock:
+            published = list(self._published.get(name, {}).items())
+        return [(dict(zip(metric._labelnames, label_values)), value) for label_values, value in published]
+
+    def set(self, metric, label_values: tuple, value: float):
+        transaction = _current_transaction.get()
+        # Tasks that outlive their transaction publish like any write made outside one
+        if transaction is not None and transaction.open:
+            _move_to_end(transaction.values.setdefault(metric._name, {}), label_values, value)
+            return
+        with self._lock:
+            _move_to_end(self._loose.setdefault(metric._name, {}), label_values, (value, time.monotonic()))
+
+    @contextmanager
+    def transaction(self):
+        """Stage every value set by the tasks started inside this block and publish them together at the end."""
+        transaction = _Transaction()
+        token = _current_transaction.set(transaction)
+        try:
+            yield transaction
+        finally:
+            _current_transaction.reset(token)
+            transaction.open = False
+            self.commit(transaction.values, transaction.started)
+
+    def commit(self, staged: dict | None = None, started: float | None = None):
+        """
+        Publish the staged and loose values and render the exposition payload once for all coming scrapes.
+
+        `started` is the monotonic time the staged values were collected from; it defaults to now.
+        """
+        with self._lock:
+            self._apply(staged or {}, time.monotonic() if started is None else started)
+            self._render()
+        for listener in self._listeners:
+            listener()
+
+    def payload(self, compressed: bool = False) -> bytes:
+        """The cached exposition payload, rendered again only if loose values are pending or it got too old."""
+        with self._lock:
+            if self._loose or self._rendered_at is None or time.monotonic() - self._rendered_at > PAYLOAD_MAX_AGE:
+                self._render()
+            return self._payload_gzip if compressed else self._payload
+
+    def collect(self):
+        """Yield the published values; called by the Prometheus registry while a payload is rendered."""
+        for name, series in list(self._published.items()):
+            metric = self._metrics[name]
+            family = GaugeMetricFamily(name, metric._documentation, labels=metric._labelnames)
+            for label_values, value in series.items():
+                family.add_metric(label_values, value)
+            yield family
+
+        updated = GaugeMetricFamily("solana_exporter_last_update_timestamp_seconds",
+                                    "Unix time the metric family was last updated", labels=["metric"])
+        for name, updated_at in self._updated_at.items():
+            updated.add_metric([name], updated_at)
+        yield updated
+
+    def _apply(self, staged: dict, started: float):
+        # Values are published in the order they were set, so the last series set is the one that stays active
+        now = time.time()
+        for name, staged_series in staged.items():
+            metric = self._metrics[name]
+            series = self._published.setdefault(name, {})
+            collected_at = self._collected_at.setdefault(name, {})
+            for label_values, value in staged_series.items():
+                if collected_at.get(label_values, started) > started:
+                    # Published by a run that started after this one
+                    continue
+                if metric._exclusive:
+                    self._retire_siblings(metric, series, collected_at, label_values, started)
+                _move_to_end(series, label_values, value)
+                collected_at[label_values] = started
+                self._updated_at[name] = now
+            while len(series) > metric._max_series:
+                oldest = next(iter(series))
+                del series[oldest]
+                del collected_at[oldest]
+
+    @staticmethod
+    def _retire_siblings(metric, series: dict, collected_at: dict, label_values: tuple, started: float):
+        """Zero or drop the series that differ from the new one only in the metric's exclusive labels."""
+        group = metric.group(label_values)
+        for other in [other for other in series if other != label_values and metric.group(other) == group]:
+            if metric._retired_value is None:
+                del series[other]
+                del collected_at[other]
+            else:
+                series[other] = metric._retired_value
+                collected_at[other] = started
+
+    def _render(self):
+        for name, series in self._loose.items():
+            for label_values, (value, set_at) in series.items():
+                self._apply({name: {label_values: value}}, set_at)
+        self._loose = {}
+        self._payload = generate_latest(REGISTRY)
+        self._payload_gzip = gzip.compress(self._payload, compresslevel=6)
+        self._rendered_at = time.monotonic()
+
+
+def _move_to_end(series: dict, label_values: tuple, value: float):
+    series.pop(label_values, None)
+    series[label_values] = value
+
+
+store = MetricStore()
+REGISTRY.register(store)
+
+
+class _MetricChild:
+    """One labelled series of a Gauge."""
+
+    def __init__(self, metric, label_values: tuple):
+        self._metric = metric
+        self._label_values = label_values
+
+    def set(self, value: float):
+        store.set(self._metric, self._label_values, float(value))
+
+
+class Gauge:
+    """
+    Drop-in for prometheus_client.Gauge that writes to the metric store instead of being exported live.
+
+    Values reach scrapes when the surrounding transaction commits. Series that were never set are not exported.
+
+    Labels listed in `exclusive` describe a state with one current value, such as a version. Setting a series
+    retires the series that differ from it only in those labels: they are set to `retired_value`, or dropped
+    when it is None. At most `max_series` series are kept; the least recently set are dropped first.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames=(), exclusive=(), retired_value: float | None = None,
+                 max_series: int = MAX_SERIES):
+        self._name = name
+        self._documentation = documentation
+        self._labelnames = tuple(labelnames)
+        self._exclusive = tuple(exclusive)
+        self._group_positions = [i for i, label in enumerate(self._labelnames) if label not in self._exclusive]
+        self._retired_value = retired_value
+        self._max_series = max_series
+        store.register(self)
+
+    def group(self, label_values: tuple) -> tuple:
+        """The values of the labels that are not exclusive."""
+        return tuple(label_values[i] for i in self._group_positions)
+
+    def labels(self, **labels) -> _MetricChild:
+        return _MetricChild(self, tuple(str(labels[name]) for name in self._labelnames))
+
+    def set(self, value: float):
+        store.set(self, (), float(value))
+
+
+# JSON documents served next to the metrics, by path
+_json_endpoints = {}
+
+
+def register_json_endpoint(path: str, func):
+    """Serve what `func` returns as JSON on the path. It is called from the server thread on every request."""
+    _json_endpoints[path] = func
+
+
+def scrape_documents() -> dict[str, bytes]:
+    """Everything a scrape is answered with, for the scrape-serving process: the payload and the JSON documents."""
+    documents = {path: json.dumps(func()).encode() for path, func in _json_endpoints.items()}
+    documents[METRICS] = store.payload()
+    documents[METRICS_GZIP] = store.payload(compressed=True)
+    return documents
+
+
+class _ScrapeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        func = _json_endpoints.get(self.path.split("?", 1)[0])
+        if func is not None:
+            self._send_json(func())
+            return
+
+        compressed = "gzip" in self.headers.get("Accept-Encoding", "")
+        body = store.payload(compressed)
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, document):
+        body = json.dumps(document).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve the cached payload of the metric store from a daemon thread."""
+    server = ThreadingHTTPServer((addr, port), _ScrapeHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,101 @@
+import os
+import socket
+import sys
+import tempfile
+from pathlib import Path
+import pytest
+import yaml
+from aiohttp import web
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from bench.mock_rpc import MockRpcServer, SyntheticCluster, synthetic_pubkey  # noqa: E402
+from bench.mock_sink import MockSink  # noqa: E402
+
+
+def free_port_pair() -> int:
+    """A free port whose next port up is free too, for the mock node's JSON-RPC and PubSub."""
+    while True:
+        with socket.socket() as first:
+            first.bind(("127.0.0.1", 0))
+            port = first.getsockname()[1]
+            with socket.socket() as second:
+                try:
+                    second.bind(("127.0.0.1", port + 1))
+                except OSError:
+                    continue
+        return port
+
+
+PORT = free_port_pair()
+VALIDATORS = 50
+
+# config.py reads config.yml from the working directory when it is first imported, so the exporter's modules
+# are pointed at the mock node before any test imports them
+_directory = tempfile.mkdtemp(prefix="solana-monitor-tests-")
+with open(REPO / "config.yml") as config_file:
+    _config = yaml.safe_load(config_file)
+_config.update({
+    "network_rpc_endpoint": [f"http://127.0.0.1:{PORT}"],
+    "validator_rpc_endpoint": f"http://127.0.0.1:{PORT}",
+    "validators": [{"pub_key": synthetic_pubkey("identity", 0), "vote_pub_key": synthetic_pubkey("vote", 0)}],
+    "stream_slots": True,
+    "stream_votes": True,
+    "collectors": {},
+})
+for key in ("network_ws_endpoint", "validator_ws_endpoint"):
+    _config.pop(key, None)
+with open(os.path.join(_directory, "config.yml"), "w") as config_file:
+    yaml.safe_dump(_config, config_file)
+os.chdir(_directory)
+
+
+class MockNode:
+    """Serves a MockRpcServer on the configured ports for the duration of an `async with` block."""
+
+    def __init__(self):
+        self.server = MockRpcServer(SyntheticCluster(validators=VALIDATORS))
+        self._runner = None
+
+    async def __aenter__(self) -> MockRpcServer:
+        self._runner = web.AppRunner(self.server.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", PORT).start()
+        await web.TCPSite(self._runner, "127.0.0.1", PORT + 1).start()
+        return self.server
+
+    async def __aexit__(self, *exc_info):
+        from utils.rpc import rpc
+        # The pooled session belongs to this test's event loop
+        await rpc.close()
+        await self._runner.cleanup()
+
+
+@pytest.fixture
+def mock_node() -> MockNode:
+    return MockNode()
+
+
+class MockWebhook:
+    """Serves a MockSink on a free port for the duration of an `async with` block."""
+
+    def __init__(self):
+        self.sink = MockSink()
+        self.port = free_port_pair()
+        self.url = f"http://127.0.0.1:{self.port}/alerts"
+        self._runner = None
+
+    async def __aenter__(self):
+        self._runner = web.AppRunner(self.sink.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+        return self.sink
+
+    async def __aexit__(self, *exc_info):
+        await self._runner.cleanup()
+
+
+@pytest.fixture
+def mock_webhook() -> MockWebhook:
+    return MockWebhook()
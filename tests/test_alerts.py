@@ -0,0 +1,144 @@
+import asyncio
+import time
+from exporter.alerts import AlertEngine, AlertRule, Notifier, WebhookSink
+from prometheus.snapshot import Gauge, store
+
+test_lag = Gauge("test_alert_lag", "Lag the test alert rules watch", ["identity"])
+
+
+class Recorder:
+    """Notifier stand-in that keeps the queued notifications."""
+
+    def __init__(self):
+        self.messages = []
+
+    def put(self, message):
+        self.messages.append(message)
+
+
+def publish(value: float, identity: str = "A"):
+    with store.transaction():
+        test_lag.labels(identity=identity).set(value)
+
+
+def test_alert_fires_after_for_and_resolves_after_debounce():
+    recorder = Recorder()
+    engine = AlertEngine([AlertRule("lag", "test_alert_lag", ">", 10, for_=30, debounce=20)], recorder)
+
+    publish(50)
+    engine.evaluate(now=0)
+    engine.evaluate(now=29)
+    assert recorder.messages == []
+    engine.evaluate(now=30)
+    assert len(recorder.messages) == 1 and recorder.messages[0].startswith("FIRING [warning] lag")
+
+    # Flapping back below the threshold for less than the debounce time does not resolve it
+    publish(5)
+    engine.evaluate(now=40)
+    publish(50)
+    engine.evaluate(now=45)
+    publish(5)
+    engine.evaluate(now=50)
+    engine.evaluate(now=69)
+    assert len(recorder.messages) == 1
+    engine.evaluate(now=70)
+    assert len(recorder.messages) == 2 and recorder.messages[1].startswith("RESOLVED [warning] lag")
+
+    # A condition that clears before `for` has passed never fires
+    publish(50)
+    engine.evaluate(now=100)
+    publish(5)
+    engine.evaluate(now=110)
+    publish(50)
+    engine.evaluate(now=120)
+    engine.evaluate(now=149)
+    assert len(recorder.messages) == 2
+
+
+async def notify(webhook, messages, batches: int = 1, timeout: float = 10, **kwargs):
+    """Queue the messages and wait until the mock webhook received `batches` batches or the timeout passed."""
+    sink = webhook.sink
+    notifier = Notifier([WebhookSink(webhook.url)], **kwargs)
+    task = asyncio.create_task(notifier.run())
+    try:
+        for message in messages:
+            notifier.put(message)
+        deadline = time.monotonic() + timeout
+        while len(sink.received) < batches and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await notifier.close()
+
+
+def test_notifications_are_batched(mock_webhook):
+    async def run():
+        async with mock_webhook as sink:
+            await notify(mock_webhook, ["first", "second", "third"], batch_window=0.2)
+            assert [batch["alerts"] for batch in sink.received] == [["first", "second", "third"]]
+            assert sink.received[0]["text"] == "first\nsecond\nthird"
+
+    asyncio.run(run())
+
+
+def test_sends_are_rate_limited(mock_webhook):
+    async def run():
+        async with mock_webhook as sink:
+            notifier = Notifier([WebhookSink(mock_webhook.url)], batch_window=0.05, rate_limit=60)
+            task = asyncio.create_task(notifier.run())
+            try:
+                notifier.put("first")
+                while not sink.received:
+                    await asyncio.sleep(0.02)
+                notifier.put("second")
+                notifier.put("third")
+                await asyncio.sleep(0.5)
+                # One message per second: the others wait and go out together in the next batch
+                assert len(sink.received) == 1
+                while len(sink.received) < 2:
+                    await asyncio.sleep(0.02)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await notifier.close()
+            assert sink.received[1]["alerts"] == ["second", "third"]
+            assert sink.received[1]["time"] - sink.received[0]["time"] >= 0.9
+
+    asyncio.run(run())
+
+
+def test_failed_sends_are_retried_then_dropped(mock_webhook):
+    async def run():
+        async with mock_webhook as sink:
+            sink.failures = 1
+            await notify(mock_webhook, ["retried"], batch_window=0.05, retry=2)
+            assert sink.attempts == 2
+            assert [batch["alerts"] for batch in sink.received] == [["retried"]]
+
+            sink.received.clear()
+            sink.attempts = 0
+            sink.failures = 10
+            notifier = Notifier([WebhookSink(mock_webhook.url)], batch_window=0.05, retry=1)
+            task = asyncio.create_task(notifier.run())
+            notifier.put("dropped")
+            await asyncio.sleep(1.5)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await notifier.close()
+            assert sink.attempts == 2
+            assert sink.received == []
+
+    asyncio.run(run())
+
+
+def test_webhook_sink_closes_its_session(mock_webhook):
+    async def run():
+        async with mock_webhook:
+            webhook = WebhookSink(mock_webhook.url)
+            await webhook.send(["hello"])
+            session = webhook._session
+            await Notifier([webhook]).close()
+            assert session.closed
+
+    asyncio.run(run())
@@ -0,0 +1,46 @@
+import asyncio
+from exporter.collector import REGISTRY, build_collectors, collect, enabled_specs
+
+
+def names(specs) -> set[str]:
+    return {spec.name for spec in specs}
+
+
+def test_bools_enable_and_disable_collectors():
+    specs = names(enabled_specs({"get_health": False, "tail_validator_log": True, "get_version": None}))
+    assert "get_health" not in specs
+    assert "get_version" in specs
+    # The mock config has no validator log, so enabling it only gets it skipped
+    assert "tail_validator_log" not in specs
+
+
+def test_malformed_entries_keep_the_defaults():
+    settings = {"get_health": 10, "get_slots": "fast", "no_such_collector": {"interval": 1},
+                "get_votes": {"interval": 3, "intervl": 4}}
+    collectors = {collector.name: collector for collector in build_collectors(settings)}
+    assert collectors["get_health"].interval == REGISTRY["get_health"].schedule["interval"]
+    assert collectors["get_slots"].interval == REGISTRY["get_slots"].schedule["interval"]
+    assert collectors["get_votes"].interval == 3
+    assert "no_such_collector" not in collectors
+
+
+def test_collect_runs_every_collector_once(mock_node, monkeypatch):
+    calls = []
+
+    async def collector():
+        calls.append(1)
+
+    async def failing():
+        raise ValueError("boom")
+
+    async def run():
+        async with mock_node:
+            await collect()
+
+    monkeypatch.setattr(REGISTRY["get_health"], "load", lambda: collector)
+    monkeypatch.setattr(REGISTRY["get_version"], "load", lambda: failing)
+    monkeypatch.setattr("exporter.collector.COLLECTOR_SCHEDULES",
+                        {name: name in ("get_health", "get_version") for name in REGISTRY})
+    # A failing collector is logged by the scheduler and does not stop the others
+    asyncio.run(run())
+    assert calls == [1]
@@ -0,0 +1,50 @@
+from utils import pool as pool_module
+from utils.pool import EndpointPool
+from config import RPC_CIRCUIT_FAILURES, RPC_CIRCUIT_COOLDOWN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_circuit_opens_after_failures_and_closes_after_a_good_probe(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(pool_module.time, "monotonic", clock.monotonic)
+    pool = EndpointPool("network", ["http://failing", "http://healthy"])
+    failing, healthy = pool.stats.values()
+    pool.report_success(failing, 0.01)
+    pool.report_success(healthy, 0.05)
+    assert pool.select() is failing
+
+    for _ in range(RPC_CIRCUIT_FAILURES - 1):
+        pool.report_failure(failing)
+    # Below the threshold the circuit stays closed
+    assert failing.open_until == 0
+
+    pool.report_failure(failing)
+    assert failing.open_until == clock.now + RPC_CIRCUIT_COOLDOWN
+    assert all(pool.select() is healthy for _ in range(5))
+
+    # Half-open after the cooldown: the URL is picked for a probe, and a good answer closes the circuit
+    clock.now += RPC_CIRCUIT_COOLDOWN
+    healthy.latency = 1.0
+    assert pool.select() is failing
+    pool.report_success(failing, 0.01)
+    assert failing.failures == 0 and failing.open_until == 0
+    assert pool.select() is failing
+
+
+def test_every_circuit_open_picks_the_one_closing_first(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(pool_module.time, "monotonic", clock.monotonic)
+    pool = EndpointPool("network", ["http://first", "http://second"])
+    first, second = pool.stats.values()
+    for stats in (second, first):
+        for _ in range(RPC_CIRCUIT_FAILURES):
+            pool.report_failure(stats)
+        clock.now += 1
+    assert pool.select() is second
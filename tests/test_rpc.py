@@ -0,0 +1,130 @@
+import asyncio
+import time
+import pytest
+from aiohttp import web
+from bench.mock_rpc import MockRpcServer, SyntheticCluster
+from conftest import free_port_pair
+from utils import rpc as rpc_module
+from utils.pool import EndpointPool
+from utils.rpc import RequestPolicy, rpc
+
+SLOW = 2.0
+
+
+class MockEndpoints:
+    """Serves one MockRpcServer per latency, each on its own port, as the URLs of the network endpoint."""
+
+    def __init__(self, *latencies: float):
+        cluster = SyntheticCluster(validators=10)
+        self.servers = [MockRpcServer(cluster, latency=latency) for latency in latencies]
+        self.urls = []
+        self._runners = []
+
+    async def __aenter__(self) -> list[MockRpcServer]:
+        for server in self.servers:
+            runner = web.AppRunner(server.app())
+            await runner.setup()
+            port = free_port_pair()
+            await web.TCPSite(runner, "127.0.0.1", port).start()
+            self._runners.append(runner)
+            self.urls.append(f"http://127.0.0.1:{port}")
+        return self.servers
+
+    async def __aexit__(self, *exc_info):
+        await rpc.close()
+        for runner in self._runners:
+            await runner.cleanup()
+
+
+@pytest.fixture
+def network_pool(monkeypatch):
+    """Points the network endpoint at the given URLs for the duration of a test."""
+    def use(urls: list[str]) -> EndpointPool:
+        pool = EndpointPool("network", urls)
+        monkeypatch.setitem(rpc_module.ENDPOINTS, "network", pool)
+        return pool
+    return use
+
+
+def test_backup_request_wins_after_the_hedge_delay(network_pool, monkeypatch):
+    monkeypatch.setattr(rpc_module, "RPC_HEDGE_DELAY", 0.2)
+
+    async def run():
+        endpoints = MockEndpoints(SLOW, 0.0)
+        async with endpoints as (slow, fast):
+            pool = network_pool(endpoints.urls)
+            # Both URLs look equally fast, so the first attempt goes to the slow one and, with it busy, the
+            # backup to the other
+            for stats in pool.stats.values():
+                stats.latency = 0.05
+            policy = RequestPolicy(rpc, deadline=5, max_attempts=2)
+            start_time = time.monotonic()
+            results, attempt, latency = await policy.batch([("getSlot", None)])
+
+            assert attempt == 2
+            assert isinstance(results[0], int)
+            assert 0.2 <= latency < SLOW
+            assert time.monotonic() - start_time < SLOW
+            assert slow.stats["http_requests"] == 1 and fast.stats["http_requests"] == 1
+
+    asyncio.run(run())
+
+
+def test_deadline_raises_when_every_endpoint_stalls(network_pool, monkeypatch):
+    monkeypatch.setattr(rpc_module, "RPC_HEDGE_DELAY", 0.1)
+
+    async def run():
+        endpoints = MockEndpoints(SLOW, SLOW)
+        async with endpoints as servers:
+            network_pool(endpoints.urls)
+            policy = RequestPolicy(rpc, deadline=0.5, max_attempts=3)
+            start_time = time.monotonic()
+            with pytest.raises(TimeoutError):
+                await policy.batch([("getSlot", None)])
+            assert 0.5 <= time.monotonic() - start_time < SLOW
+            assert sum(server.stats["http_requests"] for server in servers) == 3
+
+    asyncio.run(run())
+
+
+def test_cancelled_request_leaves_the_latency_alone(network_pool):
+    async def run():
+        endpoints = MockEndpoints(SLOW)
+        async with endpoints:
+            pool = network_pool(endpoints.urls)
+            stats = pool.stats[endpoints.urls[0]]
+            stats.latency = 0.05
+            task = asyncio.create_task(rpc.post({"jsonrpc": "2.0", "id": 0, "method": "getSlot"}))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert stats.latency == 0.05
+            assert stats.inflight == 0
+
+    asyncio.run(run())
+
+
+def test_whole_batch_error_raises_rpc_error(network_pool):
+    async def reject(request):
+        return web.json_response({"jsonrpc": "2.0", "id": None,
+                                  "error": {"code": -32600, "message": "Batch too large"}})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/", reject)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        port = free_port_pair()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        try:
+            network_pool([f"http://127.0.0.1:{port}"])
+            with pytest.raises(rpc_module.RpcError) as error:
+                await rpc.send_batch([("getSlot", None), ("getEpochInfo", None)])
+            assert error.value.code == -32600
+            assert error.value.method == "getSlot,getEpochInfo"
+        finally:
+            await rpc.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
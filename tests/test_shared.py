@@ -0,0 +1,100 @@
+import time
+import urllib.error
+import urllib.request
+import pytest
+from conftest import free_port_pair
+from prometheus import shared
+from prometheus.shared import METRICS, METRICS_GZIP, PayloadReader, PayloadWriter, ScrapeProcess
+
+
+def documents(n: int) -> dict[str, bytes]:
+    return {METRICS: b"metric %d\n" % n, METRICS_GZIP: b"gzip %d" % n, "/timeline": b'{"n": %d}' % n}
+
+
+@pytest.fixture
+def writer():
+    writer = PayloadWriter(64 * 1024)
+    yield writer
+    writer.close()
+
+
+def test_both_slots_are_written_and_read_back(writer):
+    reader = PayloadReader(writer.name)
+    try:
+        assert reader.documents() == {}
+        for n in range(4):
+            assert writer.publish(documents(n))
+            # The publishes alternate between the two slots
+            assert shared._HEADER.unpack_from(writer.memory.buf, 0)[1] == (n + 1) % 2
+            assert reader.documents() == documents(n)
+        # Unchanged since the last read, so the parsed documents are reused
+        assert reader.documents() is reader.documents()
+        assert not writer.publish({METRICS: b"x" * writer.slot_size})
+        assert reader.documents() == documents(3)
+    finally:
+        reader.close()
+
+
+class PublishWhileCopying:
+    """Stands in for the slot header struct and publishes twice while the reader copies a slot."""
+
+    def __init__(self, slot_struct, writer):
+        self._struct = slot_struct
+        self._writer = writer
+        self.calls = 0
+        self.interrupted = False
+
+    def __getattr__(self, name):
+        return getattr(self._struct, name)
+
+    def unpack_from(self, buf, offset):
+        self.calls += 1
+        # The reader checks the version again after copying; by then the slot was written over
+        if self.calls == 2 and not self.interrupted:
+            self.interrupted = True
+            self._writer.publish(documents(2))
+            self._writer.publish(documents(3))
+        return self._struct.unpack_from(buf, offset)
+
+
+def test_reader_retries_when_the_slot_changes_while_copying(writer, monkeypatch):
+    reader = PayloadReader(writer.name)
+    try:
+        writer.publish(documents(1))
+        slot_struct = PublishWhileCopying(shared._SLOT, writer)
+        monkeypatch.setattr(shared, "_SLOT", slot_struct)
+        assert reader.documents() == documents(3)
+        assert slot_struct.interrupted
+    finally:
+        reader.close()
+
+
+def get(url: str) -> tuple[int, bytes]:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, b""
+
+
+def test_scrape_process_answers_503_until_the_first_publish():
+    port = free_port_pair()
+    scrape = ScrapeProcess(port, 64 * 1024, "127.0.0.1")
+    url = f"http://127.0.0.1:{port}/metrics"
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                status, _ = get(url)
+                break
+            except urllib.error.URLError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+        assert status == 503
+
+        scrape.publish(documents(1))
+        assert get(url) == (200, documents(1)[METRICS])
+        assert get(f"http://127.0.0.1:{port}/timeline") == (200, documents(1)["/timeline"])
+    finally:
+        scrape.close()
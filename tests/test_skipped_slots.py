@@ -0,0 +1,49 @@
+import asyncio
+from modules import skipped_slots
+from modules.skipped_slots import SkipTracker, load_cursors, save_cursors
+from utils.rpc import rpc
+
+EPOCH_START = 1000
+# Two leader windows in the current epoch and one in the previous epoch
+LEADER_SLOTS = [992, 993, 994, 995, 1040, 1041, 1042, 1043, 1080, 1081, 1082, 1083]
+
+
+class Schedule:
+    def slots_between(self, first_slot, last_slot):
+        return [slot for slot in LEADER_SLOTS if first_slot <= slot <= last_slot]
+
+
+def run_tracker(tracker, confirmed_slot, monkeypatch, skipped=()):
+    async def batch(requests):
+        return [[slot for slot in range(first, last + 1) if slot not in skipped] for _, (first, last, _) in requests]
+
+    monkeypatch.setitem(skipped_slots.leader_schedules, tracker.identity, Schedule())
+    monkeypatch.setattr(rpc, "batch", batch)
+    return asyncio.run(tracker.update(confirmed_slot, EPOCH_START))
+
+
+def test_cursor_resumes_after_a_restart(tmp_path, monkeypatch):
+    path = str(tmp_path / "state" / "cursor.json")
+    tracker = SkipTracker("Restarted")
+    assert run_tracker(tracker, 1020, monkeypatch) == 0
+    save_cursors({"Restarted": tracker}, path)
+
+    # The exporter was down while the first window of the epoch passed
+    restarted = SkipTracker("Restarted", load_cursors(path)["Restarted"])
+    assert run_tracker(restarted, 1100, monkeypatch, skipped={1082}) == 8
+    assert (restarted.produced, restarted.skipped) == (7, 1)
+    assert restarted.cursor == 1100
+
+
+def test_saved_cursor_is_clamped_to_the_current_epoch(monkeypatch):
+    tracker = SkipTracker("Stale", saved_cursor=900)
+    # The previous epoch's window at 992 is not checked
+    assert run_tracker(tracker, 1100, monkeypatch) == 8
+    assert tracker.cursor == 1100
+
+
+def test_missing_or_corrupt_cursor_file(tmp_path):
+    assert load_cursors(str(tmp_path / "missing.json")) == {}
+    corrupt = tmp_path / "corrupt.json"
+    corrupt.write_text("{")
+    assert load_cursors(str(corrupt)) == {}
@@ -0,0 +1,62 @@
+import time
+from prometheus.snapshot import Gauge, store
+
+version = Gauge("test_store_version", "Exclusive label that retires to zero", ["identity", "version"],
+                exclusive=["version"], retired_value=0)
+health = Gauge("test_store_health", "Exclusive label whose retired series are dropped", ["status"],
+               exclusive=["status"])
+capped = Gauge("test_store_capped", "At most three series", ["n"], max_series=3)
+height = Gauge("test_store_height", "Set by collectors that overlap", ["rpc"])
+
+
+def published(name: str) -> dict:
+    store.commit()
+    return {tuple(labels.values()): value for labels, value in store.series(name)}
+
+
+def test_exclusive_labels_retire_their_siblings():
+    with store.transaction():
+        version.labels(identity="A", version="1.0").set(1)
+        version.labels(identity="B", version="1.0").set(1)
+    with store.transaction():
+        version.labels(identity="A", version="2.0").set(1)
+    # Only A's old version is retired; B differs in a label that is not exclusive
+    assert published("test_store_version") == {("A", "1.0"): 0, ("B", "1.0"): 1, ("A", "2.0"): 1}
+
+    with store.transaction():
+        health.labels(status="ok").set(1)
+    with store.transaction():
+        health.labels(status="behind").set(1)
+    assert published("test_store_health") == {("behind",): 1}
+
+
+def test_max_series_drops_the_least_recently_set():
+    with store.transaction():
+        for n in range(3):
+            capped.labels(n=n).set(n)
+    with store.transaction():
+        capped.labels(n=0).set(10)
+        capped.labels(n=3).set(3)
+    assert published("test_store_capped") == {("2",): 2, ("0",): 10, ("3",): 3}
+
+
+def test_older_collection_never_overwrites_a_newer_one():
+    with store.transaction():
+        with store.transaction():
+            # Started after the outer run, and committed first
+            height.labels(rpc="network").set(2)
+        time.sleep(0.001)
+        height.labels(rpc="network").set(1)
+        height.labels(rpc="validator").set(1)
+    assert published("test_store_height") == {("network",): 2, ("validator",): 1}
+
+    # A value set outside a transaction later is newer than both
+    height.labels(rpc="network").set(3)
+    assert published("test_store_height")[("network",)] == 3
+
+
+def test_transaction_values_are_not_visible_before_the_commit():
+    with store.transaction():
+        height.labels(rpc="staged").set(5)
+        assert ("staged",) not in published("test_store_height")
+    assert published("test_store_height")[("staged",)] == 5
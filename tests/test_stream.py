@@ -0,0 +1,101 @@
+import asyncio
+import time
+import pytest
+from bench.mock_rpc import SLOT_DURATION
+from modules import stream
+from modules.slot import get_slots
+from prometheus.snapshot import store
+
+
+def published(name: str, **labels) -> float | None:
+    """The value of the series with these labels once everything set so far is published."""
+    store.commit()
+    for series_labels, value in store.series(name):
+        if all(series_labels.get(key) == expected for key, expected in labels.items()):
+            return value
+    return None
+
+
+async def wait_for(condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not met in time")
+        await asyncio.sleep(0.05)
+
+
+@pytest.fixture
+def stale_after(monkeypatch):
+    monkeypatch.setattr(stream, "STREAM_STALE_AFTER", 1)
+    return 1
+
+
+def test_notifications_update_gauges(mock_node):
+    async def run():
+        async with mock_node as server:
+            tasks = asyncio.gather(*[running.run() for running in stream.streams.values()])
+            try:
+                await wait_for(lambda: stream.is_streaming("network") and stream.is_streaming("validator"))
+                await wait_for(lambda: published("solana_current_slot") is not None
+                               and published("solana_current_slot") >= server.cluster.slot - 1)
+                await wait_for(lambda: published("solana_root_slot", rpc="network") == stream.streams["network"].root)
+                assert published("solana_stream_up", rpc="network") == 1
+                assert published("solana_net_current_slot") >= server.cluster.slot - 1
+                assert published("solana_slot_diff") is not None
+                assert stream.streams["network"].root < stream.streams["network"].slot
+                identity = next(iter(stream.IDENTITIES.values()))
+                await wait_for(lambda: stream.is_streaming("network", "vote", identity))
+                assert published("solana_network_vote_height", identity=identity, rpc="network") is not None
+            finally:
+                tasks.cancel()
+                await asyncio.gather(tasks, return_exceptions=True)
+
+    asyncio.run(run())
+
+
+def test_reconnects_after_the_server_drops_the_connection(mock_node):
+    async def run():
+        async with mock_node as server:
+            network = stream.streams["network"]
+            task = asyncio.create_task(network.run())
+            try:
+                await wait_for(lambda: network.is_live("slot"))
+                connections = server.stats["ws_connections"]
+                await server.drop_streams()
+                await wait_for(lambda: published("solana_stream_up", rpc="network") == 0)
+
+                await wait_for(lambda: server.stats["ws_connections"] > connections)
+                dropped_at = network.slot
+                await wait_for(lambda: network.slot is not None and network.slot > dropped_at)
+                assert published("solana_stream_up", rpc="network") == 1
+                assert published("solana_current_slot") == network.slot
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+
+
+def test_polling_takes_over_when_the_stream_goes_stale(mock_node, stale_after):
+    async def run():
+        async with mock_node as server:
+            tasks = asyncio.gather(*[running.run() for running in stream.streams.values()])
+            try:
+                await wait_for(lambda: stream.is_streaming("network"))
+                server.notifying = False
+                await asyncio.sleep(stale_after + SLOT_DURATION)
+                assert not stream.is_streaming("network")
+                streamed_slot = stream.streams["network"].slot
+
+                # The stream is silent, so a newer slot can only come from polling
+                await wait_for(lambda: server.cluster.slot > streamed_slot + 1)
+                await get_slots()
+                assert published("solana_current_slot") > streamed_slot
+
+                server.notifying = True
+                await wait_for(lambda: stream.is_streaming("network"))
+            finally:
+                tasks.cancel()
+                await asyncio.gather(tasks, return_exceptions=True)
+
+    asyncio.run(run())
@@ -0,0 +1,27 @@
+from modules import validator_log
+from prometheus.metrics import solana_log_datapoint
+from utils.tail import FileTailer
+
+LINE = b"[2026-10-17T12:00:00Z INFO  solana_metrics::metrics] datapoint: replay-slot-stats slot=%di replay_time=%di\n"
+
+
+def counted(field: str) -> float:
+    return solana_log_datapoint.labels(family="replay-slot-stats", field=field)._value.get()
+
+
+def test_datapoint_sums_are_counted(tmp_path, monkeypatch):
+    log_path = tmp_path / "solana.log"
+    log_path.write_bytes(b"")
+    monkeypatch.setattr(validator_log, "tailer", FileTailer(str(log_path), str(tmp_path / "offset.json")))
+    validator_log.consume()
+    start = counted("replay_time")
+
+    with open(log_path, "ab") as log_file:
+        log_file.write(LINE % (100, 250) + LINE % (101, 750))
+    validator_log.consume()
+    assert counted("replay_time") - start == 1000
+    assert validator_log.parser.values[b"replay-slot-stats", b"slot"] == 101
+
+    # A run without new lines adds nothing
+    validator_log.consume()
+    assert counted("replay_time") - start == 1000
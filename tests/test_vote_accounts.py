@@ -0,0 +1,41 @@
+import asyncio
+import io
+import json
+import pytest
+from bench.mock_rpc import SyntheticCluster
+from bench.vote_accounts import BodyStream
+from utils.rpc import RpcError
+from utils.vote_accounts import parse_vote_accounts
+
+
+def parse(document: dict):
+    return asyncio.run(parse_vote_accounts(BodyStream(io.BytesIO(json.dumps(document).encode()))))
+
+
+def test_accounts_keep_their_fields_and_latest_credits():
+    result = SyntheticCluster(validators=200).vote_accounts()
+    current, delinquent = parse({"jsonrpc": "2.0", "result": result, "id": 1})
+
+    assert len(current) == len(result["current"]) and len(delinquent) == len(result["delinquent"])
+    for records, accounts, is_delinquent in ((current, result["current"], False),
+                                              (delinquent, result["delinquent"], True)):
+        for record, account in zip(records, accounts):
+            assert record.vote_pubkey == account["votePubkey"]
+            assert record.node_pubkey == account["nodePubkey"]
+            assert record.activated_stake == account["activatedStake"]
+            assert record.last_vote == account["lastVote"]
+            assert record.epoch_credits == tuple(account["epochCredits"][-1])
+            assert record.delinquent is is_delinquent
+
+
+def test_error_response_raises():
+    with pytest.raises(RpcError):
+        parse({"jsonrpc": "2.0", "error": {"code": -32005, "message": "Node is behind"}, "id": 1})
+    assert parse({"jsonrpc": "2.0", "result": {"current": [], "delinquent": []}, "id": 1}) == ([], [])
+
+
+def test_small_chunks_parse_the_same(monkeypatch):
+    document = {"jsonrpc": "2.0", "result": SyntheticCluster(validators=50).vote_accounts(), "id": 1}
+    expected = parse(document)
+    monkeypatch.setattr("utils.vote_accounts.READ_SIZE", 7)
+    assert parse(document) == expected
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import signal
+from loguru import logger
+from config import SOLANA_BINARY_PATH, CLI_TIMEOUT, CLI_CONCURRENCY
+from prometheus.metrics import solana_exporter_cli_waiting
+
+# Longest output line read at once; `--output json-compact` prints the whole document on one line
+LINE_LIMIT = 64 * 1024 ** 2
+
+# Solana CLI processes allowed to run at the same time
+_slots = asyncio.Semaphore(CLI_CONCURRENCY)
+
+
+class CliError(Exception):
+    """A Solana CLI command failed, timed out or could not be started."""
+
+
+def _kill(process):
+    # The CLI runs in its own session, so the whole process group is killed along with it
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def _read_output(stream) -> bytes:
+    """Read stdout as it is written, dropping the `Note:` lines the CLI mixes into its output."""
+    kept = []
+    async for line in stream:
+        if b"Note:" not in line:
+            kept.append(line)
+    return b"".join(kept)
+
+
+async def run_cli(*args: str, timeout: float = CLI_TIMEOUT) -> bytes:
+    """
+    Run a Solana CLI command without blocking the event loop and return its stdout without `Note:` lines.
+
+    Raises CliError if the command exits with an error or has not finished within `timeout` seconds,
+    in which case its process group is killed.
+    """
+    command = [SOLANA_BINARY_PATH, *args]
+    solana_exporter_cli_waiting.inc()
+    try:
+        await _slots.acquire()
+    finally:
+        solana_exporter_cli_waiting.dec()
+
+    try:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                start_new_session=True, limit=LINE_LIMIT
+            )
+        except OSError as e:
+            raise CliError(f"{' '.join(command)}: {e}") from e
+
+        try:
+            stdout, stderr, returncode = await asyncio.wait_for(
+                asyncio.gather(_read_output(process.stdout), process.stderr.read(), process.wait()),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            _kill(process)
+            await process.wait()
+            raise CliError(f"{' '.join(command)}: no result within {timeout} seconds")
+        except BaseException:
+            _kill(process)
+            await process.wait()
+            raise
+    finally:
+        _slots.release()
+
+    if returncode != 0:
+        raise CliError(f"{' '.join(command)}: exit code {returncode}: {stderr.decode(errors='replace').strip()}")
+    logger.debug("{}: {} bytes of output", " ".join(command), len(stdout))
+    return stdout
@@ -0,0 +1,71 @@
+import time
+import numpy as np
+from config import HISTORY_SIZE, HISTORY_WINDOW
+
+
+class History:
+    """
+    The most recent samples of one series in a fixed-size ring buffer.
+
+    Both arrays are allocated once; when the buffer is full the oldest sample is overwritten, so memory stays
+    the same however long the exporter runs. Times are monotonic seconds.
+    """
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        self._times = np.zeros(size)
+        self._values = np.zeros(size)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, value: float | None, timestamp: float | None = None):
+        if value is None:
+            return
+        self._times[self._next] = time.monotonic() if timestamp is None else timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._times)
+        self._count = min(self._count + 1, len(self._times))
+
+    def window(self, seconds: float = HISTORY_WINDOW) -> tuple[np.ndarray, np.ndarray]:
+        """Times and values of the samples taken in the last `seconds` before the newest one, oldest first."""
+        order = (np.arange(self._count) + self._next - self._count) % len(self._times)
+        times, values = self._times[order], self._values[order]
+        if not self._count:
+            return times, values
+        start = np.searchsorted(times, times[-1] - seconds)
+        return times[start:], values[start:]
+
+    def rate(self, seconds: float = HISTORY_WINDOW) -> float | None:
+        """Change per second from the first to the last sample of the window; None without two samples."""
+        times, values = self.window(seconds)
+        if len(times) < 2 or times[-1] == times[0]:
+            return None
+        return float((values[-1] - values[0]) / (times[-1] - times[0]))
+
+    def slope(self, seconds: float = HISTORY_WINDOW) -> float | None:
+        """Least-squares trend per second over the window, less sensitive to a single outlier than `rate`."""
+        times, values = self.window(seconds)
+        if len(times) < 2 or times[-1] == times[0]:
+            return None
+        times = times - times.mean()
+        return float(np.dot(times, values - values.mean()) / np.dot(times, times))
+
+    def average(self, seconds: float = HISTORY_WINDOW) -> float | None:
+        """Mean of the samples in the window; None without samples."""
+        _, values = self.window(seconds)
+        return float(values.mean()) if len(values) else None
+
+
+# Histories by series name and labels, created on first use
+_histories = {}
+
+
+def history(name: str, **labels) -> History:
+    """The history of a series, created empty the first time it is asked for."""
+    key = (name, tuple(sorted(labels.items())))
+    series = _histories.get(key)
+    if series is None:
+        series = _histories[key] = History()
+    return series
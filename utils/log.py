@@ -0,0 +1,111 @@
+import json
+import sys
+import time
+import traceback
+from loguru import logger
+from config import LOG_LEVEL, LOG_FORMAT, LOG_RATE_LIMIT, LOG_RATE_INTERVAL, LOG_SAMPLE_RATE
+
+# Fields of every JSON line, null when a message has none, so promtail can select them without a regex
+FIELDS = ("collector", "method", "endpoint", "latency")
+
+# Same layout as loguru's default format, which the text lines are parsed with
+TEXT_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - "
+
+# loguru's default handler logs everything from DEBUG up until configure_logging() replaces it
+_debug = True
+
+
+def debug_enabled() -> bool:
+    """Whether debug messages reach any handler; guards debug lines whose arguments are costly to compute."""
+    return _debug
+
+
+class RateLimiter:
+    """
+    Limits how often one call site logs the same warning or error.
+
+    Each call site, per endpoint and identity when the message has them, may log `limit` messages every
+    `interval` seconds. Beyond that only every `sample`-th message gets through (none when 0), and the next one
+    that does reports how many were left out in its `suppressed` field. Runs as loguru patcher, i.e. once per
+    logged message.
+    """
+
+    def __init__(self, limit, interval, sample):
+        self.limit = limit
+        self.interval = interval
+        self.sample = sample
+        self.min_level = logger.level("WARNING").no
+        self._sites = {}
+
+    def __call__(self, record):
+        if record["level"].no < self.min_level or not self.limit:
+            return
+        extra = record["extra"]
+        key = (record["name"], record["line"], extra.get("endpoint"), extra.get("identity"))
+        now = time.monotonic()
+        site = self._sites.get(key)
+        if site is None or now - site[0] >= self.interval:
+            # [window start, messages in the window, messages left out since the last one logged]
+            site = self._sites[key] = [now, 0, site[2] if site else 0]
+        site[1] += 1
+
+        excess = site[1] - self.limit
+        if excess > 0 and (not self.sample or excess % self.sample):
+            site[2] += 1
+            extra["_suppressed"] = True
+        elif site[2]:
+            extra["suppressed"] = site[2]
+            site[2] = 0
+
+
+def _keep(record):
+    return "_suppressed" not in record["extra"]
+
+
+def _text_format(record):
+    extra = record["extra"]
+    message = "{extra[collector]}: {message}" if extra.get("collector") else "{message}"
+    if "suppressed" in extra:
+        message += " ({extra[suppressed]} similar messages suppressed)"
+    return TEXT_FORMAT + message + "\n{exception}"
+
+
+def _json_format(record):
+    extra = record["extra"]
+    line = {"time": record["time"].isoformat(timespec="milliseconds"), "level": record["level"].name}
+    for field in FIELDS:
+        line[field] = extra.get(field)
+    line["message"] = record["message"]
+    line["source"] = f"{record['name']}:{record['function']}:{record['line']}"
+    line.update((key, value) for key, value in extra.items() if key not in line and not key.startswith("_"))
+    if record["exception"] is not None:
+        line["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    # The serialized line is handed over through extra, since braces in it would be taken for format fields
+    extra["_json"] = json.dumps(line, default=str)
+    return "{extra[_json]}\n"
+
+
+def configure_logging(path="logs/monitor.log", level=LOG_LEVEL, log_format=LOG_FORMAT, stderr_level=None):
+    """
+    Replace loguru's default handler by a stderr handler and a daily rotated log file.
+
+    Messages below the lowest handler level return before they are formatted. The file gets JSON lines when
+    log_format is "json", and the loguru text layout otherwise; stderr is always text. Exceptions are logged
+    without the values of local variables.
+    """
+    global _debug
+    stderr_level = stderr_level or level
+    logger.remove()
+    logger.configure(patcher=RateLimiter(LOG_RATE_LIMIT, LOG_RATE_INTERVAL, LOG_SAMPLE_RATE))
+    logger.add(sys.stderr, level=stderr_level, format=_text_format, filter=_keep, backtrace=True, diagnose=False)
+    logger.add(path,
+               level=level,
+               format=_json_format if log_format == "json" else _text_format,
+               filter=_keep,
+               rotation="00:00",
+               retention="6 days",
+               compression=None,
+               backtrace=True,
+               diagnose=False,
+               enqueue=True)
+    _debug = min(logger.level(level).no, logger.level(stderr_level).no) <= logger.level("DEBUG").no
@@ -0,0 +1,111 @@
+import time
+from urllib.parse import urlsplit
+from loguru import logger
+from utils.func import update_metric
+from config import RPC_EWMA_ALPHA, RPC_CIRCUIT_FAILURES, RPC_CIRCUIT_COOLDOWN, RPC_MAX_SLOT_LAG
+from prometheus.metrics import (solana_rpc_endpoint_up, solana_rpc_endpoint_latency, solana_rpc_endpoint_error_rate,
+                                solana_rpc_endpoint_slot_lag)
+
+# Seconds a reported slot counts for freshness comparisons, and the seconds one slot of lag is worth in a score
+SLOT_REPORT_TTL = 60
+SLOT_DURATION = 0.4
+
+
+def url_label(url: str) -> str:
+    """Scheme, host and path of a URL, without credentials or query strings that may carry API keys."""
+    parts = urlsplit(url)
+    netloc = parts.netloc.rsplit("@", 1)[-1]
+    return parts._replace(netloc=netloc, query="", fragment="").geturl()
+
+
+class EndpointStats:
+    """Health of one RPC URL: EWMA latency and error rate, last reported slot and circuit breaker state."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.label = url_label(url)
+        self.latency = None
+        self.error_rate = 0.0
+        self.slot = None
+        self.slot_time = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+        self.inflight = 0
+
+
+class EndpointPool:
+    """
+    The URLs serving one named endpoint.
+
+    Each call goes to the healthy URL with the lowest score: its EWMA latency, inflated by its EWMA error rate and
+    the calls already in flight to it, plus the time it lags behind the freshest URL. A URL whose circuit opened
+    after consecutive failures is skipped until the cooldown ends and then gets a trial call.
+    """
+
+    def __init__(self, name: str, urls: list[str]):
+        self.name = name
+        self.stats = {url: EndpointStats(url) for url in urls}
+
+    def __str__(self):
+        return ", ".join(stats.label for stats in self.stats.values())
+
+    def _slot_lag(self, stats: EndpointStats, now: float) -> int:
+        recent = [s.slot for s in self.stats.values() if s.slot is not None and now - s.slot_time < SLOT_REPORT_TTL]
+        if not recent or stats.slot is None or now - stats.slot_time >= SLOT_REPORT_TTL:
+            return 0
+        return max(recent) - stats.slot
+
+    def score(self, stats: EndpointStats, now: float) -> float:
+        # URLs that were never tried are explored first
+        if stats.latency is None:
+            return 0.0
+        return (stats.latency * (1 + stats.inflight) * (1 + 4 * stats.error_rate)
+                + self._slot_lag(stats, now) * SLOT_DURATION)
+
+    def select(self) -> EndpointStats:
+        """Pick the URL for the next call."""
+        now = time.monotonic()
+        healthy = [stats for stats in self.stats.values()
+                   if stats.open_until <= now and self._slot_lag(stats, now) <= RPC_MAX_SLOT_LAG]
+        if not healthy:
+            # Every URL is failing or behind; try the one whose circuit closes first rather than giving up
+            return min(self.stats.values(), key=lambda stats: stats.open_until)
+        return min(healthy, key=lambda stats: self.score(stats, now))
+
+    def record_latency(self, stats: EndpointStats, latency: float):
+        if stats.latency is None:
+            stats.latency = latency
+        else:
+            stats.latency = RPC_EWMA_ALPHA * latency + (1 - RPC_EWMA_ALPHA) * stats.latency
+        update_metric(solana_rpc_endpoint_latency, stats.latency, labels={"rpc": self.name, "url": stats.label})
+
+    def report_success(self, stats: EndpointStats, latency: float):
+        self.record_latency(stats, latency)
+        stats.error_rate *= 1 - RPC_EWMA_ALPHA
+        if stats.open_until:
+            logger.info("RPC {} {} is back in rotation", self.name, stats.label)
+        stats.failures = 0
+        stats.open_until = 0.0
+        self._export(stats)
+
+    def report_failure(self, stats: EndpointStats):
+        stats.error_rate = RPC_EWMA_ALPHA + (1 - RPC_EWMA_ALPHA) * stats.error_rate
+        stats.failures += 1
+        if stats.failures >= RPC_CIRCUIT_FAILURES:
+            stats.open_until = time.monotonic() + RPC_CIRCUIT_COOLDOWN
+            logger.warning("RPC {} {} failed {} times in a row, out of rotation for {} seconds", self.name,
+                           stats.label, stats.failures, RPC_CIRCUIT_COOLDOWN)
+        self._export(stats)
+
+    def report_slot(self, stats: EndpointStats, slot: int):
+        stats.slot = slot
+        stats.slot_time = time.monotonic()
+        now = stats.slot_time
+        for other in self.stats.values():
+            update_metric(solana_rpc_endpoint_slot_lag, self._slot_lag(other, now),
+                          labels={"rpc": self.name, "url": other.label})
+
+    def _export(self, stats: EndpointStats):
+        labels = {"rpc": self.name, "url": stats.label}
+        update_metric(solana_rpc_endpoint_up, 0 if stats.failures >= RPC_CIRCUIT_FAILURES else 1, labels=labels)
+        update_metric(solana_rpc_endpoint_error_rate, stats.error_rate, labels=labels)
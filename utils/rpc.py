@@ -0,0 +1,416 @@
+import asyncio
+import contextvars
+import json
+import time
+import aiohttp
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any
+from urllib.parse import urlsplit
+from loguru import logger
+from utils.pool import EndpointPool
+from utils.log import debug_enabled
+from prometheus.metrics import (solana_exporter_rpc_duration, solana_exporter_rpc_request_bytes,
+                                solana_exporter_rpc_response_bytes, solana_exporter_rpc_errors)
+from config import (NETWORK_RPC_ENDPOINTS, NETWORK_RPC_ENDPOINT, VALIDATOR_RPC_ENDPOINT, HEADERS, RPC_TIMEOUT, RPC_POOL_SIZE,
+                    RPC_LIMIT_PER_HOST, RPC_DNS_CACHE_TTL, RPC_KEEPALIVE_TIMEOUT, RPC_COALESCE_WINDOW,
+                    RPC_MAX_BATCH_SIZE, NETWORK_WS_ENDPOINT, VALIDATOR_WS_ENDPOINT, RPC_DEADLINE,
+                    RPC_HEDGE_PERCENTILE, RPC_HEDGE_DELAY, RETRY)
+
+# Named RPC endpoints the collector modules can address, each served by a pool of one or more URLs
+ENDPOINTS = {
+    "network": EndpointPool("network", NETWORK_RPC_ENDPOINTS),
+    "validator": EndpointPool("validator", [VALIDATOR_RPC_ENDPOINT])
+}
+
+
+def ws_endpoint(url: str) -> str:
+    """Derive the PubSub WebSocket URL of an HTTP RPC URL; Solana serves it on the next port up when one is set."""
+    parts = urlsplit(url)
+    netloc = parts.netloc
+    if parts.port is not None:
+        netloc = f"{netloc.rsplit(':', 1)[0]}:{parts.port + 1}"
+    return parts._replace(scheme="wss" if parts.scheme == "https" else "ws", netloc=netloc).geturl()
+
+
+def reported_slot(payload: dict | list, body: Any) -> int | None:
+    """The result of a getSlot call in the payload, used to compare how fresh the pooled URLs are."""
+    calls = payload if isinstance(payload, list) else [payload]
+    replies = body if isinstance(body, list) else [body]
+    ids = {call.get("id") for call in calls if call.get("method") == "getSlot"}
+    if not ids:
+        return None
+    for reply in replies:
+        if isinstance(reply, dict) and reply.get("id") in ids and isinstance(reply.get("result"), int):
+            return reply["result"]
+    return None
+
+
+def payload_methods(payload: dict | list) -> set[str]:
+    """The distinct methods called by a JSON-RPC payload."""
+    calls = payload if isinstance(payload, list) else [payload]
+    return {call.get("method") for call in calls}
+
+
+def count_error(endpoint: str, method: str, error: BaseException):
+    solana_exporter_rpc_errors.labels(endpoint=endpoint, method=method, type=type(error).__name__).inc()
+
+
+# PubSub WebSocket endpoints of the named RPC endpoints
+WS_ENDPOINTS = {
+    "network": NETWORK_WS_ENDPOINT or ws_endpoint(NETWORK_RPC_ENDPOINT),
+    "validator": VALIDATOR_WS_ENDPOINT or ws_endpoint(VALIDATOR_RPC_ENDPOINT)
+}
+
+
+class RpcError(Exception):
+    """JSON-RPC error object returned by a Solana node."""
+
+    def __init__(self, method: str, error: dict):
+        self.method = method
+        self.code = error.get("code", "Unknown code")
+        self.message = error.get("message", "Unknown message")
+        self.data = error.get("data")
+        super().__init__(f"{method} - code: {self.code}, message: {self.message}")
+
+
+# Coalescer of the collection cycle the current task belongs to, if any
+_current_cycle = contextvars.ContextVar("rpc_cycle", default=None)
+
+
+class RequestCoalescer:
+    """
+    Collects the RPC calls made by all modules during one collection cycle.
+
+    Identical method+params pairs are sent once per endpoint and their result is shared by every caller.
+    Calls arriving within the coalescing window are sent together as one JSON-RPC batch per endpoint.
+    """
+
+    def __init__(self, client, window: float = RPC_COALESCE_WINDOW):
+        self._client = client
+        self._window = window
+        self._futures = {}
+        self._pending = {}
+        self._flush_handles = {}
+        self._tasks = set()
+        self.requested = 0
+        self.sent = 0
+        self.batches = 0
+
+    def request(self, method: str, params: list | None, endpoint: str) -> asyncio.Future:
+        """Return a future for the call, queueing it for the next batch unless it was already requested."""
+        self.requested += 1
+        key = (endpoint, method, json.dumps(params, sort_keys=True))
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Failures are re-raised to every awaiting caller; mark them retrieved for callers that gave up
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._futures[key] = future
+        self._pending.setdefault(endpoint, []).append((method, params, future))
+        if endpoint not in self._flush_handles:
+            self._flush_handles[endpoint] = loop.call_later(self._window, self._flush, endpoint)
+        return future
+
+    def _flush(self, endpoint: str):
+        del self._flush_handles[endpoint]
+        pending = self._pending.pop(endpoint, [])
+        for start in range(0, len(pending), RPC_MAX_BATCH_SIZE):
+            task = asyncio.create_task(self._send(endpoint, pending[start:start + RPC_MAX_BATCH_SIZE]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, endpoint: str, pending: list):
+        self.sent += len(pending)
+        self.batches += 1
+        try:
+            results = await self._client.send_batch([(method, params) for method, params, _ in pending], endpoint)
+        except Exception as e:
+            for *_, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), result in zip(pending, results):
+            if future.done():
+                continue
+            if isinstance(result, RpcError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        """Flush anything still queued so no caller is left waiting after the cycle ends."""
+        for endpoint, handle in list(self._flush_handles.items()):
+            handle.cancel()
+            self._flush(endpoint)
+
+
+class RpcClient:
+    """Long-lived JSON-RPC client with a keep-alive connection pool shared by all collectors."""
+
+    def __init__(self):
+        self._session = None
+
+    async def start(self):
+        """Open the pooled HTTP session. Safe to call more than once."""
+        if self._session is not None and not self._session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=RPC_POOL_SIZE,
+            limit_per_host=RPC_LIMIT_PER_HOST,
+            use_dns_cache=True,
+            ttl_dns_cache=RPC_DNS_CACHE_TTL,
+            keepalive_timeout=RPC_KEEPALIVE_TIMEOUT
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=HEADERS,
+            timeout=aiohttp.ClientTimeout(total=RPC_TIMEOUT)
+        )
+        logger.info("RPC client started (pool size: {}, per host: {})", RPC_POOL_SIZE, RPC_LIMIT_PER_HOST)
+
+    async def close(self):
+        """Close the pooled HTTP session and release its connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("RPC client closed")
+        self._session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, opening it on first use."""
+        await self.start()
+        return self._session
+
+    async def post(self, payload: dict | list, endpoint: str = "network", parser=None) -> Any:
+        """
+        Send a raw JSON-RPC payload to the best URL of a named endpoint and return the decoded response body.
+
+        With a `parser` coroutine function the body is not decoded here; the parser reads the response stream
+        as it arrives and its return value is returned instead.
+        """
+        pool = ENDPOINTS[endpoint]
+        stats = pool.select()
+        session = await self.get_session()
+        methods = payload_methods(payload)
+        data = json.dumps(payload).encode()
+        solana_exporter_rpc_request_bytes.labels(endpoint=endpoint).inc(len(data))
+        start_time = time.monotonic()
+        stats.inflight += 1
+        try:
+            async with session.post(stats.url, data=data) as response:
+                try:
+                    response.raise_for_status()
+                    body = await (response.json() if parser is None else parser(response.content))
+                finally:
+                    solana_exporter_rpc_response_bytes.labels(endpoint=endpoint).inc(response.content.total_bytes)
+        except asyncio.CancelledError:
+            # A hedged call that lost the race never finished, so its time says nothing about the URL
+            raise
+        except Exception as e:
+            pool.report_failure(stats)
+            # A JSON-RPC error found by a parser belongs to its own method only
+            for method in [e.method] if isinstance(e, RpcError) else methods:
+                count_error(endpoint, method, e)
+            raise
+        finally:
+            stats.inflight -= 1
+
+        latency = time.monotonic() - start_time
+        pool.report_success(stats, latency)
+        for method in methods:
+            solana_exporter_rpc_duration.labels(endpoint=endpoint, method=method).observe(latency)
+        if debug_enabled():
+            logger.debug("{endpoint} answered {method} in {latency:.3f} seconds", endpoint=endpoint,
+                         method=",".join(methods), latency=latency)
+        slot = reported_slot(payload, body)
+        if slot is not None:
+            pool.report_slot(stats, slot)
+        return body
+
+    @asynccontextmanager
+    async def cycle(self):
+        """Coalesce the calls made by every task started inside this block into shared batches."""
+        coalescer = RequestCoalescer(self)
+        token = _current_cycle.set(coalescer)
+        try:
+            yield coalescer
+        finally:
+            _current_cycle.reset(token)
+            coalescer.close()
+            logger.debug("RPC cycle: {} calls requested, {} sent in {} batches", coalescer.requested, coalescer.sent,
+                         coalescer.batches)
+
+    async def call(self, method: str, params: list | None = None, endpoint: str = "network",
+                   coalesce: bool = True) -> Any:
+        """
+        Call a single RPC method and return its `result`, raising RpcError on a JSON-RPC error.
+
+        Inside a collection cycle the call is coalesced with the other modules' calls unless `coalesce` is False.
+        """
+        coalescer = _current_cycle.get()
+        if coalesce and coalescer is not None:
+            return await asyncio.shield(coalescer.request(method, params, endpoint))
+
+        payload = {"jsonrpc": "2.0", "id": 1, "method": method}
+        if params is not None:
+            payload["params"] = params
+
+        response = await self.post(payload, endpoint)
+        if "error" in response:
+            error = RpcError(method, response["error"])
+            count_error(endpoint, method, error)
+            raise error
+        return response.get("result")
+
+    async def stream_call(self, method: str, parser, params: list | None = None, endpoint: str = "network") -> Any:
+        """
+        Call a single RPC method and return what `parser` makes of the response stream.
+
+        Meant for responses too large to decode whole. The call is never coalesced, and the parser is
+        responsible for raising RpcError when the response is a JSON-RPC error.
+        """
+        payload = {"jsonrpc": "2.0", "id": 1, "method": method}
+        if params is not None:
+            payload["params"] = params
+        return await self.post(payload, endpoint, parser)
+
+    async def batch(self, requests: list[tuple[str, list | None]], endpoint: str = "network",
+                    coalesce: bool = True) -> list[Any]:
+        """
+        Send several (method, params) calls as one JSON-RPC batch.
+
+        Results are returned in request order. A call that failed on the node is returned as an
+        RpcError instance instead of raising, so one bad call does not discard the rest of the batch.
+        Inside a collection cycle the calls are coalesced with the other modules' calls unless `coalesce` is False.
+        """
+        coalescer = _current_cycle.get()
+        if not coalesce or coalescer is None:
+            return await self.send_batch(requests, endpoint)
+
+        futures = [coalescer.request(method, params, endpoint) for method, params in requests]
+        results = await asyncio.gather(*[asyncio.shield(future) for future in futures], return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, RpcError):
+                raise result
+        return results
+
+    async def send_batch(self, requests: list[tuple[str, list | None]], endpoint: str = "network") -> list[Any]:
+        """Send the calls as one JSON-RPC batch right away, bypassing any cycle coalescing."""
+        payload = []
+        for req_id, (method, params) in enumerate(requests):
+            item = {"jsonrpc": "2.0", "id": req_id, "method": method}
+            if params is not None:
+                item["params"] = params
+            payload.append(item)
+
+        response = await self.post(payload, endpoint)
+        if isinstance(response, dict):
+            # The node rejected the whole batch with a single error object
+            error = RpcError(",".join(method for method, _ in requests) or "batch",
+                             response.get("error") or {"message": "Invalid batch response"})
+            for method, _ in requests:
+                count_error(endpoint, method, error)
+            raise error
+        by_id = {item.get("id"): item for item in response}
+
+        results = []
+        for req_id, (method, _) in enumerate(requests):
+            item = by_id.get(req_id, {"error": {"message": "Missing response in batch"}})
+            if "error" in item:
+                error = RpcError(method, item["error"])
+                count_error(endpoint, method, error)
+                results.append(error)
+            else:
+                results.append(item.get("result"))
+        return results
+
+
+rpc = RpcClient()
+
+
+class RequestPolicy:
+    """
+    Deadline-bounded, hedged JSON-RPC batches with the latency history of each endpoint.
+
+    When an attempt has not answered within the endpoint's recent latency percentile, or as soon as it fails,
+    a backup attempt is sent to the same endpoint. The first good answer wins and the other attempts are cancelled.
+    Endpoints are handled independently, so a slow endpoint never causes a healthy one to be asked again.
+    """
+
+    # Latencies kept per endpoint, and how many are needed before the percentile replaces the default delay
+    HISTORY_SIZE = 100
+    MIN_SAMPLES = 10
+    MIN_HEDGE_DELAY = 0.05
+
+    def __init__(self, client, deadline: float = RPC_DEADLINE, percentile: float = RPC_HEDGE_PERCENTILE,
+                 max_attempts: int = RETRY):
+        self._client = client
+        self.deadline = deadline
+        self.percentile = percentile
+        self.max_attempts = max(max_attempts, 1)
+        self._latencies = {}
+
+    def hedge_delay(self, endpoint: str) -> float:
+        """Seconds to wait on an attempt to the endpoint before sending a backup."""
+        latencies = self._latencies.get(endpoint)
+        if latencies is None or len(latencies) < self.MIN_SAMPLES:
+            return RPC_HEDGE_DELAY
+        ordered = sorted(latencies)
+        index = min(int(len(ordered) * self.percentile), len(ordered) - 1)
+        return max(ordered[index], self.MIN_HEDGE_DELAY)
+
+    def _record(self, endpoint: str, latency: float):
+        self._latencies.setdefault(endpoint, deque(maxlen=self.HISTORY_SIZE)).append(latency)
+
+    async def batch(self, requests: list[tuple[str, list | None]],
+                    endpoint: str = "network") -> tuple[list[Any], int, float]:
+        """
+        Send the calls as one batch to the endpoint under the policy.
+
+        Returns the results, the number of the attempt that answered (starting at 1) and the latency since the
+        first attempt. Raises the last attempt's error, or asyncio.TimeoutError once the deadline has passed.
+        """
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        deadline = start_time + self.deadline
+        attempts = {}
+        pending = set()
+        last_error = None
+        try:
+            while True:
+                if len(attempts) < self.max_attempts:
+                    # Only the first attempt joins the cycle's coalesced batch; backups go out on their own
+                    task = asyncio.create_task(self._client.batch(requests, endpoint, coalesce=not attempts))
+                    attempts[task] = (len(attempts) + 1, loop.time())
+                    pending.add(task)
+                elif not pending:
+                    raise last_error
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"{endpoint}: no answer within {self.deadline} seconds "
+                                               f"after {len(attempts)} attempts")
+                timeout = remaining
+                if len(attempts) < self.max_attempts:
+                    timeout = min(self.hedge_delay(endpoint), remaining)
+
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    attempt, attempt_start = attempts[task]
+                    if task.exception() is None:
+                        end_time = loop.time()
+                        self._record(endpoint, end_time - attempt_start)
+                        return task.result(), attempt, end_time - start_time
+                    last_error = task.exception()
+                    logger.debug("{endpoint}: attempt {} failed: {}", attempt, last_error, endpoint=endpoint)
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+policy = RequestPolicy(rpc)
@@ -0,0 +1,125 @@
+import json
+import os
+from loguru import logger
+
+
+class FileTailer:
+    """
+    Follows a growing log file in large chunks and remembers how far it got across restarts.
+
+    Each read returns whole lines only; an unfinished last line is kept until the rest of it is written. The
+    offset of the last whole line is saved to `offset_file` together with the file's inode, so a restart resumes
+    where it stopped. Without a saved offset, following starts at the end of the file instead of replaying it.
+
+    A new inode at `path` means the file was rotated: the old file is read to its end before following the new
+    one from its start. A file that is shorter than the offset, or no longer holds the bytes last read before
+    it, was truncated in place and is read again from its start.
+    """
+
+    def __init__(self, path, offset_file=None, chunk_size=4 * 1024 * 1024):
+        self.path = path
+        self.offset_file = offset_file
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self._file = None
+        self._inode = None
+        self._partial = b""
+        self._last = b""
+
+    def _load_offset(self):
+        if not self.offset_file:
+            return None
+        try:
+            with open(self.offset_file) as offset_file:
+                return json.load(offset_file)
+        except (OSError, ValueError):
+            return None
+
+    def save_offset(self):
+        if not self.offset_file or self._inode is None:
+            return
+        # Written aside and renamed, so a crash never leaves a half-written offset file behind
+        temp_path = f"{self.offset_file}.tmp"
+        with open(temp_path, "w") as offset_file:
+            json.dump({"inode": self._inode, "offset": self.offset - len(self._partial)}, offset_file)
+        os.replace(temp_path, self.offset_file)
+
+    def _open(self, stat, offset):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "rb")
+        self._inode = stat.st_ino
+        self._file.seek(offset)
+        self.offset = offset
+        self._partial = b""
+        self._last = b""
+
+    def _start(self, stat):
+        saved = self._load_offset()
+        if saved and saved.get("inode") == stat.st_ino and saved.get("offset", 0) <= stat.st_size:
+            self._open(stat, saved["offset"])
+            logger.info("Following {} from saved offset {}", self.path, self.offset)
+        elif saved:
+            # Rotated while the exporter was down; the new file is read from its start
+            self._open(stat, 0)
+            logger.info("Following rotated {} from its start", self.path)
+        else:
+            self._open(stat, stat.st_size)
+            logger.info("Following {} from its end at offset {}", self.path, self.offset)
+
+    def _read(self, limit):
+        """Yield chunks ending on a line break from the open file until its end or `limit` bytes."""
+        read = 0
+        while read < limit:
+            chunk = self._file.read(min(self.chunk_size, limit - read))
+            if not chunk:
+                return
+            read += len(chunk)
+            self.offset += len(chunk)
+            self._last = chunk[-64:]
+            end = chunk.rfind(b"\n") + 1
+            if not end:
+                self._partial += chunk
+                continue
+            lines, self._partial = self._partial + chunk[:end], chunk[end:]
+            yield lines
+
+    def read(self, limit=256 * 1024 * 1024):
+        """Yield the whole lines written since the last read, in chunks, reading at most `limit` bytes."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Between the rotation's rename and the creation of the new file
+            return
+        if self._file is None:
+            self._start(stat)
+        elif stat.st_ino != self._inode:
+            # Anything written to the old file before the rotation comes first
+            start = self.offset
+            yield from self._read(limit)
+            limit -= self.offset - start
+            if limit <= 0:
+                # The rest of the old file is read first, next time
+                return
+            logger.info("{} was rotated, following the new file", self.path)
+            self._open(stat, 0)
+        elif stat.st_size < self.offset or not self._unchanged():
+            logger.info("{} was truncated, reading it again from the start", self.path)
+            self._open(stat, 0)
+        yield from self._read(limit)
+
+    def _unchanged(self):
+        # Rewritten past the offset since the last read, e.g. truncated by logrotate's copytruncate and refilled
+        return os.pread(self._file.fileno(), len(self._last), self.offset - len(self._last)) == self._last
+
+    def lag(self):
+        """Bytes written to the file that were not read yet."""
+        try:
+            return max(os.stat(self.path).st_size - self.offset, 0)
+        except OSError:
+            return 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,125 @@
+from itertools import chain
+from typing import NamedTuple
+import ijson
+import numpy as np
+from utils.rpc import RpcError
+
+
+class VoteAccount(NamedTuple):
+    """The fields of a getVoteAccounts entry the collectors use."""
+    node_pubkey: str
+    vote_pubkey: str
+    activated_stake: int
+    commission: int
+    last_vote: int
+    root_slot: int
+    epoch_vote_account: bool
+    epoch_credits: tuple | None  # latest (epoch, credits, previous credits) entry
+    delinquent: bool
+
+
+# Bytes read from the response per parser step
+READ_SIZE = 64 * 1024
+
+# Nesting depth of an account map, its epochCredits list and one epochCredits entry in a getVoteAccounts
+# response: response map > result map > account list > account > epochCredits > entry
+ACCOUNT_DEPTH = 4
+ENTRY_DEPTH = 6
+
+SCALAR_EVENTS = {"number", "string", "boolean", "null"}
+
+
+async def parse_vote_accounts(stream) -> tuple[list[VoteAccount], list[VoteAccount]]:
+    """
+    Parse a getVoteAccounts response body as it arrives into compact current and delinquent records.
+
+    The body is read in READ_SIZE chunks and walked once. Only the account being read is held as a dict; every
+    other field, and all but the latest epochCredits entry, is dropped as soon as it has been parsed. Raises
+    RpcError if the node returned an error.
+    """
+    lists = {"current": [], "delinquent": []}
+    error = {}
+    keys = []  # the key of every open map or array, from the response map down
+    key = accounts = fields = credits = entry = None
+    depth = 0
+    delinquent = False
+
+    # Routed on nesting depth instead of ijson's prefixes, which cost a string per event
+    async for event, value in ijson.basic_parse_async(stream, buf_size=READ_SIZE):
+        if event in SCALAR_EVENTS:
+            # epochCredits numbers are most of the events, so they are checked first
+            if depth == ENTRY_DEPTH:
+                entry.append(value)
+            elif depth == ACCOUNT_DEPTH:
+                fields[key] = value
+            elif depth == 2 and keys[1] == "error":
+                error[key] = value
+        elif event == "map_key":
+            key = value
+        elif event == "start_map" or event == "start_array":
+            keys.append(key)
+            depth += 1
+            if depth == ENTRY_DEPTH:
+                entry = []
+            elif depth == ACCOUNT_DEPTH:
+                fields = {}
+                credits = None
+            elif depth == 3 and keys[1] == "result":
+                accounts = lists.get(key)
+                delinquent = key == "delinquent"
+        else:
+            if depth == ENTRY_DEPTH:
+                credits = entry
+            elif depth == ACCOUNT_DEPTH and accounts is not None:
+                accounts.append(VoteAccount(
+                    fields.get("nodePubkey"),
+                    fields.get("votePubkey"),
+                    fields.get("activatedStake", 0),
+                    fields.get("commission"),
+                    fields.get("lastVote"),
+                    fields.get("rootSlot"),
+                    fields.get("epochVoteAccount", False),
+                    tuple(credits) if credits else None,
+                    delinquent
+                ))
+            elif depth == 3:
+                accounts = None
+            depth -= 1
+            key = keys.pop()
+
+    if error:
+        raise RpcError("getVoteAccounts", error)
+    return lists["current"], lists["delinquent"]
+
+
+class VoteAccountColumns(NamedTuple):
+    """A vote account snapshot as column arrays, one row per account."""
+    node_pubkey: np.ndarray
+    stake: np.ndarray
+    credits: np.ndarray  # credits earned in the current epoch, 0 without an entry for it
+    credited: np.ndarray  # whether epochCredits has an entry for the current epoch
+    last_vote: np.ndarray
+    commission: np.ndarray
+    delinquent: np.ndarray
+
+
+def to_columns(current: list[VoteAccount], delinquent: list[VoteAccount], epoch: int) -> VoteAccountColumns:
+    """Load the current and delinquent records into column arrays for vectorized statistics."""
+    accounts = list(chain(current, delinquent))
+    # One pass over the records for every numeric field; epochCredits is resolved against the epoch below
+    numbers = np.array([
+        (account.activated_stake or 0, account.last_vote or 0, account.commission or 0,
+         *(account.epoch_credits or (-1, 0, 0)))
+        for account in accounts
+    ], dtype=np.int64).reshape(-1, 6)
+    credits_epoch, credits, previous_credits = numbers[:, 3], numbers[:, 4], numbers[:, 5]
+
+    return VoteAccountColumns(
+        node_pubkey=np.array([account.node_pubkey for account in accounts], dtype=str),
+        stake=numbers[:, 0],
+        credits=np.where(credits_epoch == epoch, credits - previous_credits, 0),
+        credited=credits_epoch == epoch,
+        last_vote=numbers[:, 1],
+        commission=numbers[:, 2],
+        delinquent=np.arange(len(accounts)) >= len(current)
+    )